@@ -3,6 +3,7 @@ Aplicación principal de la API Agentic.
 Siguiendo principios SOLID y Clean Architecture.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,13 +14,19 @@ from pathlib import Path
 # Use absolute imports when running as main module
 try:
     from config.settings import LogConfig, settings
-    from routers import health, chat, documents, cache
+    from routers import health, chat, documents, cache, metrics
     from utils.validators import check_postgresql_connection, check_ollama_connection
+    from core.dependencies import get_inference_executor, get_cache_sweeper, get_cache_warmer, get_semantic_cache, get_ingestion_jobs
+    from services.connections import dispose_connections
+    from services.pdf_extraction import shutdown_pdf_extractor
 except ImportError:
     # Use relative imports when imported as package
     from .config.settings import LogConfig, settings
-    from .routers import health, chat, documents, cache
+    from .routers import health, chat, documents, cache, metrics
     from .utils.validators import check_postgresql_connection, check_ollama_connection
+    from .core.dependencies import get_inference_executor, get_cache_sweeper, get_cache_warmer, get_semantic_cache, get_ingestion_jobs
+    from .services.connections import dispose_connections
+    from .services.pdf_extraction import shutdown_pdf_extractor
 
 # Configurar logging
 logger = LogConfig.setup_logging()
@@ -46,12 +53,33 @@ async def lifespan(app: FastAPI):
         settings.EMBEDDER_MODEL
     )
     
+    # Limpieza del caché en segundo plano (TTL y límite de entradas)
+    sweeper_task = asyncio.create_task(get_cache_sweeper().run())
+    # Copias en memoria del caché al día con las invalidaciones de otros workers
+    generation_task = asyncio.create_task(get_semantic_cache().watch_generation())
+    # Indexación de documentos subidos (retoma los trabajos pendientes)
+    ingestion_task = asyncio.create_task(get_ingestion_jobs().run())
+    
     logger.info("✅ API iniciada exitosamente")
     
     yield  # La aplicación se ejecuta aquí
     
     # Shutdown
     logger.info("👋 Cerrando Insurance Knowledge Base API...")
+    background_tasks = (sweeper_task, generation_task, ingestion_task)
+    for task in background_tasks:
+        task.cancel()
+    # Esperar a que terminen antes de cerrar el executor y las conexiones que usan
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await get_cache_warmer().cancel()
+    try:
+        # Guardar la telemetría del caché acumulada desde la última limpieza
+        get_semantic_cache().telemetry.flush()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo guardar la telemetría del caché: {e}")
+    get_inference_executor().shutdown()
+    shutdown_pdf_extractor()
+    dispose_connections()
 
 
 # Inicializar FastAPI app con lifespan
@@ -76,6 +104,7 @@ app.include_router(health.router, tags=["Health"])
 app.include_router(chat.router, tags=["Chat"])
 app.include_router(documents.router, tags=["Documents"])
 app.include_router(cache.router, tags=["Cache"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 # Montar la carpeta dist para servir archivos estáticos del chatbot
 dist_path = Path(__file__).parent / "dist"
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""
+Servidor HTTP que imita la API de Ollama para pruebas de carga sin GPU.
+
+Responde con embeddings deterministas (bolsa de palabras con hashing, de modo
+que preguntas parecidas producen vectores parecidos) y completions enlatadas
+con referencias a documentos, con latencia y tokens por segundo configurables.
+
+Uso:
+    python benchmarks/fake_ollama.py --port 11500 --latency-ms 50 --tokens-per-second 40
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+EMBEDDING_DIMENSIONS = 768
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+CANNED_ANSWERS = [
+    "The policy covers hospitalization, outpatient care and emergency services up to the annual limit. "
+    "Pre-existing conditions are covered after the waiting period described in the contract.",
+    "The contract defines a guaranteed minimum interest rate and an index-linked crediting strategy. "
+    "Withdrawals during the surrender period are subject to the surrender charge schedule.",
+    "Premiums are level for the initial term and can be renewed without new evidence of insurability. "
+    "Conversion to a permanent plan is allowed before the conversion expiry date.",
+    "Exclusions include self-inflicted injuries, participation in hazardous activities and claims "
+    "arising outside the coverage territory, as listed in the exclusions section.",
+]
+
+CANNED_DOCUMENTS = [
+    "Core.pdf",
+    "Ideal_Guarantee.pdf",
+    "Horizon_112.pdf",
+    "LifeTime_1813.pdf",
+    "Single_Contribution_Annuity_Contract_7815.pdf",
+]
+
+
+def deterministic_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Embedding normalizado a partir de las palabras del texto"""
+    vector = [0.0] * dimensions
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return [value / norm for value in vector]
+
+
+def canned_completion(prompt: str) -> str:
+    """Respuesta determinista con referencias a documentos"""
+    digest = int(hashlib.md5(prompt.encode()).hexdigest(), 16)
+    answer = CANNED_ANSWERS[digest % len(CANNED_ANSWERS)]
+    document = CANNED_DOCUMENTS[digest % len(CANNED_DOCUMENTS)]
+    page = digest % 40 + 1
+    return (
+        f"{answer} [{document} - Page {page}]\n\n"
+        f"REFERENCES:\n[{document} - Page {page}]"
+    )
+
+
+class FakeOllamaConfig:
+    """Parámetros de simulación compartidos por los handlers"""
+
+    def __init__(self, latency_ms: float = 0.0, tokens_per_second: float = 0.0,
+                 embed_latency_ms: float = 0.0, tool_calls: bool = True,
+                 models: Optional[List[str]] = None):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.embed_latency_ms = embed_latency_ms
+        self.tool_calls = tool_calls
+        self.models = models or ["qwen3:8b", "qwen2.5:7b-instruct", "nomic-embed-text:latest"]
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _pick_tool_call(tools: List[Dict[str, Any]], query: str) -> Optional[Dict[str, Any]]:
+    """Construye una llamada a la herramienta de búsqueda si el agente la ofrece"""
+    for tool in tools:
+        function = tool.get("function", {})
+        name = function.get("name", "")
+        if "search" not in name:
+            continue
+        properties = function.get("parameters", {}).get("properties", {})
+        if "queries" in properties:
+            arguments = {"queries": [query, f"{query} coverage", f"{query} exclusions"]}
+        else:
+            arguments = {"query": query}
+        return {"function": {"name": name, "arguments": arguments}}
+    return None
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Implementa el subconjunto de la API de Ollama que usa la aplicación"""
+
+    protocol_version = "HTTP/1.1"
+    config: FakeOllamaConfig = FakeOllamaConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sleep_ms(self, milliseconds: float):
+        if milliseconds > 0:
+            time.sleep(milliseconds / 1000.0)
+
+    def do_GET(self):
+        self.config.count(self.path)
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name} for name in self.config.models]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.5.0"})
+        elif self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        self.config.count(self.path)
+        payload = self._read_json()
+        if self.path == "/api/embed":
+            self._handle_embed(payload)
+        elif self.path == "/api/embeddings":
+            self._sleep_ms(self.config.embed_latency_ms)
+            self._send_json({"embedding": deterministic_embedding(payload.get("prompt", ""))})
+        elif self.path == "/api/chat":
+            self._handle_chat(payload)
+        elif self.path == "/api/generate":
+            self._handle_generate(payload)
+        elif self.path == "/api/show":
+            self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {}})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _handle_embed(self, payload: Dict[str, Any]):
+        inputs = payload.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self._sleep_ms(self.config.embed_latency_ms)
+        self._send_json({
+            "model": payload.get("model"),
+            "embeddings": [deterministic_embedding(text) for text in inputs]
+        })
+
+    def _handle_chat(self, payload: Dict[str, Any]):
+        messages = payload.get("messages", [])
+        user_messages = [m.get("content", "") for m in messages if m.get("role") == "user"]
+        query = user_messages[-1] if user_messages else ""
+        already_searched = any(m.get("role") == "tool" for m in messages)
+
+        self._sleep_ms(self.config.latency_ms)
+
+        tools = payload.get("tools") or []
+        if self.config.tool_calls and tools and not already_searched:
+            tool_call = _pick_tool_call(tools, query)
+            if tool_call:
+                message = {"role": "assistant", "content": "", "tool_calls": [tool_call]}
+                self._respond_message(payload, message, stream=payload.get("stream", True))
+                return
+
+        content = canned_completion(query)
+        self._respond_message(payload, {"role": "assistant", "content": content},
+                              stream=payload.get("stream", True))
+
+    def _handle_generate(self, payload: Dict[str, Any]):
+        self._sleep_ms(self.config.latency_ms)
+        content = canned_completion(payload.get("prompt", ""))
+        tokens = content.split(" ")
+        self._simulate_generation(len(tokens))
+        self._send_json({
+            "model": payload.get("model"),
+            "created_at": _now(),
+            "response": content,
+            "done": True,
+            "done_reason": "stop",
+            "eval_count": len(tokens)
+        })
+
+    def _simulate_generation(self, token_count: int):
+        if self.config.tokens_per_second > 0:
+            time.sleep(token_count / self.config.tokens_per_second)
+
+    def _respond_message(self, payload: Dict[str, Any], message: Dict[str, Any], stream: bool):
+        model = payload.get("model")
+        tokens = re.findall(r"\S+\s*", message.get("content", "")) or [""]
+        final = {
+            "model": model,
+            "created_at": _now(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": 0,
+            "prompt_eval_count": sum(len(m.get("content", "") or "") // 4 for m in payload.get("messages", [])),
+            "eval_count": len(tokens)
+        }
+
+        if not stream:
+            self._simulate_generation(len(tokens))
+            self._send_json({**final, "message": message})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+        if message.get("tool_calls"):
+            self._write_chunk({"model": model, "created_at": _now(), "message": message, "done": False})
+        else:
+            for token in tokens:
+                if delay:
+                    time.sleep(delay)
+                self._write_chunk({
+                    "model": model,
+                    "created_at": _now(),
+                    "message": {"role": "assistant", "content": token},
+                    "done": False
+                })
+        self._write_chunk({**final, "message": {"role": "assistant", "content": ""}})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: Dict[str, Any]):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+def start_fake_ollama(host: str = "127.0.0.1", port: int = 0,
+                      config: Optional[FakeOllamaConfig] = None) -> ThreadingHTTPServer:
+    """
+    Inicia el servidor en un thread en segundo plano.
+
+    Returns:
+        El servidor; la URL base es http://{host}:{server.server_port}
+    """
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {"config": config or FakeOllamaConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor Ollama simulado para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia fija por llamada de chat")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Velocidad de generación (0 = instantáneo)")
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0, help="Latencia por llamada de embedding")
+    parser.add_argument("--no-tool-calls", action="store_true", help="No emitir llamadas a herramientas")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        embed_latency_ms=args.embed_latency_ms,
+        tool_calls=not args.no_tool_calls
+    )
+    server = start_fake_ollama(args.host, args.port, config)
+    print(f"Fake Ollama escuchando en http://{args.host}:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
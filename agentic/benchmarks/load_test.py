@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+Prueba de carga de la API Agentic contra un Ollama simulado.
+
+Levanta benchmarks/fake_ollama.py y la aplicación real (app.py) con uvicorn en
+el mismo proceso, y envía tráfico concurrente a /chat a partir de un corpus de
+preguntas con distintos porcentajes de aciertos en caché. Solo requiere un
+PostgreSQL con pgvector accesible en AGENTIC_DB_URL.
+
+Uso:
+    AGENTIC_DB_URL=postgresql+psycopg://ai:ai@localhost:5532/ai \\
+        python benchmarks/load_test.py --requests 200 --concurrency 16 --hit-ratios 0,0.5,0.9
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+AGENTIC_DIR = BENCHMARKS_DIR.parent
+
+sys.path.insert(0, str(BENCHMARKS_DIR))
+from fake_ollama import FakeOllamaConfig, start_fake_ollama  # noqa: E402
+
+UNIQUE_VOCABULARY = [
+    "rider", "premium", "beneficiary", "annuitant", "surrender", "deductible", "copayment",
+    "coinsurance", "endorsement", "underwriting", "lapse", "rollover", "vesting", "accrual",
+    "indemnity", "subrogation", "actuarial", "escrow", "fiduciary", "amortization", "tranche",
+    "reinsurance", "morbidity", "mortality", "liquidity", "arbitration", "rescission", "waiver",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def current_rss_bytes() -> int:
+    """Memoria residente del proceso (incluye la API, que corre en este proceso)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Fallback: pico de memoria (KB en Linux, bytes en macOS)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def load_corpus(path: Path) -> List[str]:
+    with open(path, encoding="utf-8") as corpus:
+        questions = [line.strip() for line in corpus]
+    return [q for q in questions if q and not q.startswith("#")]
+
+
+def unique_question(rng: random.Random, index: int) -> str:
+    """Pregunta que no debería coincidir con ninguna entrada del caché"""
+    words = rng.sample(UNIQUE_VOCABULARY, 4)
+    return f"Explain {words[0]} {words[1]} versus {words[2]} {words[3]} scenario {index} {rng.getrandbits(32):x}"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(port: int):
+    """Importa app.py (después de configurar el entorno) y lo sirve en un thread"""
+    os.chdir(AGENTIC_DIR)
+    sys.path.insert(0, str(AGENTIC_DIR))
+
+    import uvicorn
+    from app import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="agentic-api", daemon=True)
+    thread.start()
+
+    deadline = time.time() + 60
+    while not server.started:
+        if not thread.is_alive() or time.time() > deadline:
+            raise RuntimeError("La API no pudo iniciarse (revisar AGENTIC_DB_URL y los logs)")
+        time.sleep(0.1)
+    return server, thread
+
+
+async def send_chat(client: httpx.AsyncClient, question: str, format_response: bool) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/chat", json={"message": question, "format_response": format_response})
+        latency = time.perf_counter() - start
+        metadata = response.json().get("metadata", {}) if response.status_code == 200 else {}
+        return {
+            "latency": latency,
+            "status": response.status_code,
+            "cache_used": bool(metadata.get("cache_used")),
+            "coalesced": bool(metadata.get("coalesced"))
+        }
+    except httpx.HTTPError as e:
+        return {"latency": time.perf_counter() - start, "status": type(e).__name__,
+                "cache_used": False, "coalesced": False}
+
+
+async def run_scenario(base_url: str, corpus: List[str], hit_ratio: float, args,
+                       fake_config: FakeOllamaConfig) -> Dict[str, Any]:
+    """Ejecuta una ronda de carga con el porcentaje de aciertos indicado"""
+    rng = random.Random(args.seed)
+    hot_questions = corpus[:args.hot_questions]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        await client.post("/cache/clear")
+
+        # Precalentar el caché con las preguntas frecuentes (no se mide)
+        if hit_ratio > 0:
+            for question in hot_questions:
+                await send_chat(client, question, args.format_response)
+
+        questions = [
+            rng.choice(hot_questions) if rng.random() < hit_ratio else unique_question(rng, i)
+            for i in range(args.requests)
+        ]
+
+        sessions_before = len((await client.get("/sessions")).json().get("sessions", []))
+        rss_before = current_rss_bytes()
+        ollama_before = dict(fake_config.requests)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(question: str):
+            async with semaphore:
+                return await send_chat(client, question, args.format_response)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(q) for q in questions))
+        elapsed = time.perf_counter() - start
+
+        rss_after = current_rss_bytes()
+        sessions = (await client.get("/sessions")).json().get("sessions", [])
+
+    ok = [r for r in results if r["status"] == 200]
+    latencies = [r["latency"] for r in ok]
+    hit_latencies = [r["latency"] for r in ok if r["cache_used"]]
+    miss_latencies = [r["latency"] for r in ok if not r["cache_used"]]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+
+    new_sessions = max(len(sessions) - sessions_before, 0)
+    estimated = [s.get("estimated_memory_bytes", 0) for s in sessions]
+    ollama_calls = {
+        endpoint: count - ollama_before.get(endpoint, 0)
+        for endpoint, count in fake_config.requests.items()
+        if count - ollama_before.get(endpoint, 0)
+    }
+
+    def summary(values: List[float]) -> Dict[str, float]:
+        return {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1)
+        }
+
+    return {
+        "target_hit_ratio": hit_ratio,
+        "observed_hit_ratio": round(len(hit_latencies) / len(ok), 3) if ok else 0.0,
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "statuses": statuses,
+        "coalesced": sum(1 for r in ok if r["coalesced"]),
+        "latency": summary(latencies),
+        "latency_cache_hit": summary(hit_latencies),
+        "latency_cache_miss": summary(miss_latencies),
+        "memory": {
+            "new_sessions": new_sessions,
+            "active_sessions": len(sessions),
+            "avg_estimated_session_bytes": int(sum(estimated) / len(estimated)) if estimated else 0,
+            "rss_delta_bytes": rss_after - rss_before,
+            "rss_per_new_session_bytes": int((rss_after - rss_before) / new_sessions) if new_sessions else None
+        },
+        "ollama_calls": ollama_calls
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    latency = result["latency"]
+    memory = result["memory"]
+    print(f"\n=== hit ratio objetivo {result['target_hit_ratio']:.0%} "
+          f"(observado {result['observed_hit_ratio']:.0%}) ===")
+    print(f"  requests: {result['requests']}  concurrency: {result['concurrency']}  "
+          f"rps: {result['rps']}  statuses: {result['statuses']}  coalesced: {result['coalesced']}")
+    print(f"  latency   p50={latency['p50_ms']}ms  p95={latency['p95_ms']}ms  p99={latency['p99_ms']}ms")
+    for label, key in (("hits", "latency_cache_hit"), ("misses", "latency_cache_miss")):
+        stats = result[key]
+        if stats["count"]:
+            print(f"  {label:<9} p50={stats['p50_ms']}ms  p95={stats['p95_ms']}ms  "
+                  f"p99={stats['p99_ms']}ms  (n={stats['count']})")
+    print(f"  memory    sesiones nuevas={memory['new_sessions']}  "
+          f"estimado/sesión={memory['avg_estimated_session_bytes']}B  "
+          f"rss/sesión={memory['rss_per_new_session_bytes']}B")
+    print(f"  ollama    {result['ollama_calls']}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de /chat con Ollama simulado")
+    parser.add_argument("--requests", type=int, default=100, help="Consultas medidas por escenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hit-ratios", default="0,0.5,0.9", help="Porcentajes de aciertos separados por coma")
+    parser.add_argument("--hot-questions", type=int, default=20, help="Preguntas frecuentes usadas para los aciertos")
+    parser.add_argument("--corpus", type=Path, default=BENCHMARKS_DIR / "questions.txt")
+    parser.add_argument("--format-response", action="store_true", help="Incluir el paso de formateo")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia simulada por llamada de chat")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Velocidad de generación simulada")
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0, help="Latencia simulada por embedding")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Guardar resultados en JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"El corpus {args.corpus} está vacío")
+
+    fake_config = FakeOllamaConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        embed_latency_ms=args.embed_latency_ms,
+        models=[
+            os.environ.get("AGENTIC_MODEL_ID", "qwen3:8b"),
+            os.environ.get("AGENTIC_RESPONSE_MODEL", "qwen2.5:7b-instruct"),
+            os.environ.get("AGENTIC_EMBEDDER_MODEL", "nomic-embed-text:latest")
+        ]
+    )
+    fake_server = start_fake_ollama(config=fake_config)
+
+    # La configuración se lee al importar la aplicación
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{fake_server.server_port}"
+    os.environ.setdefault("AGENTIC_LOG_LEVEL", "WARNING")
+    os.environ.setdefault("AGENTIC_CACHE_ENABLED", "true")
+
+    port = free_port()
+    api_server, api_thread = start_api(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    results = []
+    try:
+        for hit_ratio in (float(value) for value in args.hit_ratios.split(",")):
+            result = asyncio.run(run_scenario(base_url, corpus, hit_ratio, args, fake_config))
+            print_report(result)
+            results.append(result)
+    finally:
+        api_server.should_exit = True
+        api_thread.join(timeout=30)
+        fake_server.shutdown()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,10 @@ Siguiendo el principio de Single Responsibility - solo maneja configuración.
 """
 
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
@@ -19,8 +22,16 @@ class Settings:
     # Database
     DB_URL: str = os.environ.get("AGENTIC_DB_URL", "postgresql+psycopg://ai:ai@localhost:5532/ai")
     
+    DB_POOL_SIZE: int = int(os.environ.get("AGENTIC_DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.environ.get("AGENTIC_DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.environ.get("AGENTIC_DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.environ.get("AGENTIC_DB_POOL_RECYCLE", "1800"))
+    
     # Ollama
     OLLAMA_HOST: str = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+    OLLAMA_TIMEOUT: float = float(os.environ.get("AGENTIC_OLLAMA_TIMEOUT", "300"))
+    OLLAMA_MAX_CONNECTIONS: int = int(os.environ.get("AGENTIC_OLLAMA_MAX_CONNECTIONS", "20"))
+    OLLAMA_KEEPALIVE_SECONDS: float = float(os.environ.get("AGENTIC_OLLAMA_KEEPALIVE_SECONDS", "60"))
     MODEL_ID: str = os.environ.get("AGENTIC_MODEL_ID", "qwen3:8b")
     EMBEDDER_MODEL: str = os.environ.get("AGENTIC_EMBEDDER_MODEL", "nomic-embed-text:latest")
     RESPONSE_MODEL: str = os.environ.get("AGENTIC_RESPONSE_MODEL", "qwen2.5:7b-instruct")
@@ -29,14 +40,60 @@ class Settings:
     CACHE_ENABLED: bool = os.environ.get("AGENTIC_CACHE_ENABLED", "true").lower() == "true"
     CACHE_SIMILARITY_THRESHOLD: float = float(os.environ.get("AGENTIC_CACHE_SIMILARITY_THRESHOLD", "0.88"))
     CACHE_TTL_HOURS: int = int(os.environ.get("AGENTIC_CACHE_TTL_HOURS", "24"))
+    CACHE_STALE_WHILE_REVALIDATE: bool = os.environ.get("AGENTIC_CACHE_STALE_WHILE_REVALIDATE", "false").lower() == "true"
+    CACHE_MAX_STALE_HOURS: int = int(os.environ.get("AGENTIC_CACHE_MAX_STALE_HOURS", "24"))
     CACHE_MAX_ENTRIES: int = int(os.environ.get("AGENTIC_CACHE_MAX_ENTRIES", "1000"))
+    CACHE_EXACT_MAX_ENTRIES: int = int(os.environ.get("AGENTIC_CACHE_EXACT_MAX_ENTRIES", "2048"))
+    CACHE_L1_MAX_ENTRIES: int = int(os.environ.get("AGENTIC_CACHE_L1_MAX_ENTRIES", "512"))
+    CACHE_SWEEP_INTERVAL_SECONDS: int = int(os.environ.get("AGENTIC_CACHE_SWEEP_INTERVAL_SECONDS", "300"))
+    CACHE_GENERATION_POLL_SECONDS: float = float(os.environ.get("AGENTIC_CACHE_GENERATION_POLL_SECONDS", "2"))
+    CACHE_WARM_CONCURRENCY: int = int(os.environ.get("AGENTIC_CACHE_WARM_CONCURRENCY", "2"))
+    CACHE_EVICTION_POLICY: str = os.environ.get("AGENTIC_CACHE_EVICTION_POLICY", "lru").lower()
+    
+    # Embeddings
+    EMBEDDING_MEMO_MAX_ENTRIES: int = int(os.environ.get("AGENTIC_EMBEDDING_MEMO_MAX_ENTRIES", "4096"))
+    EMBED_BATCH_SIZE: int = int(os.environ.get("AGENTIC_EMBED_BATCH_SIZE", "16"))
+    EMBED_MAX_IN_FLIGHT: int = int(os.environ.get("AGENTIC_EMBED_MAX_IN_FLIGHT", "4"))
+    EMBED_MAX_RETRIES: int = int(os.environ.get("AGENTIC_EMBED_MAX_RETRIES", "3"))
+    EMBED_RETRY_BACKOFF_SECONDS: float = float(os.environ.get("AGENTIC_EMBED_RETRY_BACKOFF_SECONDS", "0.5"))
+    
+    # Inference Executor
+    INFERENCE_MAX_CONCURRENCY: int = int(os.environ.get("AGENTIC_INFERENCE_MAX_CONCURRENCY", "4"))
+    INFERENCE_MAX_QUEUE_SIZE: int = int(os.environ.get("AGENTIC_INFERENCE_MAX_QUEUE_SIZE", "16"))
+    INFERENCE_RETRY_AFTER_SECONDS: int = int(os.environ.get("AGENTIC_INFERENCE_RETRY_AFTER_SECONDS", "10"))
+    
+    # Sessions
+    SESSION_MAX_ACTIVE: int = int(os.environ.get("AGENTIC_SESSION_MAX_ACTIVE", "200"))
+    SESSION_IDLE_TTL_SECONDS: int = int(os.environ.get("AGENTIC_SESSION_IDLE_TTL_SECONDS", "1800"))
+    
+    # Conversation History
+    HISTORY_TOKEN_BUDGET: int = int(os.environ.get("AGENTIC_HISTORY_TOKEN_BUDGET", "2000"))
+    
+    # Knowledge Retrieval
+    RETRIEVAL_MAX_QUERIES: int = int(os.environ.get("AGENTIC_RETRIEVAL_MAX_QUERIES", "5"))
+    RETRIEVAL_MAX_RESULTS: int = int(os.environ.get("AGENTIC_RETRIEVAL_MAX_RESULTS", "8"))
+    RETRIEVAL_MAX_WORKERS: int = int(os.environ.get("AGENTIC_RETRIEVAL_MAX_WORKERS", "8"))
+    RETRIEVAL_RRF_K: int = int(os.environ.get("AGENTIC_RETRIEVAL_RRF_K", "60"))
     
     # File Upload
     MAX_FILE_SIZE: int = int(os.environ.get("AGENTIC_MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # 10MB default
     ALLOWED_EXTENSIONS: set = {".pdf"}
+    UPLOAD_CHUNK_SIZE: int = int(os.environ.get("AGENTIC_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB por escritura
+    
+    # Document Ingestion
+    PDF_EXTRACT_WORKERS: int = int(os.environ.get("AGENTIC_PDF_EXTRACT_WORKERS", "0"))  # 0 = núcleos disponibles
+    PDF_PAGES_PER_TASK: int = int(os.environ.get("AGENTIC_PDF_PAGES_PER_TASK", "16"))
+    INGESTION_MAX_CONCURRENCY: int = int(os.environ.get("AGENTIC_INGESTION_MAX_CONCURRENCY", "1"))
+    INGESTION_EMBED_BATCH_SIZE: int = int(os.environ.get("AGENTIC_INGESTION_EMBED_BATCH_SIZE", "64"))
+    INGESTION_LEASE_SECONDS: int = int(os.environ.get("AGENTIC_INGESTION_LEASE_SECONDS", "300"))
+    INGESTION_POLL_INTERVAL_SECONDS: int = int(os.environ.get("AGENTIC_INGESTION_POLL_INTERVAL_SECONDS", "10"))
+    INGESTION_MAX_ATTEMPTS: int = int(os.environ.get("AGENTIC_INGESTION_MAX_ATTEMPTS", "3"))
     
     # Paths
     DOCS_PATH: Path = Path("docs")
+    # Temporales de los uploads en curso (fuera de DOCS_PATH; en el mismo
+    # sistema de archivos el paso a DOCS_PATH es un rename atómico)
+    UPLOAD_TMP_PATH: Path = Path(os.environ.get("AGENTIC_UPLOAD_TMP_PATH", "uploads_tmp"))
     
     # Logging
     LOG_LEVEL: str = os.environ.get("AGENTIC_LOG_LEVEL", "INFO").upper()
@@ -91,18 +148,33 @@ Base on the information below respond this question from user:
 class LogConfig:
     """Configuración de logging"""
     
-    @staticmethod
-    def setup_logging():
-        """Configura el sistema de logging"""
+    _listener = None
+    
+    @classmethod
+    def setup_logging(cls):
+        """
+        Configura el sistema de logging.
+        Los registros se encolan y un thread aparte los escribe en stdout,
+        para que las peticiones no esperen la escritura.
+        """
         settings = Settings()
         
-        logging.basicConfig(
-            level=getattr(logging, settings.LOG_LEVEL),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        if cls._listener is None:
+            stream_handler = logging.StreamHandler(sys.stdout)
+            stream_handler.setFormatter(
+                logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            )
+            log_queue = queue.SimpleQueue()
+            cls._listener = logging.handlers.QueueListener(log_queue, stream_handler)
+            cls._listener.start()
+            atexit.register(cls._listener.stop)
+            
+            logging.basicConfig(
+                level=getattr(logging, settings.LOG_LEVEL),
+                handlers=[
+                    logging.handlers.QueueHandler(log_queue)
+                ]
+            )
         
         # Configurar logging para phi
         phi_logger = logging.getLogger("phi")
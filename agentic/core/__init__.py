@@ -4,12 +4,22 @@ from .dependencies import (
     get_knowledge_service,
     get_agent_service,
     get_semantic_cache,
-    get_response_formatter
+    get_cache_sweeper,
+    get_cache_warmer,
+    get_ingestion_jobs,
+    get_response_formatter,
+    get_inference_executor,
+    get_request_coalescer
 )
 
 __all__ = [
     'get_knowledge_service',
     'get_agent_service',
     'get_semantic_cache',
-    'get_response_formatter'
+    'get_cache_sweeper',
+    'get_cache_warmer',
+    'get_ingestion_jobs',
+    'get_response_formatter',
+    'get_inference_executor',
+    'get_request_coalescer'
 ]
\ No newline at end of file
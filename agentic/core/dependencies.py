@@ -8,19 +8,34 @@ try:
     from services.agent_service import AgentService
     from services.knowledge_service import KnowledgeService
     from services.cache_service import SemanticCache
+    from services.cache_sweeper import CacheSweeper
+    from services.cache_warmer import CacheWarmer
+    from services.ingestion_jobs import IngestionJobs
+    from services.inference_executor import InferenceExecutor
+    from services.request_coalescer import RequestCoalescer
     from utils.formatting import ResponseFormatter
 except ImportError:
     # Relative imports for package execution
     from ..services.agent_service import AgentService
     from ..services.knowledge_service import KnowledgeService
     from ..services.cache_service import SemanticCache
+    from ..services.cache_sweeper import CacheSweeper
+    from ..services.cache_warmer import CacheWarmer
+    from ..services.ingestion_jobs import IngestionJobs
+    from ..services.inference_executor import InferenceExecutor
+    from ..services.request_coalescer import RequestCoalescer
     from ..utils.formatting import ResponseFormatter
 
 # Instancias singleton de servicios
 knowledge_service = None
 agent_service = None
 semantic_cache = None
+cache_sweeper = None
+cache_warmer = None
+ingestion_jobs = None
 response_formatter = None
+inference_executor = None
+request_coalescer = None
 
 
 def get_knowledge_service() -> KnowledgeService:
@@ -48,9 +63,49 @@ def get_semantic_cache() -> SemanticCache:
     return semantic_cache
 
 
+def get_cache_sweeper() -> CacheSweeper:
+    """Obtiene la instancia de la limpieza periódica del caché"""
+    global cache_sweeper
+    if cache_sweeper is None:
+        cache_sweeper = CacheSweeper(get_semantic_cache())
+    return cache_sweeper
+
+
+def get_cache_warmer() -> CacheWarmer:
+    """Obtiene la instancia de la precarga del caché"""
+    global cache_warmer
+    if cache_warmer is None:
+        cache_warmer = CacheWarmer(get_semantic_cache())
+    return cache_warmer
+
+
+def get_ingestion_jobs() -> IngestionJobs:
+    """Obtiene la instancia de la cola de indexación de documentos"""
+    global ingestion_jobs
+    if ingestion_jobs is None:
+        ingestion_jobs = IngestionJobs(get_knowledge_service(), get_semantic_cache())
+    return ingestion_jobs
+
+
 def get_response_formatter() -> ResponseFormatter:
     """Obtiene la instancia del formateador de respuestas"""
     global response_formatter
     if response_formatter is None:
         response_formatter = ResponseFormatter()
-    return response_formatter
\ No newline at end of file
+    return response_formatter
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Obtiene la instancia del ejecutor de inferencia"""
+    global inference_executor
+    if inference_executor is None:
+        inference_executor = InferenceExecutor()
+    return inference_executor
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """Obtiene la instancia del agrupador de consultas en curso"""
+    global request_coalescer
+    if request_coalescer is None:
+        request_coalescer = RequestCoalescer()
+    return request_coalescer
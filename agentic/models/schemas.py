@@ -60,12 +60,45 @@ class FileUploadResponse(BaseModel):
     message: str
     knowledge_base_updated: bool
     total_documents: int
+    job_id: Optional[str] = None
+    job_status: Optional[str] = None
+    duplicate_of: Optional[str] = None
+
+
+class IngestionJobResponse(BaseModel):
+    """Estado y avance de un trabajo de indexación"""
+    job_id: str
+    filename: str
+    original_filename: str
+    status: str
+    attempts: int
+    result: Optional[str] = None
+    pages_parsed: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_resumed: int
+    chunks_per_second: float
+    elapsed_seconds: Optional[float] = None
+    cache_entries_invalidated: Optional[int] = None
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    updated_at: str
+
+
+class IngestionJobListResponse(BaseModel):
+    """Response de listado de trabajos de indexación"""
+    jobs: List[IngestionJobResponse]
+    count: int
 
 
 class SessionListResponse(BaseModel):
     """Response de listado de sesiones"""
     active_sessions: List[str]
     count: int
+    sessions: List[Dict[str, Any]] = Field(default=[], description="Memoria y último acceso por sesión")
+    registry: Optional[Dict[str, Any]] = Field(default=None, description="Estadísticas del registro de sesiones")
 
 
 class DocumentListResponse(BaseModel):
@@ -79,6 +112,18 @@ class CacheStatsResponse(BaseModel):
     cache_enabled: bool
     stats: Dict[str, Any]
     configuration: Dict[str, Any]
+    coalescing: Optional[Dict[str, Any]] = Field(default=None, description="Consultas agrupadas con generaciones en curso")
+    embeddings: Optional[Dict[str, Any]] = Field(default=None, description="Estadísticas del memo de embeddings")
+    sweeper: Optional[Dict[str, Any]] = Field(default=None, description="Limpieza periódica por TTL y límite de entradas")
+    warmer: Optional[Dict[str, Any]] = Field(default=None, description="Progreso de la última precarga del caché")
+    telemetry: Optional[Dict[str, Any]] = Field(default=None, description="Estadísticas de todos los workers: resultados, latencias y distribución de similitud")
+
+
+class CacheWarmRequest(BaseModel):
+    """Request para precargar el caché con una lista de preguntas"""
+    questions: List[str] = Field(..., min_length=1, description="Preguntas a precargar (p. ej. exportadas del tráfico)")
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32, description="Generaciones simultáneas")
+    format_response: bool = Field(default=True, description="Guardar también la respuesta formateada")
 
 
 class CacheConfigRequest(BaseModel):
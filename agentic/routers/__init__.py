@@ -1,5 +1,5 @@
 """Routers de FastAPI"""
 
-from . import health, chat, documents, cache
+from . import health, chat, documents, cache, metrics
 
-__all__ = ['health', 'chat', 'documents', 'cache']
\ No newline at end of file
+__all__ = ['health', 'chat', 'documents', 'cache', 'metrics']
\ No newline at end of file
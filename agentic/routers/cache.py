@@ -3,28 +3,36 @@ Router para gestión del caché semántico.
 Siguiendo el principio de Single Responsibility.
 """
 
+import asyncio
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
 
 try:
     # Absolute imports for Docker/standalone execution
-    from models.schemas import CacheStatsResponse, CacheConfigRequest
-    from core.dependencies import get_semantic_cache
+    from models.schemas import CacheStatsResponse, CacheConfigRequest, CacheWarmRequest, ChatRequest
+    from core.dependencies import get_semantic_cache, get_request_coalescer, get_cache_sweeper, get_cache_warmer
     from config.settings import settings
+    from services.embedder import embedding_memo
+    from services.cache_warmer import CacheWarmerBusyError
+    from routers.chat import generate_with_coalescing
 except ImportError:
     # Relative imports for package execution
-    from ..models.schemas import CacheStatsResponse, CacheConfigRequest
-    from ..core.dependencies import get_semantic_cache
+    from ..models.schemas import CacheStatsResponse, CacheConfigRequest, CacheWarmRequest, ChatRequest
+    from ..core.dependencies import get_semantic_cache, get_request_coalescer, get_cache_sweeper, get_cache_warmer
     from ..config.settings import settings
+    from ..services.embedder import embedding_memo
+    from ..services.cache_warmer import CacheWarmerBusyError
+    from .chat import generate_with_coalescing
 
 router = APIRouter(prefix="/cache")
 
 
 @router.get("/stats", response_model=CacheStatsResponse)
-async def get_cache_stats():
+async def get_cache_stats(hours: Optional[int] = Query(default=None, gt=0, description="Limitar la telemetría a las últimas N horas")):
     """Obtener estadísticas del caché semántico"""
     semantic_cache = get_semantic_cache()
+    telemetry = await asyncio.to_thread(semantic_cache.telemetry.summary, hours)
     
     return CacheStatsResponse(
         cache_enabled=settings.CACHE_ENABLED,
@@ -32,11 +40,39 @@ async def get_cache_stats():
         configuration={
             "similarity_threshold": settings.CACHE_SIMILARITY_THRESHOLD,
             "ttl_hours": settings.CACHE_TTL_HOURS,
-            "max_entries": settings.CACHE_MAX_ENTRIES
-        }
+            "max_entries": settings.CACHE_MAX_ENTRIES,
+            "eviction_policy": settings.CACHE_EVICTION_POLICY,
+            "stale_while_revalidate": settings.CACHE_STALE_WHILE_REVALIDATE,
+            "max_stale_hours": settings.CACHE_MAX_STALE_HOURS
+        },
+        coalescing=get_request_coalescer().get_stats(),
+        embeddings=embedding_memo.get_stats(),
+        sweeper=get_cache_sweeper().get_stats(),
+        warmer=get_cache_warmer().get_status(),
+        telemetry=telemetry
     )
 
 
+@router.get("/threshold-analysis")
+async def threshold_analysis(
+    thresholds: List[float] = Query(default=[0.80, 0.82, 0.84, 0.86, 0.88, 0.90, 0.92, 0.94, 0.96]),
+    hours: Optional[int] = Query(default=None, gt=0)
+):
+    """
+    Estimar el hit rate con otros valores de CACHE_SIMILARITY_THRESHOLD a
+    partir de la distribución de scores observada en todos los workers.
+    """
+    if any(not 0.0 <= threshold <= 1.0 for threshold in thresholds):
+        raise HTTPException(status_code=400, detail="Los umbrales deben estar entre 0 y 1")
+    
+    semantic_cache = get_semantic_cache()
+    analysis = await asyncio.to_thread(semantic_cache.telemetry.what_if, sorted(thresholds), hours)
+    return {
+        **analysis,
+        "current_threshold": semantic_cache.similarity_threshold
+    }
+
+
 @router.post("/clear")
 async def clear_cache():
     """Limpiar todo el caché semántico"""
@@ -55,6 +91,36 @@ async def clear_cache():
         raise HTTPException(status_code=500, detail=f"Error limpiando caché: {str(e)}")
 
 
+@router.post("/warm", status_code=202)
+async def warm_cache(request: CacheWarmRequest):
+    """
+    Precargar el caché con una lista de preguntas. Las preguntas que ya tienen
+    una entrada vigente se omiten; las demás pasan por el mismo pipeline que
+    /chat en segundo plano. El progreso se consulta en GET /cache/warm.
+    """
+    if not settings.CACHE_ENABLED:
+        raise HTTPException(status_code=400, detail="El caché semántico está deshabilitado")
+    
+    async def generate(question: str):
+        result, _ = await generate_with_coalescing(ChatRequest(
+            message=question,
+            search_knowledge=True,
+            format_response=request.format_response
+        ), stateless=True)
+        return result
+    
+    try:
+        return get_cache_warmer().start(request.questions, generate, concurrency=request.concurrency)
+    except CacheWarmerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/warm")
+async def get_warm_status():
+    """Progreso y throughput de la última precarga del caché"""
+    return get_cache_warmer().get_status()
+
+
 @router.post("/toggle")
 async def toggle_cache(enabled: bool):
     """Habilitar o deshabilitar el caché semántico"""
@@ -3,8 +3,15 @@ Router para endpoints de chat.
 Siguiendo el principio de Single Responsibility.
 """
 
+import asyncio
+import json
+import logging
+import time
+import uuid
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 try:
     # Absolute imports for Docker/standalone execution
@@ -12,24 +19,346 @@ try:
     from core.dependencies import (
         get_agent_service, 
         get_semantic_cache, 
-        get_response_formatter
+        get_response_formatter,
+        get_inference_executor,
+        get_request_coalescer
     )
-    from utils.text_processing import extract_document_references, remove_think_blocks
-    from utils.validators import check_ollama_tools_support
+    from services.inference_executor import InferenceQueueFullError
+    from utils.text_processing import extract_document_references, remove_think_blocks, ThinkBlockFilter
     from config.settings import settings
+    from utils.metrics import track_stage, CACHE_REVALIDATIONS, REQUEST_DURATION, STAGE_REFERENCE_EXTRACTION
 except ImportError:
     # Relative imports for package execution
     from ..models.schemas import ChatRequest, ChatResponse, Message, DocumentReference
     from ..core.dependencies import (
         get_agent_service, 
         get_semantic_cache, 
-        get_response_formatter
+        get_response_formatter,
+        get_inference_executor,
+        get_request_coalescer
     )
-    from ..utils.text_processing import extract_document_references, remove_think_blocks
-    from ..utils.validators import check_ollama_tools_support
+    from ..services.inference_executor import InferenceQueueFullError
+    from ..utils.text_processing import extract_document_references, remove_think_blocks, ThinkBlockFilter
     from ..config.settings import settings
+    from ..utils.metrics import track_stage, CACHE_REVALIDATIONS, REQUEST_DURATION, STAGE_REFERENCE_EXTRACTION
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Regeneraciones de entradas stale en curso (se guarda la referencia de cada tarea)
+_revalidation_tasks: Set[asyncio.Task] = set()
+
+
+def _queue_full_exception(error: InferenceQueueFullError) -> HTTPException:
+    """Construye la respuesta 503 cuando la cola de inferencia está llena"""
+    return HTTPException(
+        status_code=503,
+        detail="Servicio saturado, intente nuevamente más tarde",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _references_from_cache(cached_response: Dict[str, Any]) -> List[DocumentReference]:
+    """Reconstruye las referencias de documentos de una entrada del caché"""
+    return [
+        DocumentReference(
+            document_name=ref['document_name'],
+            pages=ref['pages']
+        ) for ref in cached_response.get('document_references', [])
+    ]
+
+
+def _build_chat_response(request: ChatRequest, session_id: str, response_text: str,
+                         formatted_response: str, document_references: List[DocumentReference],
+                         sources: List, formatted: bool, cached_response: Optional[Dict[str, Any]] = None,
+                         coalesced: bool = False) -> ChatResponse:
+    """Construye la respuesta del endpoint de chat"""
+    semantic_cache = get_semantic_cache()
+    cache_used = cached_response is not None
+    
+    # Actualizar historial
+    updated_messages = request.messages.copy() if request.messages else []
+    updated_messages.append(Message(role="user", content=request.message))
+    updated_messages.append(Message(role="assistant", content=formatted_response))
+    
+    # Log resumen
+    logger.info(
+        "chat completado session=%s cache_used=%s coalesced=%s references=%d sources=%d "
+        "original_length=%d formatted_length=%d",
+        session_id[:8], cache_used, coalesced, len(document_references), len(sources),
+        len(response_text), len(formatted_response)
+    )
+    
+    return ChatResponse(
+        response=formatted_response,
+        session_id=session_id,
+        sources=sources,
+        document_references=document_references,
+        messages=updated_messages,
+        metadata={
+            "model": settings.MODEL_ID,
+            "knowledge_search": request.search_knowledge,
+            "timestamp": datetime.now().isoformat(),
+            "formatted": formatted,
+            "original_length": len(response_text),
+            "formatted_length": len(formatted_response),
+            "references_found": len(document_references),
+            "cache_used": cache_used,
+            "cache_similarity": cached_response["similarity"] if cache_used else None,
+            "cache_stale": cached_response.get("stale", False) if cache_used else False,
+            "coalesced": coalesced,
+            "cache_stats": semantic_cache.get_stats() if settings.CACHE_ENABLED else None
+        }
+    )
+
+
+async def _serve_cached_response(request: ChatRequest, cached_response: Dict[str, Any]) -> ChatResponse:
+    """
+    Camino rápido para aciertos del caché: no crea agentes, no toca el
+    storage de sesiones y reutiliza la respuesta formateada almacenada.
+    """
+    response_formatter = get_response_formatter()
+    session_id = request.session_id or str(uuid.uuid4())
+    response_text = cached_response["response"]
+    document_references = _references_from_cache(cached_response)
+    
+    logger.debug("usando respuesta cacheada references=%d", len(document_references))
+    
+    response_with_refs, _ = extract_document_references(response_text)
+    formatted_response = remove_think_blocks(response_with_refs)
+    formatted = request.format_response and request.search_knowledge
+    
+    if formatted:
+        cached_formatted = cached_response.get("formatted_response")
+        if cached_formatted and cached_response.get("formatting_prompt_hash") == response_formatter.prompt_hash:
+            formatted_response = cached_formatted
+        else:
+            # Entrada sin formateo almacenado (o con otro prompt): formatear una vez
+            try:
+                formatted_response = await get_inference_executor().run(
+                    response_formatter.format_response,
+                    request.message,
+                    response_text
+                )
+            except InferenceQueueFullError:
+                logger.warning("cola de inferencia llena, se omite el formateo")
+                formatted = False
+    
+    sources = cached_response.get('metadata', {}).get('sources', [])
+    
+    return _build_chat_response(
+        request, session_id, response_text, formatted_response,
+        document_references, sources, formatted, cached_response
+    )
+
+
+async def _generate_response(request: ChatRequest, stateless: bool = False) -> Dict[str, Any]:
+    """
+    Ejecuta el agente, extrae referencias, formatea y almacena en caché.
+    
+    Con `stateless` (generaciones internas como la precarga del caché) se usa
+    un agente efímero: no se registra como sesión activa ni se persiste.
+    
+    Returns:
+        Diccionario con el resultado de la generación, compartible entre
+        consultas agrupadas
+    """
+    agent_service = get_agent_service()
+    semantic_cache = get_semantic_cache()
+    response_formatter = get_response_formatter()
+    inference_executor = get_inference_executor()
+    use_cache = settings.CACHE_ENABLED and request.search_knowledge and not request.stream
+    context = request.message
+    
+    # Obtener o crear agente para la sesión (fuera del event loop: construir
+    # el agente y rehidratar la sesión desde storage es bloqueante)
+    if stateless:
+        agent = await asyncio.to_thread(agent_service.create_stateless_agent)
+        session_id = agent.session_id
+    else:
+        agent, session_id = await asyncio.to_thread(
+            agent_service.get_or_create_agent,
+            request.session_id, 
+            request.messages
+        )
+    logger.debug("agente listo session=%s stateless=%s", session_id[:8], stateless)
+    
+    # Configurar búsqueda en knowledge base
+    if request.search_knowledge and not agent_service.ollama_supports_tools:
+        logger.warning("Knowledge base search requested but ollama doesn't support tools.")
+        agent.search_knowledge = False
+    else:
+        agent.search_knowledge = request.search_knowledge
+    
+    # Ejecutar el agente
+    response = None
+    try:
+        if stateless:
+            response_obj = await inference_executor.run(agent_service.run_stateless_agent, agent, context)
+        else:
+            response_obj = await inference_executor.run(
+                agent_service.run_agent, session_id, context, request.stream
+            )
+        
+        if request.stream:
+            response_text = response_obj
+        else:
+            response = response_obj
+            response_text = response_obj.content if hasattr(response_obj, 'content') else str(response_obj)
+            
+    except InferenceQueueFullError as queue_error:
+        raise _queue_full_exception(queue_error)
+    except Exception as agent_error:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error ejecutando el agente: {str(agent_error)}"
+        )
+    
+    logger.debug("respuesta generada length=%d", len(response_text))
+    
+    # Extraer referencias
+    with track_stage(STAGE_REFERENCE_EXTRACTION):
+        response_with_refs, document_references = extract_document_references(response_text)
+    
+    # Log de documentos
+    if logger.isEnabledFor(logging.DEBUG):
+        for ref in document_references:
+            logger.debug("documento consultado name=%s pages=%s", ref.document_name, ref.pages)
+    if not document_references:
+        logger.debug("no se encontraron referencias a documentos")
+    
+    # Limpiar y formatear respuesta
+    response_with_refs = remove_think_blocks(response_with_refs)
+    
+    # Aplicar formateo si está habilitado
+    formatted_response = response_with_refs
+    formatted = request.format_response and request.search_knowledge
+    if formatted:
+        try:
+            formatted_response = await inference_executor.run(
+                response_formatter.format_response,
+                request.message, 
+                response_text
+            )
+        except InferenceQueueFullError:
+            logger.warning("cola de inferencia llena, se omite el formateo")
+            formatted = False
+    
+    # Extraer fuentes
+    sources = []
+    if response and hasattr(response, 'sources'):
+        sources = response.sources or []
+    
+    # Almacenar en caché junto con la respuesta formateada
+    cached = False
+    if use_cache:
+        cache_metadata = {
+            "session_id": session_id,
+            "model": settings.MODEL_ID,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        if sources:
+            cache_metadata["sources"] = sources
+        
+        cached = await semantic_cache.store(
+            query=request.message,
+            response=response_text,
+            context=context[:500],
+            metadata=cache_metadata,
+            document_references=document_references,
+            formatted_response=formatted_response if formatted else None,
+            formatting_prompt_hash=response_formatter.prompt_hash if formatted else None
+        )
+    
+    return {
+        "session_id": session_id,
+        "response_text": response_text,
+        "formatted_response": formatted_response,
+        "formatted": formatted,
+        "document_references": document_references,
+        "sources": sources,
+        "cached": cached
+    }
+
+
+def _coalescing_group(request: ChatRequest, stateless: bool) -> Optional[str]:
+    """
+    Grupo dentro del cual una consulta puede compartir la generación de otra.
+    
+    La respuesta depende del historial del agente que la genera, así que solo
+    se comparte entre consultas sin historial propio (sin sesión ni mensajes),
+    entre repeticiones de la misma sesión o entre generaciones internas
+    (stateless), nunca entre esas categorías.
+    
+    Returns:
+        Clave del grupo, o None si la consulta no debe agruparse
+    """
+    options = f"format={request.format_response}"
+    if stateless:
+        return f"stateless::{options}"
+    if request.session_id:
+        return f"session={request.session_id}::{options}"
+    if request.messages:
+        # Historial enviado por el cliente sin sesión: respuesta propia
+        return None
+    return f"anonymous::{options}"
+
+
+async def generate_with_coalescing(request: ChatRequest, stateless: bool = False) -> Tuple[Dict[str, Any], bool]:
+    """
+    Genera la respuesta compartiendo la generación con consultas
+    equivalentes en curso del mismo grupo (ver _coalescing_group y
+    _generate_response para `stateless`).
+    
+    Returns:
+        (resultado de _generate_response, si se reutilizó otra generación)
+    """
+    group = _coalescing_group(request, stateless)
+    if group is None:
+        return await _generate_response(request, stateless=stateless), False
+    semantic_cache = get_semantic_cache()
+    return await get_request_coalescer().run(
+        request.message,
+        lambda: _generate_response(request, stateless=stateless),
+        group=group,
+        embed_fn=semantic_cache.embed_query,
+        is_compatible=semantic_cache.queries_are_compatible
+    )
+
+
+async def _revalidate_cached_entry(cached_response: Dict[str, Any], format_response: bool):
+    """
+    Regenera una entrada stale del caché con un agente efímero (sin sesión);
+    store() reemplaza la fila existente.
+    """
+    semantic_cache = get_semantic_cache()
+    original_query = cached_response["original_query"]
+    try:
+        await _generate_response(ChatRequest(
+            message=original_query,
+            search_knowledge=True,
+            format_response=format_response
+        ), stateless=True)
+        CACHE_REVALIDATIONS.labels(outcome="success").inc()
+        logger.info("cache entrada regenerada entry=%s query=%r", cached_response["entry_id"][:8], original_query[:50])
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        CACHE_REVALIDATIONS.labels(outcome="error").inc()
+        logger.warning(f"⚠️ No se pudo regenerar la entrada stale del caché: {detail}")
+    finally:
+        semantic_cache.end_revalidation(cached_response["entry_id"])
+
+
+def _schedule_revalidation(cached_response: Dict[str, Any], format_response: bool):
+    """Lanza en segundo plano la regeneración de un acierto stale (una por entrada)"""
+    if not cached_response.get("stale"):
+        return
+    if not get_semantic_cache().begin_revalidation(cached_response["entry_id"]):
+        return
+    task = asyncio.create_task(_revalidate_cached_entry(cached_response, format_response))
+    _revalidation_tasks.add(task)
+    task.add_done_callback(_revalidation_tasks.discard)
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -38,180 +367,181 @@ async def chat(request: ChatRequest):
     Endpoint principal para consultas al knowledge base.
     Soporta historial de conversación y sesiones persistentes.
     """
+    started_at = time.perf_counter()
+    outcome = "error"
     try:
-        agent_service = get_agent_service()
         semantic_cache = get_semantic_cache()
-        response_formatter = get_response_formatter()
-        
-        # Obtener o crear agente para la sesión
-        agent, session_id = agent_service.get_or_create_agent(
-            request.session_id, 
-            request.messages
-        )
-        
+        use_cache = settings.CACHE_ENABLED and request.search_knowledge and not request.stream
         context = request.message
         
-        # Configurar búsqueda en knowledge base
-        ollama_supports_tools = check_ollama_tools_support()
-        if request.search_knowledge and not ollama_supports_tools:
-            print("⚠️ Knowledge base search requested but ollama doesn't support tools.")
-            agent.search_knowledge = False
-        else:
-            agent.search_knowledge = request.search_knowledge
-        
-        print(f"\n{'='*60}")
-        print(f"🔍 Procesando consulta: {request.message[:300]}...")
-        print(f"📚 Búsqueda en knowledge base: {request.search_knowledge}")
-        print(f"🆔 Session ID: {session_id[:8]}...")
-        
-        # Intentar obtener del caché
-        cached_response = None
-        cache_used = False
-        response = None
-        document_references = []
+        logger.debug(
+            "procesando consulta search_knowledge=%s message=%r",
+            request.search_knowledge, request.message[:300]
+        )
         
-        if settings.CACHE_ENABLED and request.search_knowledge and not request.stream:
+        # Camino rápido: consultar el caché antes de crear el agente
+        if use_cache:
             cached_response = await semantic_cache.find_similar(
                 query=request.message,
                 context=context[:500]
             )
-            
             if cached_response:
-                response_text = cached_response["response"]
-                cache_used = True
-                
-                # Reconstruir references desde caché
-                if 'document_references' in cached_response:
-                    cached_refs = cached_response['document_references']
-                    document_references = [
-                        DocumentReference(
-                            document_name=ref['document_name'],
-                            pages=ref['pages']
-                        ) for ref in cached_refs
-                    ]
-                    print(f"🚀 Usando respuesta cacheada")
-                    print(f"   Referencias recuperadas: {len(document_references)} documentos")
-                else:
-                    cache_used = False
-                    print("⚠️ Cache sin referencias, ejecutando agente...")
+                _schedule_revalidation(cached_response, request.format_response)
+                chat_response = await _serve_cached_response(request, cached_response)
+                outcome = "cache_hit"
+                return chat_response
         
-        # Si no hay caché, ejecutar el agente
-        if not cache_used:
-            try:
-                response_obj = agent_service.run_agent(session_id, context, request.stream)
-                
-                if request.stream:
-                    response_text = response_obj
-                else:
-                    response = response_obj
-                    response_text = response_obj.content if hasattr(response_obj, 'content') else str(response_obj)
-                    
-            except Exception as agent_error:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error ejecutando el agente: {str(agent_error)}"
-                )
-            
-            print(f"✅ Respuesta generada - Longitud: {len(response_text)} caracteres")
-            
-            # Extraer referencias
-            response_with_refs, document_references = extract_document_references(response_text)
+        if use_cache:
+            result, coalesced = await generate_with_coalescing(request)
         else:
-            response_with_refs = response_text
-            print(f"✅ Respuesta del caché - Longitud: {len(response_text)} caracteres")
+            result, coalesced = await _generate_response(request), False
         
-        # Almacenar en caché si es necesario
-        if not cache_used and settings.CACHE_ENABLED and request.search_knowledge and not request.stream:
-            cache_metadata = {
-                "session_id": session_id,
-                "model": settings.MODEL_ID,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            if response and hasattr(response, 'sources'):
-                cache_metadata["sources"] = response.sources
-            
-            await semantic_cache.store(
-                query=request.message,
-                response=response_text,
-                context=context[:500],
-                metadata=cache_metadata,
-                document_references=document_references
-            )
-        
-        # Log de documentos
-        if document_references:
-            print(f"\n📄 Documentos consultados ({len(document_references)} documentos):")
-            for ref in document_references:
-                pages_str = ', '.join(map(str, ref.pages))
-                print(f"   - {ref.document_name}: Páginas {pages_str}")
-        else:
-            print("⚠️ No se encontraron referencias a documentos")
+        session_id = result["session_id"]
+        if coalesced and not request.session_id:
+            # Consulta anónima agrupada: sesión nueva, como en los aciertos del caché
+            session_id = str(uuid.uuid4())
         
-        # Limpiar y formatear respuesta
-        response_with_refs = remove_think_blocks(response_with_refs)
-        
-        # Aplicar formateo si está habilitado
-        formatted_response = response_with_refs
-        if request.format_response and request.search_knowledge:
-            formatted_response = response_formatter.format_response(
-                request.message, 
-                response_text
+        chat_response = _build_chat_response(
+            request, session_id, result["response_text"], result["formatted_response"],
+            result["document_references"], result["sources"], result["formatted"],
+            coalesced=coalesced
+        )
+        outcome = "coalesced" if coalesced else "generated"
+        return chat_response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error procesando consulta: {str(e)}")
+    finally:
+        REQUEST_DURATION.labels(endpoint="chat", outcome=outcome).observe(time.perf_counter() - started_at)
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Serializa un evento en formato Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Endpoint de chat con streaming token a token vía Server-Sent Events.
+    
+    Emite eventos `token` con el texto visible (sin bloques <think>) a medida
+    que Ollama lo genera y un evento final `done` con las referencias de
+    documentos y la metadata de la respuesta.
+    """
+    semantic_cache = get_semantic_cache()
+    context = request.message
+    use_cache = settings.CACHE_ENABLED and request.search_knowledge
+    
+    # Camino rápido: consultar el caché antes de crear el agente
+    cached_response = None
+    if use_cache:
+        cached_response = await semantic_cache.find_similar(
+            query=request.message,
+            context=context[:500]
+        )
+    
+    token_stream = None
+    if cached_response:
+        _schedule_revalidation(cached_response, request.format_response)
+        session_id = request.session_id or str(uuid.uuid4())
+    else:
+        agent_service = get_agent_service()
+        inference_executor = get_inference_executor()
+        try:
+            inference_executor.check_capacity()
+        except InferenceQueueFullError as queue_error:
+            raise _queue_full_exception(queue_error)
+        try:
+            agent, session_id = await asyncio.to_thread(
+                agent_service.get_or_create_agent,
+                request.session_id,
+                request.messages
             )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error procesando consulta: {str(e)}")
         
-        # Actualizar historial
-        updated_messages = request.messages.copy() if request.messages else []
-        updated_messages.append(Message(role="user", content=request.message))
-        updated_messages.append(Message(role="assistant", content=formatted_response))
-        
-        # Extraer fuentes
-        sources = []
-        if response and hasattr(response, 'sources'):
-            sources = response.sources
-            if sources:
-                print(f"\n🔎 Fuentes del agente ({len(sources)} fuentes)")
-        elif cache_used and cached_response and 'metadata' in cached_response:
-            sources = cached_response['metadata'].get('sources', [])
-        
-        # Log resumen
-        print(f"\n{'='*60}")
-        print(f"📊 Resumen de la respuesta:")
-        print(f"   - Longitud original: {len(response_text)} caracteres")
-        print(f"   - Longitud formateada: {len(formatted_response)} caracteres")
-        print(f"   - Referencias encontradas: {len(document_references)}")
-        print(f"   - Fuentes del agente: {len(sources)}")
-        print(f"   - 🚀 Caché usado: {'SÍ' if cache_used else 'NO'}")
-        
-        if settings.CACHE_ENABLED:
-            cache_stats = semantic_cache.get_stats()
-            print(f"   - 📈 Cache Hit Rate: {cache_stats['hit_rate']}")
-            print(f"   - 📊 Total consultas: {cache_stats['total_queries']}")
-        print(f"{'='*60}\n")
-        
-        return ChatResponse(
-            response=formatted_response,
-            session_id=session_id,
-            sources=sources,
-            document_references=document_references,
-            messages=updated_messages,
-            metadata={
+        agent.search_knowledge = request.search_knowledge and agent_service.ollama_supports_tools
+        # El lugar en la cola se reserva al empezar a iterar el stream
+        token_stream = inference_executor.stream(agent_service.stream_agent, session_id, context)
+    
+    def build_done_event(response_text: str, document_references: list, cache_used: bool) -> str:
+        return _sse_event("done", {
+            "session_id": session_id,
+            "response": remove_think_blocks(response_text),
+            "document_references": [ref.model_dump() for ref in document_references],
+            "metadata": {
                 "model": settings.MODEL_ID,
                 "knowledge_search": request.search_knowledge,
                 "timestamp": datetime.now().isoformat(),
-                "formatted": request.format_response and request.search_knowledge,
+                "formatted": False,
                 "original_length": len(response_text),
-                "formatted_length": len(formatted_response),
                 "references_found": len(document_references),
                 "cache_used": cache_used,
-                "cache_similarity": cached_response["similarity"] if cache_used and cached_response else None,
-                "cache_stats": semantic_cache.get_stats() if settings.CACHE_ENABLED else None
+                "cache_similarity": cached_response["similarity"] if cache_used else None,
+                "cache_stale": cached_response.get("stale", False) if cache_used else False
             }
-        )
+        })
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error procesando consulta: {str(e)}")
+    async def event_generator():
+        if cached_response:
+            response_text, _ = extract_document_references(cached_response["response"])
+            document_references = _references_from_cache(cached_response)
+            yield _sse_event("token", {"content": remove_think_blocks(response_text)})
+            yield build_done_event(response_text, document_references, cache_used=True)
+            return
+        
+        think_filter = ThinkBlockFilter()
+        chunks = []
+        try:
+            async for chunk in token_stream:
+                chunks.append(chunk)
+                visible = think_filter.feed(chunk)
+                if visible:
+                    yield _sse_event("token", {"content": visible})
+            tail = think_filter.flush()
+            if tail:
+                yield _sse_event("token", {"content": tail})
+        except InferenceQueueFullError as queue_error:
+            # La cola se llenó entre la verificación y el inicio del stream
+            yield _sse_event("error", {
+                "detail": "Servicio saturado, intente nuevamente más tarde",
+                "retry_after": queue_error.retry_after
+            })
+            return
+        except Exception as agent_error:
+            yield _sse_event("error", {"detail": f"Error ejecutando el agente: {str(agent_error)}"})
+            return
+        
+        response_text = "".join(chunks)
+        with track_stage(STAGE_REFERENCE_EXTRACTION):
+            response_with_refs, document_references = extract_document_references(response_text)
+        
+        if use_cache:
+            await semantic_cache.store(
+                query=request.message,
+                response=response_text,
+                context=context[:500],
+                metadata={
+                    "session_id": session_id,
+                    "model": settings.MODEL_ID,
+                    "timestamp": datetime.now().isoformat()
+                },
+                document_references=document_references
+            )
+        
+        yield build_done_event(response_with_refs, document_references, cache_used=False)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 @router.post("/chat/simple")
@@ -221,8 +551,9 @@ async def simple_chat(message: str):
     """
     try:
         agent_service = get_agent_service()
-        agent, session_id = agent_service.get_or_create_agent()
-        response = agent_service.run_agent(session_id, message)
+        inference_executor = get_inference_executor()
+        agent, session_id = await asyncio.to_thread(agent_service.get_or_create_agent)
+        response = await inference_executor.run(agent_service.run_agent, session_id, message)
         response_text = response.content if hasattr(response, 'content') else str(response)
         
         return {
@@ -230,5 +561,7 @@ async def simple_chat(message: str):
             "timestamp": datetime.now().isoformat()
         }
     
+    except InferenceQueueFullError as queue_error:
+        raise _queue_full_exception(queue_error)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error procesando consulta: {str(e)}")
\ No newline at end of file
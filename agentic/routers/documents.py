@@ -3,30 +3,57 @@ Router para gestión de documentos.
 Siguiendo el principio de Single Responsibility.
 """
 
+import asyncio
+import logging
 import shutil
 from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
 try:
     # Absolute imports for Docker/standalone execution
-    from models.schemas import DocumentListResponse, FileUploadResponse
-    from core.dependencies import get_knowledge_service, get_semantic_cache, get_agent_service
+    from models.schemas import (
+        DocumentListResponse, FileUploadResponse, IngestionJobResponse, IngestionJobListResponse
+    )
+    from core.dependencies import get_knowledge_service, get_semantic_cache, get_agent_service, get_ingestion_jobs
     from config.settings import settings
+    from utils.uploads import stream_multipart_to_temp, FileTooLargeError, InvalidUploadError
 except ImportError:
     # Relative imports for package execution
-    from ..models.schemas import DocumentListResponse, FileUploadResponse
-    from ..core.dependencies import get_knowledge_service, get_semantic_cache, get_agent_service
+    from ..models.schemas import (
+        DocumentListResponse, FileUploadResponse, IngestionJobResponse, IngestionJobListResponse
+    )
+    from ..core.dependencies import get_knowledge_service, get_semantic_cache, get_agent_service, get_ingestion_jobs
     from ..config.settings import settings
+    from ..utils.uploads import stream_multipart_to_temp, FileTooLargeError, InvalidUploadError
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# El cuerpo se lee a mano (ver upload_pdf); se documenta el formulario para OpenAPI
+_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
 
 @router.get("/documents", response_model=DocumentListResponse)
 async def list_documents():
     """Listar documentos cargados en el knowledge base"""
     knowledge_service = get_knowledge_service()
-    docs = knowledge_service.get_documents_list()
+    docs = await asyncio.to_thread(knowledge_service.get_documents_list)
     
     return DocumentListResponse(
         documents=docs,
@@ -34,29 +61,45 @@ async def list_documents():
     )
 
 
-@router.post("/upload-pdf", response_model=FileUploadResponse)
-async def upload_pdf(file: UploadFile = File(...)):
+def _validate_extension(filename: str):
+    """Rechaza el archivo antes de recibir su contenido si no es PDF"""
+    if Path(filename).suffix.lower() not in settings.ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail="Tipo de archivo no permitido. Solo se aceptan archivos PDF."
+        )
+
+
+@router.post("/upload-pdf", response_model=FileUploadResponse, status_code=202, openapi_extra=_UPLOAD_REQUEST_BODY)
+async def upload_pdf(request: Request, response: Response):
     """
-    Subir un archivo PDF y actualizar la base de conocimiento.
+    Subir un archivo PDF (campo `file` de un formulario multipart) y encolar
+    su indexación.
+    
+    El cuerpo se lee de request.stream() y el archivo se escribe a disco a
+    medida que llega (memoria constante, sin que Starlette lo guarde antes
+    completo); se responde de inmediato con el id del trabajo y el avance se
+    consulta en GET /jobs/{job_id}. Si el mismo contenido ya está indexado
+    no se guarda.
     """
+    too_large_detail = f"Archivo demasiado grande. Tamaño máximo: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+    temp_path = None
     try:
-        # Validar extensión
-        file_extension = Path(file.filename).suffix.lower()
-        if file_extension not in settings.ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail="Tipo de archivo no permitido. Solo se aceptan archivos PDF."
-            )
-        
-        # Validar tamaño
-        contents = await file.read()
-        file_size = len(contents)
-        
-        if file_size > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Archivo demasiado grande. Tamaño máximo: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+        # Copiar a un temporal fuera de DOCS_PATH validando extensión y tamaño
+        # (un Content-Length mayor se rechaza sin leer el cuerpo) y calculando
+        # el hash en la misma pasada
+        try:
+            upload = await stream_multipart_to_temp(
+                request, "file", settings.UPLOAD_TMP_PATH, settings.MAX_FILE_SIZE,
+                settings.UPLOAD_CHUNK_SIZE, on_filename=_validate_extension
             )
+        except FileTooLargeError:
+            raise HTTPException(status_code=413, detail=too_large_detail)
+        except InvalidUploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        temp_path = upload.path
+        file_size = upload.size
+        filename = Path(upload.filename).name
         
         if file_size == 0:
             raise HTTPException(
@@ -64,65 +107,92 @@ async def upload_pdf(file: UploadFile = File(...)):
                 detail="El archivo está vacío"
             )
         
-        # Crear directorio si no existe
-        settings.DOCS_PATH.mkdir(exist_ok=True)
+        knowledge_service = get_knowledge_service()
+        
+        # Mismo contenido ya indexado: no se guarda ni se reindexa
+        duplicate = await asyncio.to_thread(knowledge_service.manifest.find_by_hash, upload.sha256)
+        if duplicate and (settings.DOCS_PATH / duplicate["filename"]).exists():
+            logger.info(f"Archivo {filename} idéntico a {duplicate['filename']}, no se reindexa")
+            response.status_code = 200
+            return FileUploadResponse(
+                filename=filename,
+                size=file_size,
+                message=f"El contenido de '{filename}' ya está indexado como '{duplicate['filename']}'",
+                knowledge_base_updated=False,
+                total_documents=knowledge_service.get_document_count(),
+                duplicate_of=duplicate["filename"]
+            )
         
         # Generar nombre único
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_filename = f"{timestamp}_{file.filename}".replace(" ", "_")
+        safe_filename = f"{timestamp}_{filename}".replace(" ", "_")
         file_path = settings.DOCS_PATH / safe_filename
         
         # Verificar si existe
-        original_path = settings.DOCS_PATH / file.filename
+        original_path = settings.DOCS_PATH / filename
         if original_path.exists():
-            backup_path = settings.DOCS_PATH / f"backup_{timestamp}_{file.filename}"
+            backup_path = settings.DOCS_PATH / f"backup_{timestamp}_{filename}"
             shutil.move(str(original_path), str(backup_path))
-            print(f"Archivo existente movido a: {backup_path}")
-        
-        # Guardar archivo
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
+            logger.info(f"Archivo existente movido a: {backup_path}")
         
-        print(f"Archivo guardado: {file_path}")
+        # Mover el temporal a su nombre final (rename atómico si UPLOAD_TMP_PATH
+        # está en el mismo sistema de archivos; si no, se copia)
+        await asyncio.to_thread(shutil.move, str(temp_path), str(file_path))
+        temp_path = None
         
-        # Actualizar knowledge base
-        knowledge_service = get_knowledge_service()
-        semantic_cache = get_semantic_cache()
-        agent_service = get_agent_service()
+        logger.info(f"Archivo guardado: {file_path} sha256={upload.sha256}")
         
-        try:
-            knowledge_service.add_document(file_path)
-            print("Knowledge base actualizado exitosamente")
-            
-            # Limpiar caché
-            if semantic_cache.enabled:
-                await semantic_cache.clear()
-                print("Caché semántico limpiado")
-            
-            # Limpiar agentes
-            agent_service.clear_all_agents()
-            
-            kb_updated = True
-        except Exception as kb_error:
-            print(f"Advertencia: Error actualizando knowledge base: {kb_error}")
-            kb_updated = False
+        # Encolar la indexación; el worker invalida las respuestas cacheadas
+        # que citan una versión anterior del documento al terminar
+        ingestion_jobs = get_ingestion_jobs()
+        job = await asyncio.to_thread(ingestion_jobs.submit, safe_filename, filename)
+        ingestion_jobs.notify()
+        logger.info(f"Indexación encolada job={job['job_id']} file={safe_filename}")
         
         return FileUploadResponse(
-            filename=file.filename,
+            filename=filename,
             size=file_size,
-            message=f"Archivo '{file.filename}' subido exitosamente",
-            knowledge_base_updated=kb_updated,
-            total_documents=knowledge_service.get_document_count()
+            message=f"Archivo '{filename}' subido exitosamente, indexación en cola",
+            knowledge_base_updated=False,
+            total_documents=knowledge_service.get_document_count(),
+            job_id=job["job_id"],
+            job_status=job["status"]
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error procesando archivo: {str(e)}")
+        logger.error(f"Error procesando archivo: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error procesando el archivo: {str(e)}"
         )
+    finally:
+        # Temporal de un upload rechazado o fallido
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+
+
+@router.get("/jobs", response_model=IngestionJobListResponse)
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=200),
+    status: Optional[str] = Query(None, description="queued, running, completed o failed")
+):
+    """Listar los trabajos de indexación más recientes"""
+    jobs = await asyncio.to_thread(get_ingestion_jobs().list_jobs, limit, status)
+    return IngestionJobListResponse(jobs=jobs, count=len(jobs))
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_job(job_id: str):
+    """Estado, avance (páginas, chunks embebidos), throughput y error de un trabajo de indexación"""
+    job = await asyncio.to_thread(get_ingestion_jobs().get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Trabajo '{job_id}' no encontrado"
+        )
+    return job
 
 
 @router.delete("/documents/{filename}")
@@ -131,19 +201,17 @@ async def delete_document(filename: str):
     try:
         knowledge_service = get_knowledge_service()
         semantic_cache = get_semantic_cache()
-        agent_service = get_agent_service()
         
         # Eliminar documento
-        knowledge_service.remove_document(filename)
+        await asyncio.to_thread(knowledge_service.remove_document, filename)
         
-        # Limpiar caché y agentes
-        if semantic_cache.enabled:
-            await semantic_cache.clear()
-        agent_service.clear_all_agents()
+        # Invalidar solo las respuestas que citan el documento eliminado
+        invalidated = await semantic_cache.invalidate_documents([filename])
         
         return {
             "message": f"Archivo '{filename}' eliminado exitosamente",
-            "remaining_documents": knowledge_service.get_document_count()
+            "remaining_documents": knowledge_service.get_document_count(),
+            "cache_entries_invalidated": invalidated
         }
         
     except FileNotFoundError:
@@ -169,13 +237,27 @@ async def reload_knowledge_base():
     try:
         knowledge_service = get_knowledge_service()
         agent_service = get_agent_service()
+        semantic_cache = get_semantic_cache()
         
-        knowledge_service.reload_knowledge_base()
-        agent_service.clear_all_agents()
+        # Lee y embebe los archivos modificados: fuera del event loop
+        result = await asyncio.to_thread(knowledge_service.reload_knowledge_base)
+        
+        # Solo los documentos modificados o eliminados invalidan respuestas
+        # cacheadas y las conversaciones en memoria que pudieron citarlos
+        changed = result["updated"] + result["removed"]
+        invalidated = 0
+        if changed:
+            agent_service.clear_all_agents()
+            invalidated = await semantic_cache.invalidate_documents(changed)
         
         return {
             "message": "Knowledge base recargado exitosamente",
-            "documents_loaded": knowledge_service.get_document_count()
+            "documents_loaded": knowledge_service.get_document_count(),
+            "added": result["added"],
+            "updated": result["updated"],
+            "unchanged": len(result["unchanged"]),
+            "removed": result["removed"],
+            "cache_entries_invalidated": invalidated
         }
     except Exception as e:
         raise HTTPException(
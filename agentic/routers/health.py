@@ -8,13 +8,15 @@ from fastapi import APIRouter, HTTPException
 try:
     # Absolute imports for Docker/standalone execution
     from models.schemas import HealthResponse, SessionListResponse
-    from core.dependencies import get_knowledge_service, get_agent_service
+    from core.dependencies import get_knowledge_service, get_agent_service, get_inference_executor
     from config.settings import settings
+    from services.connections import get_pool_status
 except ImportError:
     # Relative imports for package execution
     from ..models.schemas import HealthResponse, SessionListResponse
-    from ..core.dependencies import get_knowledge_service, get_agent_service
+    from ..core.dependencies import get_knowledge_service, get_agent_service, get_inference_executor
     from ..config.settings import settings
+    from ..services.connections import get_pool_status
 
 router = APIRouter()
 
@@ -41,14 +43,26 @@ async def health_check():
 async def list_sessions():
     """Listar todas las sesiones activas"""
     agent_service = get_agent_service()
-    sessions = agent_service.get_active_sessions()
+    sessions_stats = agent_service.get_sessions_stats()
     
     return SessionListResponse(
-        active_sessions=sessions,
-        count=len(sessions)
+        active_sessions=[session["session_id"] for session in sessions_stats],
+        count=len(sessions_stats),
+        sessions=sessions_stats,
+        registry=agent_service.active_agents.get_stats()
     )
 
 
+@router.get("/inference/stats")
+async def get_inference_stats():
+    """Estadísticas del ejecutor de inferencia (cola, espera y concurrencia)"""
+    inference_executor = get_inference_executor()
+    return {
+        **inference_executor.get_stats(),
+        "database_pool": get_pool_status()
+    }
+
+
 @router.delete("/session/{session_id}")
 async def clear_session(session_id: str):
     """Limpiar una sesión específica y su agente asociado"""
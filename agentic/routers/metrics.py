@@ -0,0 +1,15 @@
+"""
+Router para exponer métricas de Prometheus.
+Siguiendo el principio de Single Responsibility.
+"""
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
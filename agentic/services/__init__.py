@@ -2,6 +2,13 @@
 
 from .agent_service import AgentService
 from .cache_service import SemanticCache
+from .cache_sweeper import CacheSweeper
+from .cache_warmer import CacheWarmer, CacheWarmerBusyError
 from .knowledge_service import KnowledgeService
+from .ingestion_jobs import IngestionJobs
+from .inference_executor import InferenceExecutor, InferenceQueueFullError
+from .session_registry import SessionRegistry
+from .request_coalescer import RequestCoalescer
+from .retrieval import MultiQueryRetriever
 
-__all__ = ['AgentService', 'SemanticCache', 'KnowledgeService']
\ No newline at end of file
+__all__ = ['AgentService', 'SemanticCache', 'CacheSweeper', 'CacheWarmer', 'CacheWarmerBusyError', 'KnowledgeService', 'IngestionJobs', 'InferenceExecutor', 'InferenceQueueFullError', 'SessionRegistry', 'RequestCoalescer', 'MultiQueryRetriever']
\ No newline at end of file
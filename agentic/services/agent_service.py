@@ -4,26 +4,44 @@ Siguiendo el principio de Single Responsibility - solo maneja agentes.
 """
 
 import uuid
+import hashlib
 import logging
-from typing import Dict, List, Optional, Tuple
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from phi.agent import Agent
 from phi.model.ollama import Ollama
-from phi.model.message import Message as PhiMessage
+from phi.model.message import Message as PhiMessage, MessageReferences
+from phi.run.response import RunResponseExtraData
 from phi.storage.agent.postgres import PgAgentStorage
+from phi.utils.timer import Timer
 
 try:
     # Absolute imports for Docker/standalone execution
     from config.settings import settings
     from models.schemas import Message
     from utils.validators import check_ollama_tools_support
+    from services.session_registry import SessionRegistry
+    from services.connections import get_db_engine, get_ollama_client
+    from services.retrieval import MultiQueryRetriever
+    from utils.text_processing import select_history_window
+    from utils.metrics import track_stage, OLLAMA_ERRORS, ACTIVE_SESSIONS, STAGE_LLM_GENERATION
 except ImportError:
     # Relative imports for package execution
     from ..config.settings import settings
     from ..models.schemas import Message
     from ..utils.validators import check_ollama_tools_support
+    from .session_registry import SessionRegistry
+    from .connections import get_db_engine, get_ollama_client
+    from .retrieval import MultiQueryRetriever
+    from ..utils.text_processing import select_history_window
+    from ..utils.metrics import track_stage, OLLAMA_ERRORS, ACTIVE_SESSIONS, STAGE_LLM_GENERATION
 
 logger = logging.getLogger(__name__)
 
+# Locks por franja de sesiones: serializan la creación y el sincronizado de
+# historial de una misma sesión sin bloquear a las demás
+_SESSION_LOCK_STRIPES = 64
+
 
 class OllamaNoTools(Ollama):
     """Ollama model without tools support for compatibility"""
@@ -39,6 +57,48 @@ class OllamaNoTools(Ollama):
         return super().response(messages, **kwargs)
 
 
+class InsuranceAgent(Agent):
+    """
+    Agent cuya herramienta de búsqueda acepta varias consultas en una sola
+    llamada, para no pagar un turno completo del LLM por cada búsqueda.
+    Como la herramienta de phi, registra los documentos encontrados en
+    `run_response.extra_data.references`.
+    """
+    
+    multi_query_retriever: Optional[Any] = None
+    
+    def search_knowledge_base(self, queries: List[str]) -> str:
+        """Use this function to search the knowledge base with several queries in a single call.
+        Pass 2 to 3 queries that cover different aspects of the user's question.
+
+        Args:
+            queries: The search queries.
+
+        Returns:
+            str: The relevant documents for all queries, deduplicated.
+        """
+        if self.multi_query_retriever is None:
+            return "Knowledge base not available"
+        if isinstance(queries, str):
+            queries = [queries]
+        retrieval_timer = Timer()
+        retrieval_timer.start()
+        documents = [document.to_dict() for document in self.multi_query_retriever.search(queries)]
+        retrieval_timer.stop()
+        if not documents:
+            return "No documents found"
+        
+        references = MessageReferences(
+            query="; ".join(queries), references=documents, time=round(retrieval_timer.elapsed, 4)
+        )
+        if self.run_response.extra_data is None:
+            self.run_response.extra_data = RunResponseExtraData()
+        if self.run_response.extra_data.references is None:
+            self.run_response.extra_data.references = []
+        self.run_response.extra_data.references.append(references)
+        return self.convert_documents_to_string(documents)
+
+
 class AgentService:
     """
     Servicio para gestionar agentes de IA.
@@ -46,15 +106,24 @@ class AgentService:
     """
     
     def __init__(self, knowledge_base=None):
-        self.active_agents: Dict[str, Agent] = {}
+        self.active_agents = SessionRegistry()
+        ACTIVE_SESSIONS.set_function(lambda: len(self.active_agents))
         self.knowledge_base = knowledge_base
+        self.retriever = MultiQueryRetriever(knowledge_base) if knowledge_base else None
         self.ollama_supports_tools = check_ollama_tools_support()
+        self._session_locks = [threading.Lock() for _ in range(_SESSION_LOCK_STRIPES)]
+    
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        return self._session_locks[hash(session_id) % len(self._session_locks)]
         
     def get_or_create_agent(self, session_id: str = None, 
                            messages: List[Message] = None) -> Tuple[Agent, str]:
         """
         Obtiene un agente existente o crea uno nuevo para la sesión.
         
+        Bloqueante (construye el agente y puede leer la sesión desde
+        storage): llamar fuera del event loop.
+        
         Args:
             session_id: ID de sesión opcional
             messages: Historial de mensajes opcional
@@ -64,20 +133,61 @@ class AgentService:
         """
         if not session_id:
             session_id = str(uuid.uuid4())
+            agent = self._create_agent(session_id)
+            if messages:
+                self._update_agent_history(session_id, agent, messages)
+            return agent, session_id
         
-        if session_id not in self.active_agents:
-            self._create_agent(session_id)
+        with self._session_lock(session_id):
+            agent = self.active_agents.get(session_id)
+            if agent is None:
+                # Sesión nueva o desalojada del registro: rehidratar desde storage
+                agent = self._create_agent(session_id, rehydrate=True)
+            
+            # Actualizar historial si se proporcionan mensajes
+            if messages:
+                self._update_agent_history(session_id, agent, messages)
         
-        agent = self.active_agents[session_id]
+        return agent, session_id
+    
+    def create_stateless_agent(self) -> Agent:
+        """
+        Crea un agente efímero para generaciones internas (precarga y
+        regeneración del caché): no se registra en active_agents ni guarda
+        la sesión en insurance_api_sessions.
+        """
+        return self._build_agent(str(uuid.uuid4()), persistent=False)
+    
+    def _create_agent(self, session_id: str, rehydrate: bool = False) -> Agent:
+        """
+        Crea un nuevo agente para la sesión.
         
-        # Actualizar historial si se proporcionan mensajes
-        if messages:
-            self._update_agent_history(agent, messages)
+        Args:
+            session_id: ID de la sesión
+            rehydrate: Si intentar recuperar la sesión desde insurance_api_sessions
+            
+        Returns:
+            El agente creado
+        """
+        agent = self._build_agent(session_id)
+        if rehydrate:
+            self._rehydrate_agent(agent, session_id)
         
-        return agent, session_id
+        self.active_agents[session_id] = agent
+        logger.debug(f"✅ Agente creado exitosamente para sesión: {session_id[:8]}")
+        return agent
     
-    def _create_agent(self, session_id: str):
-        """Crea un nuevo agente para la sesión"""
+    def _build_agent(self, session_id: str, persistent: bool = True) -> Agent:
+        """
+        Construye el agente de una sesión.
+        
+        Args:
+            session_id: ID de la sesión
+            persistent: Si guardar la sesión en insurance_api_sessions
+            
+        Returns:
+            El agente construido
+        """
         try:
             if not self.knowledge_base:
                 logger.warning("⚠️ Knowledge base no está disponible para el agente")
@@ -85,32 +195,40 @@ class AgentService:
             # Crear modelo según soporte de tools
             if not self.ollama_supports_tools:
                 logger.warning("Creating Ollama model WITHOUT tools support")
-                ollama_model = OllamaNoTools(id=settings.MODEL_ID, host=settings.OLLAMA_HOST)
+                ollama_model = OllamaNoTools(
+                    id=settings.MODEL_ID,
+                    host=settings.OLLAMA_HOST,
+                    client=get_ollama_client()
+                )
                 ollama_model.tools = None
                 ollama_model.tool_choice = None
             else:
-                ollama_model = Ollama(id=settings.MODEL_ID, host=settings.OLLAMA_HOST)
+                ollama_model = Ollama(
+                    id=settings.MODEL_ID,
+                    host=settings.OLLAMA_HOST,
+                    client=get_ollama_client()
+                )
             
-            agent = Agent(
+            agent = InsuranceAgent(
                 name=f"Insurance Agent - {session_id[:8]}",
                 agent_id=f"insurance-agent-{session_id}",
+                session_id=session_id,
                 model=ollama_model,
                 knowledge=self.knowledge_base if self.ollama_supports_tools else None,
                 search_knowledge=self.ollama_supports_tools,
+                multi_query_retriever=self.retriever,
                 read_chat_history=True,
                 storage=PgAgentStorage(
                     table_name="insurance_api_sessions",
-                    db_url=settings.DB_URL
-                ),
+                    db_engine=get_db_engine()
+                ) if persistent else None,
                 instructions=self._get_agent_instructions(),
                 markdown=True,
                 show_tool_calls=True,
-                debug_mode=True,
+                debug_mode=settings.LOG_LEVEL == "DEBUG",
                 monitoring=True,
             )
-            
-            self.active_agents[session_id] = agent
-            logger.debug(f"✅ Agente creado exitosamente para sesión: {session_id[:8]}")
+            return agent
             
         except Exception as e:
             logger.error(f"Error creando agente: {e}")
@@ -119,11 +237,20 @@ class AgentService:
             logger.error(f"Stack trace:\n{traceback.format_exc()}")
             raise
     
+    def _rehydrate_agent(self, agent: Agent, session_id: str):
+        """Recupera el historial persistido de una sesión desalojada"""
+        try:
+            if agent.read_from_storage() is not None:
+                self.active_agents.stats["rehydrated"] += 1
+                logger.debug(f"♻️ Sesión {session_id[:8]} rehidratada desde storage")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo rehidratar la sesión {session_id[:8]}: {e}")
+    
     def _get_agent_instructions(self) -> List[str]:
         """Obtiene las instrucciones para el agente según configuración"""
         if self.ollama_supports_tools:
             return [
-                "For the provided topic, run 3 different searches.",
+                "For the provided topic, call search_knowledge_base once with 3 search queries: the user's question as written and 2 different rephrasings.",
                 "Read the results carefully and prepare a worthy report.",
                 "Focus on facts and make sure to provide references.",
                 "If the knowledge base is empty or unavailable, provide a helpful response indicating this.",
@@ -136,16 +263,85 @@ class AgentService:
                 "If the knowledge base is empty or unavailable, provide a helpful response indicating this.",
             ]
     
-    def _update_agent_history(self, agent: Agent, messages: List[Message]):
-        """Actualiza el historial del agente con mensajes previos"""
-        for msg in messages[:-1]:  # Todos menos el último (que es el actual)
-            phi_msg = PhiMessage(
+    @staticmethod
+    def _history_digest(messages: List[Message], previous: str = "") -> str:
+        """Hash encadenado de los mensajes, para detectar si el historial cambió"""
+        digest = previous
+        for msg in messages:
+            digest = hashlib.sha1(
+                f"{digest}\x00{msg.role}\x00{msg.content}".encode()
+            ).hexdigest()
+        return digest
+    
+    @staticmethod
+    def _rehydrated_cursor(agent: Agent, history: List[Message]) -> int:
+        """
+        Cantidad de mensajes del historial del cliente que el agente ya tiene
+        porque la sesión se rehidrató desde storage.
+        
+        Se comparan solo los mensajes del usuario, en orden: las respuestas
+        que recibe el cliente están formateadas y no coinciden con las
+        guardadas. Las respuestas que siguen a un turno ya presente también
+        se consideran absorbidas.
+        """
+        memory = getattr(agent, "memory", None)
+        stored = list(getattr(memory, "messages", None) or []) + list(agent.messages or [])
+        stored_user = [msg.content for msg in stored if getattr(msg, "role", None) == "user"]
+        
+        cursor = 0
+        matched = 0
+        for index, msg in enumerate(history):
+            if msg.role == "user":
+                if matched == len(stored_user) or msg.content != stored_user[matched]:
+                    break
+                matched += 1
+            if matched:
+                cursor = index + 1
+        return cursor
+    
+    def _update_agent_history(self, session_id: str, agent: Agent, messages: List[Message]):
+        """
+        Sincroniza el historial del agente con el enviado por el cliente.
+        
+        Los clientes reenvían el historial completo en cada turno, así que solo
+        se agregan los mensajes posteriores al cursor ya absorbido. En una sesión
+        rehidratada desde storage el cursor parte de los turnos ya guardados.
+        Si el prefijo no coincide (historial editado o truncado) se reconstruye
+        el historial.
+        El resultado se recorta al presupuesto de tokens configurado.
+        """
+        history = messages[:-1]  # Todos menos el último (que es el actual)
+        entry = self.active_agents.get_entry(session_id)
+        if entry is None:
+            return
+        
+        if not hasattr(agent, 'messages') or agent.messages is None:
+            agent.messages = []
+        
+        absorbed = entry.history_count
+        if absorbed == 0 and not entry.history_digest:
+            # Primer sincronizado de la entrada: no duplicar lo rehidratado
+            absorbed = self._rehydrated_cursor(agent, history)
+            entry.history_digest = self._history_digest(history[:absorbed])
+        
+        if absorbed <= len(history) and self._history_digest(history[:absorbed]) == entry.history_digest:
+            new_messages = history[absorbed:]
+            digest = self._history_digest(new_messages, entry.history_digest)
+        else:
+            logger.debug(f"Historial de la sesión {session_id[:8]} cambió, reconstruyendo")
+            agent.messages = []
+            new_messages = history
+            digest = self._history_digest(history)
+        
+        for msg in new_messages:
+            agent.messages.append(PhiMessage(
                 role=msg.role,
                 content=msg.content
-            )
-            if not hasattr(agent, 'messages'):
-                agent.messages = []
-            agent.messages.append(phi_msg)
+            ))
+        agent.messages = select_history_window(agent.messages)
+        
+        entry.history_count = len(history)
+        entry.history_digest = digest
     
     def remove_agent(self, session_id: str) -> bool:
         """
@@ -157,10 +353,7 @@ class AgentService:
         Returns:
             True si se eliminó, False si no existía
         """
-        if session_id in self.active_agents:
-            del self.active_agents[session_id]
-            return True
-        return False
+        return self.active_agents.remove(session_id)
     
     def clear_all_agents(self):
         """Limpia todos los agentes activos"""
@@ -168,7 +361,24 @@ class AgentService:
     
     def get_active_sessions(self) -> List[str]:
         """Obtiene la lista de sesiones activas"""
-        return list(self.active_agents.keys())
+        self.active_agents.evict_idle()
+        return self.active_agents.keys()
+    
+    def get_sessions_stats(self) -> List[Dict]:
+        """Obtiene estadísticas de memoria y último acceso por sesión"""
+        self.active_agents.evict_idle()
+        return self.active_agents.get_session_stats()
+    
+    def _get_agent(self, session_id: str) -> Agent:
+        """
+        Obtiene el agente de una sesión existente. Si fue desalojado del
+        registro entre la creación y la ejecución, se rehidrata desde storage.
+        """
+        agent = self.active_agents.get(session_id)
+        if agent is None:
+            with self._session_lock(session_id):
+                agent = self.active_agents.get(session_id) or self._create_agent(session_id, rehydrate=True)
+        return agent
     
     def run_agent(self, session_id: str, context: str, stream: bool = False):
         """
@@ -182,20 +392,57 @@ class AgentService:
         Returns:
             Respuesta del agente
         """
-        if session_id not in self.active_agents:
-            raise ValueError(f"No se encontró agente para sesión {session_id}")
-        
-        agent = self.active_agents[session_id]
+        agent = self._get_agent(session_id)
         
         if stream:
-            response_text = ""
-            for chunk in agent.run(context, stream=True):
-                if hasattr(chunk, 'content'):
-                    response_text += chunk.content
-            return response_text
+            return "".join(self.stream_agent(session_id, context))
         else:
-            logger.debug(f"Ejecutando agent.run() para: {context[:100]}...")
-            response = agent.run(context)
-            response_text = response.content if hasattr(response, 'content') else str(response)
-            logger.debug(f"Agent.run() completado exitosamente")
-            return response
\ No newline at end of file
+            return self.run_stateless_agent(agent, context)
+    
+    def run_stateless_agent(self, agent: Agent, context: str):
+        """
+        Ejecuta un agente sin buscarlo en el registro de sesiones (por ejemplo
+        uno creado con create_stateless_agent).
+        
+        Args:
+            agent: Agente a ejecutar
+            context: Contexto/mensaje para el agente
+            
+        Returns:
+            Respuesta del agente
+        """
+        logger.debug(f"Ejecutando agent.run() para: {context[:100]}...")
+        try:
+            with track_stage(STAGE_LLM_GENERATION):
+                response = agent.run(context)
+        except Exception:
+            OLLAMA_ERRORS.labels(operation="generate").inc()
+            raise
+        logger.debug(f"Agent.run() completado exitosamente")
+        return response
+    
+    def stream_agent(self, session_id: str, context: str) -> Iterator[str]:
+        """
+        Ejecuta un agente en modo streaming, produciendo los tokens a medida
+        que Ollama los genera.
+        
+        Args:
+            session_id: ID de la sesión
+            context: Contexto/mensaje para el agente
+            
+        Yields:
+            Fragmentos de texto de la respuesta
+        """
+        agent = self._get_agent(session_id)
+        
+        logger.debug(f"Ejecutando agent.run(stream=True) para: {context[:100]}...")
+        try:
+            with track_stage(STAGE_LLM_GENERATION):
+                for chunk in agent.run(context, stream=True):
+                    content = chunk.content if hasattr(chunk, 'content') else chunk
+                    if isinstance(content, str) and content:
+                        yield content
+        except Exception:
+            OLLAMA_ERRORS.labels(operation="generate").inc()
+            raise
+        logger.debug(f"Agent.run(stream=True) completado exitosamente")
@@ -3,25 +3,47 @@ Servicio de caché semántico.
 Siguiendo el principio de Single Responsibility - solo maneja el caché.
 """
 
+import asyncio
 import hashlib
-import json
-import re
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Set
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, List, Set, Tuple
 import logging
 
-from phi.document import Document
-from phi.embedder.ollama import OllamaEmbedder
-from phi.vectordb.pgvector import PgVector, SearchType
+from phi.vectordb.pgvector import SearchType
 
 try:
     # Absolute imports for Docker/standalone execution
     from config.settings import settings
     from models.schemas import DocumentReference
+    from services.connections import get_db_engine, get_ollama_client
+    from services.cache_table import SemanticCacheTable
+    from services.cache_telemetry import CacheTelemetry
+    from services.embedder import InstrumentedOllamaEmbedder
+    from services.l1_cache import L1VectorCache
+    from services.lexical_signature import LexicalSignature
+    from services.request_coalescer import normalize_query
+    from utils.metrics import (
+        track_stage, CACHE_LOOKUPS, CACHE_STALE_HITS, STAGE_CACHE_EMBED, STAGE_CACHE_EXACT_LOOKUP,
+        STAGE_CACHE_L1_LOOKUP, STAGE_CACHE_LOOKUP, STAGE_CACHE_STORE
+    )
 except ImportError:
     # Relative imports for package execution
     from ..config.settings import settings
     from ..models.schemas import DocumentReference
+    from .connections import get_db_engine, get_ollama_client
+    from .cache_table import SemanticCacheTable
+    from .cache_telemetry import CacheTelemetry
+    from .embedder import InstrumentedOllamaEmbedder
+    from .l1_cache import L1VectorCache
+    from .lexical_signature import LexicalSignature
+    from .request_coalescer import normalize_query
+    from ..utils.metrics import (
+        track_stage, CACHE_LOOKUPS, CACHE_STALE_HITS, STAGE_CACHE_EMBED, STAGE_CACHE_EXACT_LOOKUP,
+        STAGE_CACHE_L1_LOOKUP, STAGE_CACHE_LOOKUP, STAGE_CACHE_STORE
+    )
 
 logger = logging.getLogger(__name__)
 
@@ -29,31 +51,73 @@ logger = logging.getLogger(__name__)
 class SemanticCache:
     """
     Implementa un caché semántico usando PgVector para almacenar y recuperar
-    respuestas basadas en similitud de embeddings.
+    respuestas basadas en similitud de embeddings. Cada entrada guarda la
+    pregunta, las respuestas, el modelo, el hash del prompt de formateo y las
+    referencias en columnas propias (ver SemanticCacheTable).
+    
+    Antes de calcular embeddings se consulta un índice exacto por clave de
+    caché (texto normalizado): primero en memoria y luego por el id de la fila,
+    de modo que las preguntas repetidas no llaman a Ollama.
+    
+    La búsqueda semántica consulta primero un caché L1 en memoria con las
+    entradas más usadas (L1VectorCache) y solo si no hay acierto va a la
+    tabla de PgVector (L2).
+    
+    Con stale-while-revalidate, las entradas que superaron el TTL (hasta
+    CACHE_MAX_STALE_HOURS más) se siguen sirviendo marcadas como `stale` para
+    que el llamador las regenere en segundo plano.
+    
+    Cada worker guarda copias en memoria (índice exacto y L1); cuando un
+    worker elimina entradas incrementa la generación compartida del caché.
+    watch_generation la relee en segundo plano cada
+    CACHE_GENERATION_POLL_SECONDS y, si cambió, descarta las copias; las
+    consultas nunca leen la generación.
+    
+    `stats` son contadores de este worker; las estadísticas compartidas por
+    todos los workers (resultados, latencias y distribución de scores) se
+    registran en CacheTelemetry y se guardan en la tabla `<tabla>_stats`.
     """
     
     def __init__(self, table_name: str = "semantic_cache_ollama"):
         self.db_url = settings.DB_URL
         self.table_name = table_name
-        self.embedder = OllamaEmbedder(
+        self.embedder = InstrumentedOllamaEmbedder(
             model=settings.EMBEDDER_MODEL, 
             dimensions=768, 
-            host=settings.OLLAMA_HOST
+            host=settings.OLLAMA_HOST,
+            ollama_client=get_ollama_client(),
+            metrics_stage=STAGE_CACHE_EMBED
         )
-        self.vector_db = PgVector(
+        self.vector_db = SemanticCacheTable(
             table_name=table_name,
-            db_url=self.db_url,
+            db_engine=get_db_engine(),
             search_type=SearchType.vector,
             embedder=self.embedder,
         )
         self.enabled = settings.CACHE_ENABLED
         self.similarity_threshold = settings.CACHE_SIMILARITY_THRESHOLD
         self.ttl_hours = settings.CACHE_TTL_HOURS
+        self.stale_while_revalidate = settings.CACHE_STALE_WHILE_REVALIDATE
+        self.max_stale_hours = settings.CACHE_MAX_STALE_HOURS
+        self._revalidating: Set[str] = set()
+        self.telemetry = CacheTelemetry(get_db_engine(), f"{self.vector_db.qualified_name}_stats")
+        self.model = settings.MODEL_ID
+        self.exact_max_entries = settings.CACHE_EXACT_MAX_ENTRIES
+        self._exact_index: "OrderedDict[str, Tuple[Dict[str, Any], float, str]]" = OrderedDict()
+        self._exact_lock = threading.Lock()
+        self._pending_hits: Dict[str, Tuple[int, float]] = {}
+        self.l1 = L1VectorCache(dimensions=768)
+        self._generation: Optional[int] = None
+        self.generation_poll_seconds = settings.CACHE_GENERATION_POLL_SECONDS
         self.stats = {
             "hits": 0,
+            "exact_hits": 0,
+            "l1_hits": 0,
+            "stale_hits": 0,
             "misses": 0,
             "total_queries": 0,
-            "avg_similarity": 0.0
+            "avg_similarity": 0.0,
+            "invalidated": 0
         }
         
         self._initialize_cache()
@@ -62,289 +126,562 @@ class SemanticCache:
         """Inicializa la tabla del caché"""
         try:
             self.vector_db.create()
+            self.telemetry.create()
+            self._generation = self.vector_db.get_generation()
             logger.info(f"🗄️ Semantic Cache inicializado - Tabla: {self.table_name}")
         except Exception as e:
             logger.warning(f"⚠️ Nota sobre tabla de caché: {e}")
         
-        print(f"   - Threshold: {self.similarity_threshold}")
-        print(f"   - TTL: {self.ttl_hours} horas")
-        print(f"   - Estado: {'Habilitado' if self.enabled else 'Deshabilitado'}")
+        logger.info(
+            "cache configurado threshold=%s ttl_hours=%s enabled=%s",
+            self.similarity_threshold, self.ttl_hours, self.enabled
+        )
     
     def _generate_cache_key(self, query: str, context: str = "") -> str:
-        """Genera una clave única para la entrada del caché"""
-        combined = f"{query}::{context}"
+        """Genera una clave única para la entrada del caché a partir del texto normalizado"""
+        combined = f"{normalize_query(query)}::{normalize_query(context)}"
         return hashlib.md5(combined.encode()).hexdigest()
     
-    def _extract_quoted_terms(self, text: str) -> Set[str]:
-        """Extrae términos importantes entre comillas"""
-        terms = set()
-        pattern = r"['\"]([^'\"]+)['\"]"
-        matches = re.findall(pattern, text)
-        for match in matches:
-            term = match.lower().strip()
-            if term:
-                terms.add(term)
-        return terms
-    
-    def _queries_are_about_different_topics(self, query1: str, query2: str) -> bool:
-        """Determina si dos queries hablan de temas diferentes"""
-        terms1 = self._extract_quoted_terms(query1)
-        terms2 = self._extract_quoted_terms(query2)
-        
-        if terms1 and terms2:
-            if not (terms1 & terms2):
-                return True
-        
-        return False
-    
-    def _calculate_word_overlap(self, text1: str, text2: str) -> float:
-        """Calcula el overlap de palabras entre dos textos"""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
-        # Stop words combinadas (español e inglés)
-        stop_words = {
-            # Español
-            'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'una', 'es', 'los', 'las', 
-            'del', 'al', 'con', 'por', 'para', 'su', 'sus', 'como', 'más', 'pero', 
-            'le', 'ya', 'o', 'este', 'ese', 'eso', 'esta', 'estas', 'estos', 'esas', 
-            'esos', 'si', 'no', 'lo', 'me', 'mi', 'tu', 'te', 'se', 'nos', 'qué', 
-            'cuál', 'cuáles', 'cómo', 'dónde',
-            # Inglés
-            'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it', 
-            'for', 'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at', 'this', 'but', 
-            'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she', 'or', 'an', 'will', 
-            'my', 'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up', 'out', 
-            'if', 'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can', 
-            'like', 'time', 'no', 'just', 'him', 'know', 'take', 'into', 'year', 
-            'your', 'some', 'them', 'see', 'other', 'than', 'then', 'now', 'only', 
-            'its', 'also', 'is', 'am', 'are', 'was', 'were', 'been', 'has', 'had', 
-            'does', 'did', 'having'
+    @property
+    def retention_hours(self) -> int:
+        """Horas que una entrada puede servirse: TTL más el máximo stale si está habilitado"""
+        return self.ttl_hours + (self.max_stale_hours if self.stale_while_revalidate else 0)
+    
+    def _min_cached_at(self) -> datetime:
+        """Fecha mínima de una entrada que todavía puede servirse"""
+        return datetime.now(timezone.utc) - timedelta(hours=self.retention_hours)
+    
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        """Indica si una entrada ya no puede servirse"""
+        return entry["cached_at"] < self._min_cached_at()
+    
+    def _is_stale(self, entry: Dict[str, Any]) -> bool:
+        """Indica si una entrada servible superó el TTL y debe regenerarse"""
+        return entry["cached_at"] < datetime.now(timezone.utc) - timedelta(hours=self.ttl_hours)
+    
+    def _build_cached_entry(self, entry: Dict[str, Any], similarity: float) -> Dict[str, Any]:
+        """Construye la respuesta de un acierto a partir de la fila del caché"""
+        stale = self._is_stale(entry)
+        if stale:
+            self.stats["stale_hits"] += 1
+            self.telemetry.record_event("stale_hit")
+            CACHE_STALE_HITS.inc()
+        return {
+            "entry_id": entry["id"],
+            "stale": stale,
+            "response": entry["response"],
+            "cached_at": entry["cached_at"].isoformat(),
+            "similarity": similarity,
+            "original_query": entry["query"],
+            "metadata": entry.get("meta_data") or {},
+            "document_references": entry["document_references"],
+            "formatted_response": entry.get("formatted_response"),
+            "formatting_prompt_hash": entry.get("prompt_hash")
         }
+    
+    def _remember_exact(self, cache_key: str, entry: Dict[str, Any], similarity: float, row_id: str):
+        """Registra una entrada en el índice exacto en memoria (LRU)"""
+        with self._exact_lock:
+            self._exact_index[cache_key] = (entry, similarity, row_id)
+            self._exact_index.move_to_end(cache_key)
+            while len(self._exact_index) > self.exact_max_entries:
+                self._exact_index.popitem(last=False)
+    
+    def _drop_local_copies(self):
+        """Descarta el índice exacto y el L1 de este worker"""
+        with self._exact_lock:
+            self._exact_index.clear()
+        self.l1.clear()
+    
+    def _sync_generation(self):
+        """
+        Compara la generación compartida con la vista por este worker; si otro
+        worker invalidó o limpió el caché descarta las copias en memoria, que
+        pueden tener entradas cuyas filas ya no existen.
+        """
+        generation = self.vector_db.get_generation()
+        with self._exact_lock:
+            if generation == self._generation:
+                return
+            previous, self._generation = self._generation, generation
+        self._drop_local_copies()
+        if previous is not None:
+            logger.debug("cache generación cambiada previous=%s current=%s", previous, generation)
+    
+    def _bump_generation(self):
+        """Avisa a los demás workers que se eliminaron entradas"""
+        generation = self.vector_db.bump_generation()
+        with self._exact_lock:
+            # Solo adoptarla si nadie más la incrementó desde la última consulta;
+            # si no, la próxima consulta descarta también las copias de este worker
+            if self._generation is not None and generation == self._generation + 1:
+                self._generation = generation
+    
+    async def watch_generation(self):
+        """Bucle que relee la generación compartida; se cancela al cerrar la aplicación"""
+        if not self.enabled or self.generation_poll_seconds <= 0:
+            logger.info("Verificación de la generación del caché deshabilitada")
+            return
+        while True:
+            await asyncio.sleep(self.generation_poll_seconds)
+            try:
+                await asyncio.to_thread(self._sync_generation)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo leer la generación del caché: {e}")
+    
+    def _forget_exact(self, cache_key: str):
+        with self._exact_lock:
+            self._exact_index.pop(cache_key, None)
+    
+    async def _find_exact(self, cache_key: str) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """Busca la clave en el índice en memoria y luego en la tabla"""
+        with self._exact_lock:
+            found = self._exact_index.get(cache_key)
+            if found is not None:
+                self._exact_index.move_to_end(cache_key)
         
-        words1 = words1 - stop_words
-        words2 = words2 - stop_words
-        
-        words1 = {w for w in words1 if len(w) > 1 and w.isalnum()}
-        words2 = {w for w in words2 if len(w) > 1 and w.isalnum()}
+        if found is not None and self._is_stale(found[0]):
+            # Otro worker pudo haber regenerado la fila: releerla antes de servirla stale
+            entry = await asyncio.to_thread(
+                self.vector_db.get_entry, found[2], self._min_cached_at(), self.model
+            )
+            if entry is None:
+                self._forget_exact(cache_key)
+                return None
+            found = (entry, found[1], found[2])
         
-        if not words1 or not words2:
-            return 0.0
+        if found is None:
+            entry = await asyncio.to_thread(
+                self.vector_db.get_entry, cache_key, self._min_cached_at(), self.model
+            )
+            if entry is None:
+                return None
+            found = (entry, 1.0, cache_key)
         
-        common = words1 & words2
-        total = len(words1 | words2)
+        entry, similarity, row_id = found
+        if self._is_expired(entry):
+            self._forget_exact(cache_key)
+            return None
         
-        if total == 0:
-            return 0.0
-            
-        return len(common) / total
+        self._remember_exact(cache_key, entry, similarity, row_id)
+        return found
+    
+    def _record_hit(self, row_id: Optional[str]):
+        """Acumula un acierto; CacheSweeper lo guarda en la fila en segundo plano"""
+        if not row_id:
+            return
+        with self._exact_lock:
+            count, _ = self._pending_hits.get(row_id, (0, 0.0))
+            self._pending_hits[row_id] = (count + 1, time.time())
+    
+    def drain_hits(self) -> Dict[str, Tuple[int, float]]:
+        """Retorna y reinicia los aciertos acumulados por id de fila"""
+        with self._exact_lock:
+            hits, self._pending_hits = self._pending_hits, {}
+        return hits
+    
+    def restore_hits(self, hits: Dict[str, Tuple[int, float]]):
+        """Devuelve aciertos drenados que no se pudieron guardar"""
+        with self._exact_lock:
+            for row_id, (count, last_access) in hits.items():
+                pending_count, pending_access = self._pending_hits.get(row_id, (0, 0.0))
+                self._pending_hits[row_id] = (pending_count + count, max(pending_access, last_access))
+    
+    def notify_deleted(self, row_ids: List[str]):
+        """
+        Registra filas eliminadas fuera de las invalidaciones (limpieza por TTL
+        o desalojo): incrementa la generación para que los demás workers
+        descarten sus copias y las olvida en este. Bloqueante.
+        """
+        if not row_ids:
+            return
+        try:
+            self._bump_generation()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo incrementar la generación del caché: {e}")
+        self.forget_entries(row_ids)
+    
+    def forget_entries(self, row_ids: List[str]):
+        """Quita del índice exacto las entradas eliminadas de la tabla"""
+        if not row_ids:
+            return
+        deleted = set(row_ids)
+        with self._exact_lock:
+            for cache_key in [k for k, v in self._exact_index.items() if v[2] in deleted]:
+                del self._exact_index[cache_key]
+            for row_id in deleted:
+                self._pending_hits.pop(row_id, None)
+        self.l1.remove(deleted)
+    
+    @staticmethod
+    def _signature_of(entry: Dict[str, Any]) -> LexicalSignature:
+        """
+        Firma léxica de una entrada (calculada en store y guardada en la fila).
+        Las filas sin firma la calculan una vez y la conservan en la entrada.
+        """
+        signature = entry.get("lexical_signature")
+        if not isinstance(signature, LexicalSignature):
+            signature = LexicalSignature.from_dict(signature) or LexicalSignature.from_text(entry["query"] or "")
+            entry["lexical_signature"] = signature
+        return signature
+    
+    def queries_are_compatible(self, query1: str, query2: str) -> bool:
+        """Indica si dos queries pueden compartir respuesta (mismos temas citados)"""
+        return not LexicalSignature.from_text(query1).is_different_topic(LexicalSignature.from_text(query2))
+    
+    async def embed_query(self, query: str) -> List[float]:
+        """Calcula el embedding de una consulta sin bloquear el event loop"""
+        return await asyncio.to_thread(self.embedder.get_embedding, query)
     
     async def find_similar(self, query: str, context: str = "") -> Optional[Dict[str, Any]]:
         """Busca una consulta similar en el caché"""
         if not self.enabled:
             return None
         
+        started = time.perf_counter()
+        self.stats["total_queries"] += 1
         try:
-            self.stats["total_queries"] += 1
-            
-            results = self.vector_db.search(
-                query=query,
-                limit=5
-            )
-            
-            if not results or len(results) == 0:
-                self.stats["misses"] += 1
-                print(f"❌ Cache MISS para: {query[:50]}...")
-                return None
-            
-            for i, doc in enumerate(results):
-                if not doc or not doc.content:
-                    continue
-                
-                try:
-                    cached_data = json.loads(doc.content)
-                    similarity_score = 0.70
-                    
-                    if hasattr(doc, 'score') and doc.score is not None:
-                        similarity_score = float(doc.score)
-                    elif hasattr(doc, 'meta_data') and doc.meta_data:
-                        if 'score' in doc.meta_data and doc.meta_data['score'] is not None:
-                            similarity_score = float(doc.meta_data['score'])
-                        elif 'similarity' in doc.meta_data and doc.meta_data['similarity'] is not None:
-                            similarity_score = float(doc.meta_data['similarity'])
-                    
-                    original_query = cached_data.get('original_query', '')
-                    
-                    if self._queries_are_about_different_topics(original_query, query):
-                        quoted_original = self._extract_quoted_terms(original_query)
-                        quoted_current = self._extract_quoted_terms(query)
-                        
-                        print(f"   ❌ Temas diferentes detectados:")
-                        print(f"      Query actual menciona: {quoted_current}")
-                        print(f"      Query cacheada menciona: {quoted_original}")
-                        continue
-                    
-                    word_overlap = self._calculate_word_overlap(original_query, query)
-                    
-                    if original_query.lower().strip() == query.lower().strip():
-                        similarity_score = 1.0
-                        print(f"   ✅ Match exacto encontrado")
-                    elif word_overlap > 0.7:
-                        similarity_score = max(similarity_score, 0.93)
-                        print(f"   ✅ Alta similitud textual: {word_overlap:.2%}")
-                    elif word_overlap < 0.3:
-                        self._adjust_score_for_keywords(original_query, query, similarity_score, word_overlap)
-                    elif word_overlap < 0.5:
-                        similarity_score = similarity_score * 0.8
-                        print(f"   ⚠️ Score ajustado por similitud textual moderada: {similarity_score:.2f}")
-                    
-                    if similarity_score >= self.similarity_threshold:
-                        cached_time = datetime.fromisoformat(cached_data.get("timestamp", ""))
-                        if datetime.now() - cached_time > timedelta(hours=self.ttl_hours):
-                            print(f"⏰ Cache entry expirado para: {query[:50]}...")
-                            continue
-                        
-                        self.stats["hits"] += 1
-                        hit_rate = (self.stats["hits"] / self.stats["total_queries"]) * 100
-                        
-                        print(f"✅ Cache HIT! Similitud: {similarity_score:.2f}")
-                        print(f"   Query original: {cached_data.get('original_query', '')[:50]}...")
-                        print(f"   Hit rate: {hit_rate:.1f}%")
-                        
-                        doc_refs = cached_data.get("document_references", [])
-                        if not doc_refs:
-                            print(f"⚠️ Cache entry sin referencias, saltando")
-                            continue
-                        
-                        return {
-                            "response": cached_data.get("response"),
-                            "cached_at": cached_data.get("timestamp"),
-                            "similarity": similarity_score,
-                            "original_query": cached_data.get("original_query"),
-                            "metadata": cached_data.get("metadata", {}),
-                            "document_references": doc_refs
-                        }
-                        
-                except Exception as e:
-                    print(f"Error procesando entrada de caché: {e}")
-                    continue
-            
-            self.stats["misses"] += 1
-            print(f"❌ Cache MISS - No se encontró similitud suficiente para: {query[:50]}...")
-            return None
-            
+            cached, result, best_score = await self._lookup(query, context)
         except Exception as e:
-            print(f"Error buscando en caché: {e}")
+            logger.error(f"Error buscando en caché: {e}")
+            cached, result, best_score = None, "error", None
+        
+        if result == "miss":
+            self.stats["misses"] += 1
+        CACHE_LOOKUPS.labels(result=result).inc()
+        self.telemetry.record_lookup(result, time.perf_counter() - started, best_score)
+        return cached
+    
+    async def _lookup(self, query: str, context: str) -> Tuple[Optional[Dict[str, Any]], str, Optional[float]]:
+        """
+        Busca en el índice exacto, el L1 y la tabla, en ese orden.
+        
+        Returns:
+            (acierto o None, resultado de la consulta, mejor score semántico visto)
+        """
+        cache_key = self._generate_cache_key(query, context)
+        
+        with track_stage(STAGE_CACHE_EXACT_LOOKUP):
+            exact = await self._find_exact(cache_key)
+        if exact is not None:
+            entry, similarity_score, row_id = exact
+            self._record_hit(row_id)
+            self.stats["hits"] += 1
+            self.stats["exact_hits"] += 1
+            logger.debug("cache hit exacto cache_key=%s query=%r", cache_key[:8], query[:50])
+            return self._build_cached_entry(entry, similarity_score), "exact_hit", None
+        
+        query_embedding = await asyncio.to_thread(self.embedder.get_embedding, query)
+        if not query_embedding:
+            return None, "error", None
+        
+        # La consulta se tokeniza una sola vez para validar todos los candidatos
+        query_signature = LexicalSignature.from_text(query)
+        
+        with track_stage(STAGE_CACHE_L1_LOOKUP):
+            entry, similarity_score, best_score = self._find_in_l1(query_signature, query_embedding)
+        if entry is not None:
+            self.stats["l1_hits"] += 1
+            return self._register_hit(cache_key, entry, similarity_score, query, "l1_hit"), "l1_hit", similarity_score
+        
+        with track_stage(STAGE_CACHE_LOOKUP):
+            candidates = await asyncio.to_thread(
+                self.vector_db.search_entries,
+                embedding=query_embedding,
+                limit=5,
+                min_cached_at=self._min_cached_at(),
+                model=self.model,
+                include_embedding=self.l1.enabled
+            )
+        
+        if not candidates:
+            logger.debug("cache miss reason=empty query=%r", query[:50])
+            return None, "miss", best_score
+        
+        embeddings = {entry["id"]: entry.pop("embedding", None) for entry in candidates}
+        entry, similarity_score, l2_best = self._select_candidate(
+            [(entry, float(entry["similarity"])) for entry in candidates], query_signature
+        )
+        if entry is not None:
+            # Promover la entrada al L1 para las próximas consultas parecidas
+            embedding = embeddings[entry["id"]]
+            if embedding is not None and not self._is_stale(entry):
+                self.l1.put(entry, embedding)
+            return self._register_hit(cache_key, entry, similarity_score, query, "hit"), "hit", similarity_score
+        
+        logger.debug("cache miss reason=below_threshold query=%r", query[:50])
+        scores = [score for score in (best_score, l2_best) if score is not None]
+        return None, "miss", max(scores) if scores else None
+    
+    def _select_candidate(self, candidates: List[Tuple[Dict[str, Any], float]],
+                          query_signature: LexicalSignature) -> Tuple[Optional[Dict[str, Any]], Optional[float], Optional[float]]:
+        """
+        Aplica las validaciones léxicas a los candidatos en orden de similitud.
+        
+        Returns:
+            (primer candidato que supera el umbral o None, su score, mejor score visto)
+        """
+        best_score = None
+        for entry, similarity in candidates:
+            similarity_score = self._score_candidate(entry, similarity, query_signature)
+            if similarity_score is None:
+                continue
+            if similarity_score >= self.similarity_threshold:
+                return entry, similarity_score, similarity_score
+            best_score = similarity_score if best_score is None else max(best_score, similarity_score)
+        return None, None, best_score
+    
+    def _find_in_l1(self, query_signature: LexicalSignature,
+                    query_embedding: List[float]) -> Tuple[Optional[Dict[str, Any]], Optional[float], Optional[float]]:
+        """Busca en el caché L1 aplicando las mismas validaciones que en la tabla"""
+        candidates = []
+        for entry, similarity in self.l1.search(query_embedding, limit=5):
+            if self._is_expired(entry) or self._is_stale(entry):
+                # Las entradas stale se releen de la tabla por si ya fueron regeneradas
+                self.l1.remove([entry["id"]])
+                continue
+            candidates.append((entry, similarity))
+        
+        entry, similarity_score, best_score = self._select_candidate(candidates, query_signature)
+        if entry is not None:
+            self.l1.touch(entry["id"])
+        elif candidates:
+            self.l1.touch(None, hit=False)
+        return entry, similarity_score, best_score
+    
+    def _score_candidate(self, entry: Dict[str, Any], similarity_score: float,
+                         query_signature: LexicalSignature) -> Optional[float]:
+        """
+        Ajusta la similitud de un candidato con las validaciones léxicas
+        (solo intersecciones de conjuntos sobre firmas ya calculadas).
+        
+        Returns:
+            Score ajustado o None si las consultas hablan de temas diferentes
+        """
+        cached_signature = self._signature_of(entry)
+        
+        if cached_signature.is_different_topic(query_signature):
+            logger.debug(
+                "cache candidato descartado reason=different_topics current=%s cached=%s",
+                set(query_signature.quoted), set(cached_signature.quoted)
+            )
             return None
+        
+        word_overlap = cached_signature.word_overlap(query_signature)
+        
+        if cached_signature.normalized == query_signature.normalized:
+            similarity_score = 1.0
+            logger.debug("cache candidato match exacto")
+        elif word_overlap > 0.7:
+            similarity_score = max(similarity_score, 0.93)
+            logger.debug("cache candidato alta similitud textual overlap=%.2f", word_overlap)
+        elif word_overlap < 0.3:
+            similarity_score = self._adjust_score_for_keywords(
+                cached_signature, query_signature, similarity_score, word_overlap
+            )
+        elif word_overlap < 0.5:
+            similarity_score = similarity_score * 0.8
+            logger.debug("cache score ajustado reason=moderate_overlap score=%.2f", similarity_score)
+        
+        return similarity_score
     
-    def _adjust_score_for_keywords(self, original_query: str, query: str, 
-                                   similarity_score: float, word_overlap: float) -> float:
-        """Ajusta el score basado en palabras clave compartidas"""
-        import re
+    def _register_hit(self, cache_key: str, entry: Dict[str, Any], similarity_score: float,
+                      query: str, result: str) -> Dict[str, Any]:
+        """Contabiliza un acierto semántico y construye la respuesta"""
+        self.stats["hits"] += 1
+        hit_rate = (self.stats["hits"] / self.stats["total_queries"]) * 100
         
-        pattern = r"'([^']+)'|\"([^\"]+)\"|([A-Z][a-z]+)"
+        # Promedio de similitud de los aciertos semánticos (sin los exactos)
+        semantic_hits = self.stats["hits"] - self.stats["exact_hits"]
+        self.stats["avg_similarity"] += (similarity_score - self.stats["avg_similarity"]) / semantic_hits
         
-        keywords1 = set()
-        for match in re.finditer(pattern, original_query):
-            for group in match.groups():
-                if group:
-                    keywords1.add(group.lower())
+        logger.debug(
+            "cache %s similarity=%.2f original_query=%r query=%r hit_rate=%.1f",
+            result, similarity_score, (entry["query"] or "")[:50], query[:50], hit_rate
+        )
         
-        keywords2 = set()
-        for match in re.finditer(pattern, query):
-            for group in match.groups():
-                if group:
-                    keywords2.add(group.lower())
+        # La próxima repetición de esta consulta no necesita embedding
+        self._remember_exact(cache_key, entry, similarity_score, entry["id"])
+        self._record_hit(entry["id"])
+        return self._build_cached_entry(entry, similarity_score)
+    
+    def _adjust_score_for_keywords(self, cached_signature: LexicalSignature, query_signature: LexicalSignature,
+                                   similarity_score: float, word_overlap: float) -> float:
+        """Ajusta el score basado en palabras clave compartidas"""
+        shared_keywords = cached_signature.shared_keywords(query_signature)
         
-        if keywords1 and keywords2 and keywords1 & keywords2:
-            shared_keywords = keywords1 & keywords2
+        if shared_keywords:
             similarity_score = similarity_score * 0.85
-            print(f"   🔑 Palabras clave compartidas: {shared_keywords}")
-            print(f"   Score ajustado: {similarity_score:.2f}")
+            logger.debug(
+                "cache score ajustado reason=shared_keywords keywords=%s score=%.2f",
+                set(shared_keywords), similarity_score
+            )
         else:
             similarity_score = similarity_score * 0.5
-            print(f"   📉 Score ajustado por baja similitud textual: {similarity_score:.2f}")
-            print(f"      Query actual: '{query[:50]}...'")
-            print(f"      Query cacheada: '{original_query[:50]}...'")
-            print(f"      Overlap de palabras: {word_overlap:.2%}")
+            logger.debug(
+                "cache score ajustado reason=low_overlap score=%.2f overlap=%.2f query=%r cached=%r",
+                similarity_score, word_overlap, query_signature.normalized[:50], cached_signature.normalized[:50]
+            )
         
         return similarity_score
     
     async def store(self, query: str, response: str, context: str = "", 
-                   metadata: Dict = None, document_references: List = None) -> bool:
-        """Almacena una nueva entrada en el caché"""
+                   metadata: Dict = None, document_references: List = None,
+                   formatted_response: Optional[str] = None,
+                   formatting_prompt_hash: Optional[str] = None) -> bool:
+        """
+        Almacena una nueva entrada en el caché.
+        
+        Si se proporciona la respuesta formateada se guarda junto con el hash
+        del prompt usado, para que los aciertos no vuelvan a llamar al formateador.
+        """
         if not self.enabled:
             return False
         
         if not document_references or len(document_references) == 0:
-            print(f"⚠️ No se cachea respuesta sin referencias de documentos")
+            logger.debug("cache store omitido reason=no_references")
             return False
         
         try:
-            cache_data = {
-                "original_query": query,
+            cache_key = self._generate_cache_key(query, context)
+            # El embedding es el de la pregunta (ya calculado en la búsqueda)
+            embedding = await asyncio.to_thread(self.embedder.get_embedding, query)
+            if not embedding:
+                logger.debug("cache store omitido reason=no_embedding")
+                return False
+            
+            entry = {
+                "id": cache_key,
+                "query": query,
                 "response": response,
-                "context": context[:500] if context else "",
-                "timestamp": datetime.now().isoformat(),
-                "metadata": metadata or {},
-                "cache_key": self._generate_cache_key(query, context),
+                "formatted_response": formatted_response,
+                "model": self.model,
+                "prompt_hash": formatting_prompt_hash,
                 "document_references": [
                     {
                         "document_name": ref.document_name,
                         "pages": ref.pages
                     } for ref in document_references
-                ] if document_references else []
+                ],
+                "cached_at": datetime.now(timezone.utc),
+                "meta_data": metadata or {},
+                "lexical_signature": LexicalSignature.from_text(query)
             }
             
-            doc = Document(
-                content=json.dumps(cache_data, ensure_ascii=False),
-                meta_data={
-                    "query": query[:200],
-                    "timestamp": cache_data["timestamp"],
-                    "cache_key": cache_data["cache_key"]
-                }
-            )
+            # El id de la fila es la clave de caché: permite la búsqueda exacta
+            # por clave primaria y que repetir un store reemplace la entrada
+            with track_stage(STAGE_CACHE_STORE):
+                await asyncio.to_thread(
+                    self.vector_db.upsert_entry,
+                    entry_id=cache_key,
+                    query=query,
+                    embedding=embedding,
+                    response=response,
+                    formatted_response=formatted_response,
+                    model=self.model,
+                    prompt_hash=formatting_prompt_hash,
+                    document_references=entry["document_references"],
+                    meta_data=entry["meta_data"],
+                    cached_at=entry["cached_at"],
+                    lexical_signature=entry["lexical_signature"].to_dict()
+                )
+            # Las consultas parecidas que apuntaban a la versión anterior de la
+            # fila vuelven a resolverse contra la nueva
+            with self._exact_lock:
+                for alias in [k for k, v in self._exact_index.items() if v[2] == cache_key and k != cache_key]:
+                    del self._exact_index[alias]
+            self._remember_exact(cache_key, entry, 1.0, cache_key)
+            self.l1.put(entry, embedding)
+            self.telemetry.record_event("stored")
             
-            self.vector_db.upsert([doc])
-            
-            print(f"💾 Respuesta cacheada para: {query[:50]}...")
-            print(f"   Cache key: {cache_data['cache_key'][:8]}...")
-            
-            await self._cleanup_old_entries()
+            logger.debug("cache store query=%r cache_key=%s", query[:50], cache_key[:8])
             
             return True
             
         except Exception as e:
-            print(f"Error almacenando en caché: {e}")
+            logger.error(f"Error almacenando en caché: {e}")
             return False
     
-    async def _cleanup_old_entries(self):
-        """Limpia entradas antiguas del caché"""
-        # TODO: Implementar limpieza de entradas antiguas
-        pass
+    def begin_revalidation(self, entry_id: str) -> bool:
+        """
+        Reserva la regeneración de una entrada stale.
+        
+        Returns:
+            False si ya hay una regeneración en curso para esa entrada
+        """
+        with self._exact_lock:
+            if entry_id in self._revalidating:
+                return False
+            self._revalidating.add(entry_id)
+            return True
+    
+    def end_revalidation(self, entry_id: str):
+        with self._exact_lock:
+            self._revalidating.discard(entry_id)
+    
+    async def invalidate_documents(self, document_names: List[str]) -> int:
+        """
+        Elimina solo las entradas que citan alguno de los documentos
+        modificados, conservando el resto del caché.
+        
+        Returns:
+            Número de entradas eliminadas
+        """
+        try:
+            deleted = await asyncio.to_thread(self.vector_db.delete_by_documents, document_names)
+            if deleted:
+                await asyncio.to_thread(self._bump_generation)
+        except Exception as e:
+            logger.error(f"Error invalidando entradas del caché para {document_names}: {e}")
+            return 0
+        
+        # El índice exacto puede tener entradas cuyas filas ya no existen
+        names = {name.lower() for name in document_names}
+        with self._exact_lock:
+            stale_rows = [
+                row_id for entry, _, row_id in self._exact_index.values()
+                if any(ref.get("document_name", "").lower() in names for ref in entry["document_references"])
+            ]
+        self.forget_entries(deleted + stale_rows)
+        self.l1.invalidate_documents(document_names)
+        
+        self.stats["invalidated"] += len(deleted)
+        self.telemetry.record_event("invalidated", len(deleted))
+        logger.info("cache invalidado documents=%s entries=%d", document_names, len(deleted))
+        return len(deleted)
     
     async def clear(self) -> bool:
         """Limpia todo el caché"""
         try:
             try:
-                self.vector_db.delete()
-                self.vector_db.create()
-            except:
+                await asyncio.to_thread(self.vector_db.delete)
+                await asyncio.to_thread(self.vector_db.create)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo recrear la tabla del caché, se intenta crearla: {e}")
                 try:
-                    self.vector_db.create()
-                except:
-                    pass
+                    await asyncio.to_thread(self.vector_db.create)
+                except Exception as create_error:
+                    logger.warning(f"⚠️ No se pudo crear la tabla del caché: {create_error}")
             
+            await asyncio.to_thread(self._bump_generation)
+            with self._exact_lock:
+                self._pending_hits.clear()
+            self._drop_local_copies()
+            self.telemetry.record_event("cleared")
             self.stats = {
                 "hits": 0,
+                "exact_hits": 0,
+                "l1_hits": 0,
+                "stale_hits": 0,
                 "misses": 0,
                 "total_queries": 0,
-                "avg_similarity": 0.0
+                "avg_similarity": 0.0,
+                "invalidated": 0
             }
-            print("🧹 Caché limpiado completamente")
+            logger.info("🧹 Caché limpiado completamente")
             return True
         except Exception as e:
-            print(f"Error limpiando caché: {e}")
+            logger.error(f"Error limpiando caché: {e}")
             return False
     
     def get_stats(self) -> Dict[str, Any]:
@@ -355,5 +692,11 @@ class SemanticCache:
             "hit_rate": f"{hit_rate:.1f}%",
             "enabled": self.enabled,
             "threshold": self.similarity_threshold,
-            "ttl_hours": self.ttl_hours
+            "ttl_hours": self.ttl_hours,
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "max_stale_hours": self.max_stale_hours,
+            "revalidating": len(self._revalidating),
+            "exact_index_size": len(self._exact_index),
+            "generation": self._generation,
+            "l1": self.l1.get_stats()
         }
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Limpieza periódica del caché semántico.
+Siguiendo el principio de Single Responsibility - solo aplica el TTL y el
+límite de entradas a la tabla del caché, fuera del camino de las consultas.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from utils.metrics import CACHE_ENTRIES, CACHE_SWEEP_DELETED, CACHE_SWEEP_DURATION
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from ..utils.metrics import CACHE_ENTRIES, CACHE_SWEEP_DELETED, CACHE_SWEEP_DURATION
+
+logger = logging.getLogger(__name__)
+
+_LAST_ACCESS_SQL = "COALESCE(last_accessed_at, cached_at, created_at)"
+_EVICTION_ORDER = {
+    "lru": f"{_LAST_ACCESS_SQL} ASC",
+    "lfu": f"COALESCE(hit_count, 0) ASC, {_LAST_ACCESS_SQL} ASC",
+}
+
+
+class CacheSweeper:
+    """
+    Tarea en segundo plano que:
+    - guarda en la tabla los contadores de aciertos acumulados en memoria
+    - suma la telemetría acumulada en memoria a la tabla de estadísticas
+    - elimina las entradas que superaron el TTL (más el máximo stale si
+      stale-while-revalidate está habilitado)
+    - desaloja las entradas sobrantes por encima de CACHE_MAX_ENTRIES (LRU o LFU)
+
+    Con varios workers, solo uno a la vez elimina filas (advisory lock) e
+    incrementa la generación del caché para que todos descarten sus copias
+    en memoria de esas filas.
+    """
+
+    def __init__(self, semantic_cache, interval_seconds: int = None,
+                 max_entries: int = None, policy: str = None):
+        self.cache = semantic_cache
+        self.interval_seconds = interval_seconds if interval_seconds is not None else settings.CACHE_SWEEP_INTERVAL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else settings.CACHE_MAX_ENTRIES
+        self.policy = (policy or settings.CACHE_EVICTION_POLICY).lower()
+        if self.policy not in _EVICTION_ORDER:
+            logger.warning(f"⚠️ Política de desalojo '{self.policy}' desconocida, usando lru")
+            self.policy = "lru"
+        self.stats = {
+            "runs": 0,
+            "skipped_locked": 0,
+            "errors": 0,
+            "expired_deleted": 0,
+            "evicted": 0,
+            "hits_flushed": 0,
+            "telemetry_rows_flushed": 0,
+            "last_run_at": None,
+            "last_duration_seconds": None,
+            "entries": None
+        }
+
+    @property
+    def _table(self) -> str:
+        return self.cache.vector_db.qualified_name
+
+    def _flush_hits(self, conn, hits: Dict[str, Tuple[int, float]]):
+        """Suma los aciertos acumulados en memoria a los contadores de cada fila"""
+        if not hits:
+            return
+        conn.execute(
+            text(
+                f"UPDATE {self._table} SET hit_count = COALESCE(hit_count, 0) + :hits, "
+                f"last_accessed_at = GREATEST(last_accessed_at, to_timestamp(:last_access)) "
+                f"WHERE id = :id"
+            ),
+            [
+                {"id": row_id, "hits": count, "last_access": last_access}
+                for row_id, (count, last_access) in hits.items()
+            ]
+        )
+
+    def _delete_expired(self, conn) -> List[str]:
+        result = conn.execute(
+            text(
+                f"DELETE FROM {self._table} "
+                f"WHERE COALESCE(cached_at, created_at) < now() - make_interval(hours => :retention_hours) "
+                f"RETURNING id"
+            ),
+            {"retention_hours": self.cache.retention_hours}
+        )
+        return [row[0] for row in result]
+
+    def _evict_overflow(self, conn) -> List[str]:
+        result = conn.execute(
+            text(
+                f"DELETE FROM {self._table} WHERE id IN ("
+                f"SELECT id FROM {self._table} ORDER BY {_EVICTION_ORDER[self.policy]} "
+                f"LIMIT GREATEST((SELECT count(*) FROM {self._table}) - :max_entries, 0)"
+                f") RETURNING id"
+            ),
+            {"max_entries": self.max_entries}
+        )
+        return [row[0] for row in result]
+
+    def sweep(self) -> Dict[str, Any]:
+        """Ejecuta una pasada completa (bloqueante, llamar desde un thread)"""
+        start = time.perf_counter()
+        try:
+            self.stats["telemetry_rows_flushed"] += self.cache.telemetry.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar la telemetría del caché: {e}")
+        
+        hits = self.cache.drain_hits()
+        try:
+            with self.cache.vector_db.db_engine.begin() as conn:
+                self._flush_hits(conn, hits)
+
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"),
+                    {"name": self._table}
+                ).scalar()
+                if acquired:
+                    expired = self._delete_expired(conn)
+                    evicted = self._evict_overflow(conn) if self.max_entries > 0 else []
+                    entries = conn.execute(text(f"SELECT count(*) FROM {self._table}")).scalar()
+        except Exception as e:
+            # La transacción no se confirmó: los aciertos se guardan en la próxima pasada
+            self.cache.restore_hits(hits)
+            self.stats["errors"] += 1
+            logger.error(f"Error limpiando el caché semántico: {e}")
+            return self.get_stats()
+        finally:
+            duration = time.perf_counter() - start
+            CACHE_SWEEP_DURATION.observe(duration)
+            self.stats["runs"] += 1
+            self.stats["last_run_at"] = datetime.now().isoformat()
+            self.stats["last_duration_seconds"] = round(duration, 3)
+
+        self.stats["hits_flushed"] += len(hits)
+        if not acquired:
+            self.stats["skipped_locked"] += 1
+            return self.get_stats()
+
+        # Otros workers pueden tener las filas eliminadas en su índice exacto o L1
+        self.cache.notify_deleted(expired + evicted)
+        CACHE_SWEEP_DELETED.labels(reason="expired").inc(len(expired))
+        CACHE_SWEEP_DELETED.labels(reason="evicted").inc(len(evicted))
+        CACHE_ENTRIES.set(entries)
+        self.stats["expired_deleted"] += len(expired)
+        self.stats["evicted"] += len(evicted)
+        self.stats["entries"] = entries
+
+        if expired or evicted:
+            logger.info(
+                "cache sweep expired=%d evicted=%d entries=%d duration=%.3fs",
+                len(expired), len(evicted), entries, self.stats["last_duration_seconds"]
+            )
+        return self.get_stats()
+
+    async def run(self):
+        """Bucle de limpieza; se cancela al cerrar la aplicación"""
+        if self.interval_seconds <= 0:
+            logger.info("Limpieza periódica del caché deshabilitada")
+            return
+        logger.info(
+            f"🧹 Limpieza del caché cada {self.interval_seconds}s "
+            f"(max_entries={self.max_entries}, política={self.policy})"
+        )
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await asyncio.to_thread(self.sweep)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de limpieza"""
+        return {
+            **self.stats,
+            "interval_seconds": self.interval_seconds,
+            "max_entries": self.max_entries,
+            "policy": self.policy
+        }
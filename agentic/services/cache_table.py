@@ -0,0 +1,194 @@
+"""
+Tabla del caché semántico.
+Siguiendo el principio de Single Responsibility - solo maneja el esquema y
+las consultas SQL de las entradas del caché.
+"""
+
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from phi.vectordb.pgvector import PgVector
+from sqlalchemy import Column, DateTime, Integer, String, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import Table
+
+logger = logging.getLogger(__name__)
+
+# (nombre, tipo de SQLAlchemy, DDL para tablas existentes)
+_CACHE_COLUMNS = (
+    ("query", postgresql.TEXT, "TEXT"),
+    ("response", postgresql.TEXT, "TEXT"),
+    ("formatted_response", postgresql.TEXT, "TEXT"),
+    ("model", String, "VARCHAR"),
+    ("prompt_hash", String, "VARCHAR"),
+    ("document_references", postgresql.JSONB, "JSONB"),
+    ("cached_at", lambda: DateTime(timezone=True), "TIMESTAMPTZ"),
+    ("hit_count", Integer, "INTEGER DEFAULT 0"),
+    ("last_accessed_at", lambda: DateTime(timezone=True), "TIMESTAMPTZ"),
+    ("lexical_signature", postgresql.JSONB, "JSONB"),
+)
+
+# Columnas devueltas por las búsquedas (sin embedding ni contenido)
+_ENTRY_COLUMNS = (
+    "id", "query", "response", "formatted_response", "model", "prompt_hash",
+    "document_references", "cached_at", "meta_data", "lexical_signature"
+)
+
+
+class SemanticCacheTable(PgVector):
+    """
+    PgVector con columnas propias para las entradas del caché (pregunta,
+    respuestas, modelo, hash del prompt de formateo, referencias, fecha,
+    contadores de uso y firma léxica de la pregunta).
+
+    Los filtros de TTL, modelo y referencias se aplican en la consulta SQL,
+    así que todos los candidatos devueltos son utilizables y no hay que
+    parsear JSON en el camino de la consulta.
+    """
+
+    def get_table(self) -> Table:
+        table = super().get_table()
+        for name, column_type, _ in _CACHE_COLUMNS:
+            if name not in table.c:
+                server_default = text("0") if name == "hit_count" else None
+                table.append_column(Column(name, column_type(), server_default=server_default))
+        return table
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.schema}.{self.table_name}"
+
+    @property
+    def generation_table(self) -> str:
+        return f"{self.qualified_name}_generation"
+
+    def create(self) -> None:
+        """Crea la tabla y agrega las columnas del caché a tablas existentes"""
+        super().create()
+        with self.db_engine.begin() as conn:
+            # Generación compartida por todos los workers: se incrementa cada vez
+            # que se eliminan entradas para que descarten sus copias en memoria
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.generation_table} ("
+                f"id SMALLINT PRIMARY KEY, generation BIGINT NOT NULL DEFAULT 0)"
+            ))
+            conn.execute(text(
+                f"INSERT INTO {self.generation_table} (id, generation) VALUES (1, 0) "
+                f"ON CONFLICT (id) DO NOTHING"
+            ))
+            for name, _, ddl in _CACHE_COLUMNS:
+                conn.execute(text(f"ALTER TABLE {self.qualified_name} ADD COLUMN IF NOT EXISTS {name} {ddl}"))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {self.table_name}_cached_at_idx "
+                f"ON {self.qualified_name} (cached_at)"
+            ))
+
+    def _usable(self, min_cached_at: datetime, model: Optional[str]):
+        """Condiciones para que una fila pueda servirse como acierto"""
+        conditions = [
+            self.table.c.cached_at >= min_cached_at,
+            func.jsonb_array_length(self.table.c.document_references) > 0,
+        ]
+        if model:
+            conditions.append(self.table.c.model == model)
+        return conditions
+
+    def get_entry(self, entry_id: str, min_cached_at: datetime,
+                  model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Busca una entrada utilizable por su id (clave de caché)"""
+        columns = [self.table.c[name] for name in _ENTRY_COLUMNS]
+        stmt = select(*columns).where(self.table.c.id == entry_id, *self._usable(min_cached_at, model))
+        with self.Session() as sess:
+            row = sess.execute(stmt).mappings().first()
+        return dict(row) if row else None
+
+    def search_entries(self, embedding: List[float], limit: int, min_cached_at: datetime,
+                       model: Optional[str] = None, include_embedding: bool = False) -> List[Dict[str, Any]]:
+        """
+        Busca las entradas utilizables más cercanas al embedding.
+
+        Returns:
+            Filas ordenadas por similitud coseno (campo `similarity`); con
+            `include_embedding` también el embedding guardado de cada fila
+        """
+        distance = self.table.c.embedding.cosine_distance(embedding)
+        columns = [self.table.c[name] for name in _ENTRY_COLUMNS]
+        if include_embedding:
+            columns.append(self.table.c.embedding)
+        stmt = (
+            select(*columns, (1 - distance).label("similarity"))
+            .where(*self._usable(min_cached_at, model))
+            .order_by(distance)
+            .limit(limit)
+        )
+        with self.Session() as sess:
+            rows = sess.execute(stmt).mappings().all()
+        return [dict(row) for row in rows]
+
+    def get_generation(self) -> int:
+        """Generación actual del caché"""
+        with self.db_engine.connect() as conn:
+            return conn.execute(text(f"SELECT generation FROM {self.generation_table} WHERE id = 1")).scalar() or 0
+
+    def bump_generation(self) -> int:
+        """Incrementa la generación del caché y retorna la nueva"""
+        with self.db_engine.begin() as conn:
+            return conn.execute(text(
+                f"INSERT INTO {self.generation_table} (id, generation) VALUES (1, 1) "
+                f"ON CONFLICT (id) DO UPDATE SET generation = {self.generation_table}.generation + 1 "
+                f"RETURNING generation"
+            )).scalar()
+
+    def delete_by_documents(self, document_names: List[str]) -> List[str]:
+        """
+        Elimina las entradas que citan alguno de los documentos (sin distinguir
+        mayúsculas).
+
+        Returns:
+            Ids de las filas eliminadas
+        """
+        names = [name.lower() for name in document_names if name]
+        if not names:
+            return []
+        with self.db_engine.begin() as conn:
+            result = conn.execute(
+                text(
+                    f"DELETE FROM {self.qualified_name} WHERE EXISTS ("
+                    f"SELECT 1 FROM jsonb_array_elements(COALESCE(document_references, '[]'::jsonb)) AS ref "
+                    f"WHERE lower(ref->>'document_name') = ANY(:names)"
+                    f") RETURNING id"
+                ),
+                {"names": names}
+            )
+            return [row[0] for row in result]
+
+    def upsert_entry(self, entry_id: str, query: str, embedding: List[float], response: str,
+                     formatted_response: Optional[str], model: str, prompt_hash: Optional[str],
+                     document_references: List[Dict[str, Any]], meta_data: Dict[str, Any],
+                     cached_at: datetime, lexical_signature: Optional[Dict[str, Any]] = None):
+        """Inserta o reemplaza una entrada; conserva sus contadores de uso"""
+        values = {
+            "id": entry_id,
+            "name": entry_id,
+            "content": query,
+            "content_hash": hashlib.md5(query.encode()).hexdigest(),
+            "embedding": embedding,
+            "meta_data": meta_data,
+            "query": query,
+            "response": response,
+            "formatted_response": formatted_response,
+            "model": model,
+            "prompt_hash": prompt_hash,
+            "document_references": document_references,
+            "cached_at": cached_at,
+            "lexical_signature": lexical_signature,
+        }
+        insert_stmt = postgresql.insert(self.table).values(**values)
+        update_values = {name: insert_stmt.excluded[name] for name in values if name != "id"}
+        if "updated_at" in self.table.c:
+            update_values["updated_at"] = func.now()
+        upsert_stmt = insert_stmt.on_conflict_do_update(index_elements=["id"], set_=update_values)
+        with self.Session() as sess, sess.begin():
+            sess.execute(upsert_stmt)
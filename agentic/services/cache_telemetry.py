@@ -0,0 +1,270 @@
+"""
+Telemetría persistente del caché semántico.
+Siguiendo el principio de Single Responsibility - solo acumula y agrega
+contadores e histogramas de las consultas al caché.
+
+Cada worker acumula deltas en memoria y los suma periódicamente a una tabla
+compartida (una fila por hora, métrica, etiqueta y bucket), de modo que las
+estadísticas son las mismas en todos los workers y sobreviven a reinicios y a
+/cache/clear.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los buckets de latencia; el último bucket es +Inf
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Resultados de una consulta que cuentan como acierto
+HIT_RESULTS = ("exact_hit", "l1_hit", "hit")
+# Scores de similitud en buckets de 0.01 (0..100)
+SIMILARITY_BUCKETS = 100
+
+# (hora desde epoch, métrica, etiqueta, bucket)
+_Key = Tuple[int, str, str, int]
+
+
+def _latency_bucket(duration_ms: float) -> int:
+    for index, upper in enumerate(LATENCY_BUCKETS_MS):
+        if duration_ms <= upper:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _similarity_bucket(score: float) -> int:
+    # floor (con tolerancia por el error de coma flotante): 0.849 va al bucket 84, no al 85
+    return max(0, min(SIMILARITY_BUCKETS, math.floor(score * SIMILARITY_BUCKETS + 1e-9)))
+
+
+def _latency_percentile(histogram: Dict[int, int], percentile: float) -> Optional[float]:
+    """Límite superior (ms) del bucket que contiene el percentil"""
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+    target = total * percentile
+    cumulative = 0
+    for bucket in sorted(histogram):
+        cumulative += histogram[bucket]
+        if cumulative >= target:
+            return float(LATENCY_BUCKETS_MS[bucket]) if bucket < len(LATENCY_BUCKETS_MS) else float("inf")
+    return None
+
+
+class CacheTelemetry:
+    """
+    Registra por consulta al caché:
+    - el resultado (exact_hit, l1_hit, hit, miss, error)
+    - la latencia de la búsqueda, por resultado
+    - el mejor score de similitud (ya ajustado por las validaciones léxicas)
+      de las búsquedas semánticas, separado en aciertos y fallos
+
+    Con la distribución de scores se estima cuántos aciertos habría con otro
+    CACHE_SIMILARITY_THRESHOLD (ver what_if).
+    """
+
+    def __init__(self, db_engine, table: str):
+        self.db_engine = db_engine
+        self.table = table
+        self._pending: Dict[_Key, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def create(self):
+        """Crea la tabla de estadísticas si no existe"""
+        with self.db_engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"period_start TIMESTAMPTZ NOT NULL, "
+                f"metric VARCHAR NOT NULL, "
+                f"label VARCHAR NOT NULL, "
+                f"bucket INTEGER NOT NULL, "
+                f"value BIGINT NOT NULL DEFAULT 0, "
+                f"PRIMARY KEY (period_start, metric, label, bucket))"
+            ))
+
+    def _add(self, metric: str, label: str, bucket: int = 0, value: int = 1):
+        key = (int(time.time() // 3600), metric, label, bucket)
+        with self._lock:
+            self._pending[key] += value
+
+    def record_lookup(self, result: str, duration_seconds: float, best_score: Optional[float] = None):
+        """Registra una consulta al caché"""
+        self._add("lookups", result)
+        self._add("latency_ms", result, _latency_bucket(duration_seconds * 1000))
+        if best_score is not None:
+            outcome = "hit" if result in HIT_RESULTS else "miss"
+            self._add("similarity", outcome, _similarity_bucket(best_score))
+
+    def record_event(self, name: str, value: int = 1):
+        """Registra un evento del caché (store, invalidación, acierto stale...)"""
+        if value:
+            self._add("events", name, value=value)
+
+    def _drain(self) -> Dict[_Key, int]:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        return pending
+
+    def _restore(self, pending: Dict[_Key, int]):
+        with self._lock:
+            for key, value in pending.items():
+                self._pending[key] += value
+
+    def flush(self) -> int:
+        """
+        Suma los deltas acumulados a la tabla compartida (bloqueante). Si falla,
+        los deltas se conservan para el próximo intento.
+
+        Returns:
+            Número de filas actualizadas
+        """
+        pending = self._drain()
+        if not pending:
+            return 0
+        try:
+            with self.db_engine.begin() as conn:
+                conn.execute(
+                    text(
+                        f"INSERT INTO {self.table} (period_start, metric, label, bucket, value) "
+                        f"VALUES (to_timestamp(:period * 3600), :metric, :label, :bucket, :value) "
+                        f"ON CONFLICT (period_start, metric, label, bucket) "
+                        f"DO UPDATE SET value = {self.table}.value + EXCLUDED.value"
+                    ),
+                    [
+                        {"period": period, "metric": metric, "label": label, "bucket": bucket, "value": value}
+                        for (period, metric, label, bucket), value in pending.items()
+                    ]
+                )
+        except Exception:
+            self._restore(pending)
+            raise
+        return len(pending)
+
+    def _aggregate(self, hours: Optional[int]) -> Tuple[Dict[Tuple[str, str, int], int], bool]:
+        """
+        Totales de la tabla más los deltas aún no guardados de este worker.
+
+        Returns:
+            (totales por métrica/etiqueta/bucket, si se pudo leer la tabla)
+        """
+        since_period = int(time.time() // 3600) - hours + 1 if hours else None
+        totals: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        persisted = True
+        try:
+            query = f"SELECT metric, label, bucket, sum(value) FROM {self.table}"
+            params = {}
+            if since_period is not None:
+                query += " WHERE period_start >= to_timestamp(:since * 3600)"
+                params["since"] = since_period
+            query += " GROUP BY metric, label, bucket"
+            with self.db_engine.connect() as conn:
+                for metric, label, bucket, value in conn.execute(text(query), params):
+                    totals[(metric, label, bucket)] += int(value)
+        except Exception as e:
+            persisted = False
+            logger.warning(f"⚠️ No se pudieron leer las estadísticas del caché: {e}")
+
+        with self._lock:
+            pending = list(self._pending.items())
+        for (period, metric, label, bucket), value in pending:
+            if since_period is None or period >= since_period:
+                totals[(metric, label, bucket)] += value
+        return totals, persisted
+
+    @staticmethod
+    def _series(totals: Dict[Tuple[str, str, int], int], metric: str) -> Dict[str, Dict[int, int]]:
+        series: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for (m, label, bucket), value in totals.items():
+            if m == metric and value:
+                series[label][bucket] = value
+        return series
+
+    @staticmethod
+    def _estimate(similarity: Dict[str, Dict[int, int]], lookups: Dict[str, int],
+                  thresholds: Iterable[float]) -> List[Dict[str, Any]]:
+        total_lookups = sum(lookups.values())
+        fixed_hits = lookups.get("exact_hit", 0)
+        scored = defaultdict(int)
+        for histogram in similarity.values():
+            for bucket, value in histogram.items():
+                scored[bucket] += value
+
+        estimates = []
+        for threshold in thresholds:
+            semantic_hits = sum(v for b, v in scored.items() if b >= _similarity_bucket(threshold))
+            hits = fixed_hits + semantic_hits
+            estimates.append({
+                "threshold": round(threshold, 3),
+                "estimated_semantic_hits": semantic_hits,
+                "estimated_hits": hits,
+                "estimated_hit_rate": f"{(hits / total_lookups * 100) if total_lookups else 0:.1f}%"
+            })
+        return estimates
+
+    def summary(self, hours: Optional[int] = None,
+                thresholds: Iterable[float] = (0.80, 0.84, 0.86, 0.88, 0.90, 0.92, 0.95)) -> Dict[str, Any]:
+        """
+        Estadísticas agregadas de todos los workers.
+
+        Args:
+            hours: Limitar a las últimas N horas (todas si es None)
+            thresholds: Umbrales para la estimación what-if
+        """
+        totals, persisted = self._aggregate(hours)
+        lookups = {label: hist.get(0, 0) for label, hist in self._series(totals, "lookups").items()}
+        events = {label: hist.get(0, 0) for label, hist in self._series(totals, "events").items()}
+        latency = self._series(totals, "latency_ms")
+        similarity = self._series(totals, "similarity")
+
+        total_lookups = sum(lookups.values())
+        hits = sum(lookups.get(result, 0) for result in HIT_RESULTS)
+        hit_scores = similarity.get("hit", {})
+        hit_count = sum(hit_scores.values())
+
+        return {
+            "window_hours": hours,
+            "persisted": persisted,
+            "lookups": lookups,
+            "total_lookups": total_lookups,
+            "hits": hits,
+            "hit_rate": f"{(hits / total_lookups * 100) if total_lookups else 0:.1f}%",
+            "avg_hit_similarity": round(
+                sum(b * v for b, v in hit_scores.items()) / hit_count / SIMILARITY_BUCKETS, 4
+            ) if hit_count else None,
+            "events": events,
+            "latency_ms": {
+                result: {
+                    "buckets": {
+                        (str(LATENCY_BUCKETS_MS[b]) if b < len(LATENCY_BUCKETS_MS) else "+Inf"): v
+                        for b, v in sorted(histogram.items())
+                    },
+                    "p50": _latency_percentile(histogram, 0.50),
+                    "p95": _latency_percentile(histogram, 0.95),
+                    "p99": _latency_percentile(histogram, 0.99)
+                }
+                for result, histogram in latency.items()
+            },
+            "similarity_histogram": {
+                outcome: {f"{b / SIMILARITY_BUCKETS:.2f}": v for b, v in sorted(histogram.items())}
+                for outcome, histogram in similarity.items()
+            },
+            "threshold_what_if": self._estimate(similarity, lookups, thresholds)
+        }
+
+    def what_if(self, thresholds: Iterable[float], hours: Optional[int] = None) -> Dict[str, Any]:
+        """Estimación de aciertos con otros umbrales a partir de los scores observados"""
+        totals, persisted = self._aggregate(hours)
+        lookups = {label: hist.get(0, 0) for label, hist in self._series(totals, "lookups").items()}
+        return {
+            "window_hours": hours,
+            "persisted": persisted,
+            "total_lookups": sum(lookups.values()),
+            "exact_hits": lookups.get("exact_hit", 0),
+            "estimates": self._estimate(self._series(totals, "similarity"), lookups, thresholds)
+        }
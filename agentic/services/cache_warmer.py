@@ -0,0 +1,175 @@
+"""
+Precarga del caché semántico.
+Siguiendo el principio de Single Responsibility - solo recorre una lista de
+preguntas y genera las respuestas que todavía no están en el caché.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from services.request_coalescer import normalize_query
+    from utils.metrics import CACHE_WARM_QUESTIONS
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from .request_coalescer import normalize_query
+    from ..utils.metrics import CACHE_WARM_QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+# Recibe la pregunta y retorna el resultado de la generación (ver routers/chat.py)
+GenerateFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+class CacheWarmerBusyError(Exception):
+    """Ya hay una precarga en curso"""
+
+
+class CacheWarmer:
+    """
+    Ejecuta una precarga a la vez en segundo plano: omite las preguntas que el
+    caché ya responde con una entrada vigente y genera las demás con concurrencia acotada,
+    usando el mismo pipeline que /chat (agente, referencias, formateo y store).
+    """
+
+    def __init__(self, semantic_cache, concurrency: int = None):
+        self.cache = semantic_cache
+        self.concurrency = concurrency if concurrency is not None else settings.CACHE_WARM_CONCURRENCY
+        self._task: Optional[asyncio.Task] = None
+        self.job: Optional[Dict[str, Any]] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @staticmethod
+    def _unique_questions(questions: List[str]) -> List[str]:
+        """Descarta preguntas vacías y repetidas (mismo texto normalizado)"""
+        seen = set()
+        unique = []
+        for question in questions:
+            question = question.strip()
+            key = normalize_query(question)
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(question)
+        return unique
+
+    def start(self, questions: List[str], generate_fn: GenerateFn,
+              concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Lanza la precarga en segundo plano.
+
+        Raises:
+            CacheWarmerBusyError: si ya hay una precarga en curso
+        """
+        if self.running:
+            raise CacheWarmerBusyError("Ya hay una precarga del caché en curso")
+
+        questions = self._unique_questions(questions)
+        self.job = {
+            "status": "running",
+            "total": len(questions),
+            "processed": 0,
+            "skipped_cached": 0,
+            "generated": 0,
+            "stored": 0,
+            "no_references": 0,
+            "not_stored": 0,
+            "failed": 0,
+            "concurrency": max(1, concurrency or self.concurrency),
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "errors": []
+        }
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run(questions, generate_fn))
+        return self.get_status()
+
+    async def _warm_one(self, question: str, generate_fn: GenerateFn, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                # Misma búsqueda que /chat: se omiten las preguntas que el caché
+                # ya responde (exacta o semántica); las stale se regeneran
+                cached = await self.cache.find_similar(question, question[:500])
+                if cached is not None and not cached["stale"]:
+                    self.job["skipped_cached"] += 1
+                    CACHE_WARM_QUESTIONS.labels(outcome="skipped").inc()
+                    return
+
+                result = await generate_fn(question)
+                self.job["generated"] += 1
+                if result.get("cached"):
+                    outcome = "stored"
+                elif not result.get("document_references"):
+                    # store() solo guarda respuestas con referencias a documentos
+                    outcome = "no_references"
+                else:
+                    outcome = "not_stored"
+                self.job[outcome] += 1
+                CACHE_WARM_QUESTIONS.labels(outcome=outcome).inc()
+            except Exception as e:
+                # Los errores del pipeline de chat llegan como HTTPException
+                detail = getattr(e, "detail", None) or str(e)
+                self.job["failed"] += 1
+                CACHE_WARM_QUESTIONS.labels(outcome="failed").inc()
+                if len(self.job["errors"]) < 20:
+                    self.job["errors"].append({"question": question[:200], "error": detail})
+                logger.warning(f"⚠️ Error precargando {question[:50]!r}: {detail}")
+            finally:
+                self.job["processed"] += 1
+                if self.job["processed"] % 10 == 0:
+                    status = self.get_status()
+                    logger.info(
+                        "cache warm progreso=%d/%d generated=%d skipped=%d failed=%d qps=%.2f",
+                        status["processed"], status["total"], status["generated"],
+                        status["skipped_cached"], status["failed"], status["questions_per_second"]
+                    )
+
+    async def _run(self, questions: List[str], generate_fn: GenerateFn):
+        semaphore = asyncio.Semaphore(self.job["concurrency"])
+        logger.info(f"🔥 Precargando caché con {len(questions)} preguntas (concurrencia={self.job['concurrency']})")
+        try:
+            await asyncio.gather(*(self._warm_one(q, generate_fn, semaphore) for q in questions))
+            self.job["status"] = "completed"
+        except asyncio.CancelledError:
+            self.job["status"] = "cancelled"
+            raise
+        finally:
+            self.job["finished_at"] = datetime.now().isoformat()
+            self._elapsed = time.perf_counter() - self._started
+            status = self.get_status()
+            logger.info(
+                "cache warm %s processed=%d stored=%d skipped=%d failed=%d elapsed=%.1fs qps=%.2f",
+                status["status"], status["processed"], status["stored"], status["skipped_cached"],
+                status["failed"], status["elapsed_seconds"], status["questions_per_second"]
+            )
+
+    async def cancel(self):
+        """Cancela la precarga en curso (al cerrar la aplicación)"""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def get_status(self) -> Dict[str, Any]:
+        """Progreso y throughput de la última precarga"""
+        if self.job is None:
+            return {"status": "idle"}
+        elapsed = time.perf_counter() - self._started if self.running else self._elapsed
+        return {
+            **self.job,
+            "elapsed_seconds": round(elapsed, 2),
+            "questions_per_second": round(self.job["processed"] / elapsed, 3) if elapsed > 0 else 0.0,
+            "generated_per_second": round(self.job["generated"] / elapsed, 3) if elapsed > 0 else 0.0
+        }
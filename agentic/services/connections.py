@@ -0,0 +1,98 @@
+"""
+Conexiones compartidas por todo el proceso.
+Siguiendo el principio de Single Responsibility - solo maneja el pool de
+conexiones a PostgreSQL y el cliente HTTP de Ollama.
+"""
+
+import logging
+import threading
+from typing import Any, Dict
+
+import httpx
+from ollama import Client as OllamaClient
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_db_engine: Engine = None
+_ollama_client: OllamaClient = None
+
+
+def get_db_engine() -> Engine:
+    """
+    Obtiene el engine de SQLAlchemy compartido por el storage de agentes,
+    el knowledge base y el caché semántico.
+    """
+    global _db_engine
+    if _db_engine is None:
+        with _lock:
+            if _db_engine is None:
+                _db_engine = create_engine(
+                    settings.DB_URL,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    pool_recycle=settings.DB_POOL_RECYCLE,
+                    pool_pre_ping=True
+                )
+                logger.info(
+                    f"🔌 Pool de PostgreSQL creado - size: {settings.DB_POOL_SIZE}, "
+                    f"overflow: {settings.DB_MAX_OVERFLOW}"
+                )
+    return _db_engine
+
+
+def get_ollama_client() -> OllamaClient:
+    """
+    Obtiene el cliente HTTP de Ollama compartido, con conexiones keep-alive
+    reutilizables entre agentes, formateador y embedders.
+    """
+    global _ollama_client
+    if _ollama_client is None:
+        with _lock:
+            if _ollama_client is None:
+                _ollama_client = OllamaClient(
+                    host=settings.OLLAMA_HOST,
+                    timeout=settings.OLLAMA_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                        keepalive_expiry=settings.OLLAMA_KEEPALIVE_SECONDS
+                    )
+                )
+    return _ollama_client
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """Estado del pool de conexiones a PostgreSQL"""
+    if _db_engine is None:
+        return {"initialized": False}
+    pool = _db_engine.pool
+    return {
+        "initialized": True,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin()
+    }
+
+
+def dispose_connections():
+    """Cierra el pool de PostgreSQL y el cliente de Ollama"""
+    global _db_engine, _ollama_client
+    with _lock:
+        if _db_engine is not None:
+            _db_engine.dispose()
+            _db_engine = None
+        if _ollama_client is not None:
+            _ollama_client._client.close()
+            _ollama_client = None
@@ -0,0 +1,92 @@
+"""
+Manifiesto de documentos indexados.
+Siguiendo el principio de Single Responsibility - solo registra qué versión
+de cada archivo está en el knowledge base y con qué chunks.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentManifest:
+    """
+    Una fila por archivo: hash del contenido, ids de sus chunks en la tabla
+    de vectores y fecha de indexación. Permite saber si un archivo cambió sin
+    leerlo con pypdf y eliminar solo sus filas.
+    """
+
+    def __init__(self, db_engine, table: str):
+        self.db_engine = db_engine
+        self.table = table
+
+    def create(self):
+        """Crea la tabla del manifiesto si no existe"""
+        with self.db_engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"filename VARCHAR PRIMARY KEY, "
+                f"content_hash VARCHAR NOT NULL, "
+                f"chunk_ids JSONB NOT NULL DEFAULT '[]'::jsonb, "
+                f"size_bytes BIGINT, "
+                f"indexed_at TIMESTAMPTZ NOT NULL)"
+            ))
+
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        """Entradas del manifiesto por nombre de archivo"""
+        with self.db_engine.connect() as conn:
+            rows = conn.execute(text(
+                f"SELECT filename, content_hash, chunk_ids, size_bytes, indexed_at FROM {self.table}"
+            )).mappings().all()
+        return {row["filename"]: dict(row) for row in rows}
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self.db_engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    f"SELECT filename, content_hash, chunk_ids, size_bytes, indexed_at "
+                    f"FROM {self.table} WHERE filename = :filename"
+                ),
+                {"filename": filename}
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Entrada de un archivo indexado con el mismo contenido (None si no hay)"""
+        with self.db_engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    f"SELECT filename, content_hash, chunk_ids, size_bytes, indexed_at "
+                    f"FROM {self.table} WHERE content_hash = :content_hash ORDER BY indexed_at DESC LIMIT 1"
+                ),
+                {"content_hash": content_hash}
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def upsert(self, conn, filename: str, content_hash: str, chunk_ids: List[str], size_bytes: int):
+        """Registra la versión indexada de un archivo (dentro de la transacción recibida)"""
+        conn.execute(
+            text(
+                f"INSERT INTO {self.table} (filename, content_hash, chunk_ids, size_bytes, indexed_at) "
+                f"VALUES (:filename, :content_hash, CAST(:chunk_ids AS JSONB), :size_bytes, :indexed_at) "
+                f"ON CONFLICT (filename) DO UPDATE SET content_hash = EXCLUDED.content_hash, "
+                f"chunk_ids = EXCLUDED.chunk_ids, size_bytes = EXCLUDED.size_bytes, "
+                f"indexed_at = EXCLUDED.indexed_at"
+            ),
+            {
+                "filename": filename,
+                "content_hash": content_hash,
+                "chunk_ids": json.dumps(chunk_ids),
+                "size_bytes": size_bytes,
+                "indexed_at": datetime.now(timezone.utc)
+            }
+        )
+
+    def delete(self, conn, filename: str):
+        """Elimina la entrada de un archivo (dentro de la transacción recibida)"""
+        conn.execute(text(f"DELETE FROM {self.table} WHERE filename = :filename"), {"filename": filename})
@@ -0,0 +1,230 @@
+"""
+Embedder de Ollama usado por el knowledge base y el caché semántico.
+Siguiendo el principio de Single Responsibility - solo calcula embeddings.
+"""
+
+import hashlib
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from ollama import ResponseError
+from phi.embedder.ollama import OllamaEmbedder
+from pydantic import PrivateAttr
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from utils.metrics import track_stage, OLLAMA_ERRORS, EMBEDDING_MEMO_LOOKUPS, EMBEDDING_BATCH_SIZE
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from ..utils.metrics import track_stage, OLLAMA_ERRORS, EMBEDDING_MEMO_LOOKUPS, EMBEDDING_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingMemo:
+    """
+    LRU de embeddings compartido por todo el proceso, indexado por modelo y
+    hash del texto. Evita calcular varias veces el embedding de la misma
+    pregunta (búsqueda en caché, store, coalescencia y búsquedas repetidas).
+    Los chunks de la indexación no pasan por el memo.
+
+    Los embeddings se guardan como arrays float32 de solo lectura (unos 3 KB
+    por vector de 768 dimensiones) y se retornan como listas nuevas: un
+    llamador que modifique su lista no altera el memo.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries if max_entries is not None else settings.EMBEDDING_MEMO_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(model: str, text: str) -> Tuple[str, str]:
+        return model, hashlib.sha1(text.encode()).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self._key(model, text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+        EMBEDDING_MEMO_LOOKUPS.labels(result="hit" if embedding is not None else "miss").inc()
+        return embedding.tolist() if embedding is not None else None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        if self.max_entries <= 0:
+            return
+        key = self._key(model, text)
+        vector = np.array(embedding, dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": f"{(self.stats['hits'] / lookups * 100) if lookups else 0:.1f}%"
+            }
+
+
+embedding_memo = EmbeddingMemo()
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Errores de red, timeouts, 429 y 5xx de Ollama"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, ResponseError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+class InstrumentedOllamaEmbedder(OllamaEmbedder):
+    """
+    OllamaEmbedder que calcula los embeddings por lotes con /api/embed
+    (varios textos por petición, varias peticiones en vuelo), reintenta los
+    errores transitorios con backoff exponencial, reutiliza los embeddings
+    del memo compartido y registra la duración y los errores de cada
+    llamada a Ollama.
+
+    Los lotes se envían por un único pool de `max_in_flight` threads creado
+    con el embedder, así el límite de peticiones en vuelo vale también entre
+    llamadas simultáneas.
+
+    Solo las consultas usan el memo: la indexación calcula los embeddings de
+    los chunks con prepared(), que los deja disponibles únicamente para el
+    upsert de phi en el mismo thread.
+    """
+
+    metrics_stage: str = "embed"
+    batch_size: int = settings.EMBED_BATCH_SIZE
+    max_in_flight: int = settings.EMBED_MAX_IN_FLIGHT
+    max_retries: int = settings.EMBED_MAX_RETRIES
+    retry_backoff_seconds: float = settings.EMBED_RETRY_BACKOFF_SECONDS
+
+    _executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    _prepared: threading.local = PrivateAttr(default_factory=threading.local)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        if self.max_in_flight > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_in_flight, thread_name_prefix=f"{self.metrics_stage}-embed"
+            )
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Una petición a /api/embed, con reintentos"""
+        kwargs: Dict[str, Any] = {}
+        if self.options is not None:
+            kwargs["options"] = self.options
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with track_stage(self.metrics_stage):
+                    response = self.client.embed(model=self.model, input=texts, **kwargs)
+                embeddings = response["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Ollama retornó {len(embeddings)} embeddings para {len(texts)} textos")
+                EMBEDDING_BATCH_SIZE.observe(len(texts))
+                return embeddings
+            except Exception as e:
+                OLLAMA_ERRORS.labels(operation="embed").inc()
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                # Backoff exponencial con jitter para no reintentar todos a la vez
+                delay = self.retry_backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+                logger.warning(
+                    f"⚠️ Error calculando {len(texts)} embeddings (intento {attempt + 1}), "
+                    f"reintentando en {delay:.1f}s: {e}"
+                )
+                time.sleep(delay)
+
+    def get_embeddings(self, texts: List[str], memoize: bool = True) -> List[List[float]]:
+        """
+        Embeddings de varios textos en el mismo orden. Los que ya están en el
+        memo no se recalculan; el resto se envía en lotes de `batch_size`
+        con hasta `max_in_flight` peticiones simultáneas, y se guarda en el memo.
+        Con `memoize=False` no se consulta ni se llena el memo.
+
+        Raises:
+            Exception: si un lote falla después de los reintentos
+        """
+        if memoize:
+            results: List[Optional[List[float]]] = [embedding_memo.get(self.model, text) for text in texts]
+        else:
+            results = [None] * len(texts)
+        missing = list(OrderedDict.fromkeys(text for text, embedding in zip(texts, results) if embedding is None))
+        if not missing:
+            return results
+
+        batch_size = max(1, self.batch_size)
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+        if len(batches) == 1 or self._executor is None:
+            batch_results = [self._embed_batch(batch) for batch in batches]
+        else:
+            batch_results = list(self._executor.map(self._embed_batch, batches))
+
+        computed = {}
+        for batch, embeddings in zip(batches, batch_results):
+            for text, embedding in zip(batch, embeddings):
+                computed[text] = embedding
+                if memoize:
+                    embedding_memo.put(self.model, text, embedding)
+        return [embedding if embedding is not None else computed[text] for text, embedding in zip(texts, results)]
+
+    @contextmanager
+    def prepared(self, texts: List[str]) -> Iterator[None]:
+        """
+        Calcula por lotes, sin el memo, los embeddings de `texts` y los
+        entrega a get_embedding dentro del bloque y en este thread (el upsert
+        de phi embebe los documentos de a uno).
+
+        Raises:
+            Exception: si un lote falla después de los reintentos
+        """
+        embeddings = dict(zip(texts, self.get_embeddings(texts, memoize=False)))
+        previous = getattr(self._prepared, "embeddings", None)
+        self._prepared.embeddings = embeddings
+        try:
+            yield
+        finally:
+            self._prepared.embeddings = previous
+
+    def get_embedding(self, text: str) -> List[float]:
+        prepared = getattr(self._prepared, "embeddings", None)
+        if prepared is not None and text in prepared:
+            return prepared[text]
+        try:
+            return self.get_embeddings([text])[0]
+        except Exception as e:
+            # Mismo contrato que phi: registrar el error y retornar una lista vacía
+            logger.warning(f"⚠️ Error calculando embedding: {e}")
+            return []
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        # phi usa este método al insertar documentos (Document.embed)
+        return self.get_embedding(text), None
+
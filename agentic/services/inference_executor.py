@@ -0,0 +1,239 @@
+"""
+Ejecutor dedicado para inferencia de modelos.
+Siguiendo el principio de Single Responsibility - solo maneja la ejecución
+de llamadas bloqueantes al LLM fuera del event loop.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from utils.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_RUNNING, INFERENCE_WAIT
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from ..utils.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_RUNNING, INFERENCE_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFullError(Exception):
+    """Se lanza cuando la cola de inferencia está llena"""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Cola de inferencia llena, reintentar en {retry_after}s")
+
+
+class InferenceExecutor:
+    """
+    Ejecuta llamadas bloqueantes (agent.run, formateo) en un pool de threads
+    con concurrencia limitada y una cola de espera acotada.
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue_size: int = None):
+        self.max_concurrency = max_concurrency or settings.INFERENCE_MAX_CONCURRENCY
+        self.max_queue_size = max_queue_size if max_queue_size is not None else settings.INFERENCE_MAX_QUEUE_SIZE
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="inference"
+        )
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "total_run_seconds": 0.0
+        }
+        INFERENCE_QUEUE_DEPTH.set_function(lambda: self._queued)
+        INFERENCE_RUNNING.set_function(lambda: self._running)
+
+    def _check_capacity(self):
+        """Lanza InferenceQueueFullError si no hay lugar (debe llamarse con el lock)"""
+        if self._running + self._queued >= self.max_concurrency + self.max_queue_size:
+            self.stats["rejected"] += 1
+            raise InferenceQueueFullError(self._estimate_retry_after())
+
+    def _reserve_slot(self):
+        """Reserva un lugar en la cola o lanza InferenceQueueFullError"""
+        with self._lock:
+            self._check_capacity()
+            self._queued += 1
+            self.stats["submitted"] += 1
+
+    def check_capacity(self):
+        """
+        Verifica que haya lugar en la cola sin reservarlo, para rechazar una
+        petición antes de comenzar a responder.
+
+        Raises:
+            InferenceQueueFullError: Si no hay lugar en la cola de espera
+        """
+        with self._lock:
+            self._check_capacity()
+
+    def _estimate_retry_after(self) -> int:
+        """Estima los segundos hasta que se libere un lugar en la cola"""
+        completed = self.stats["completed"] + self.stats["failed"]
+        if completed == 0:
+            return settings.INFERENCE_RETRY_AFTER_SECONDS
+        avg_run = self.stats["total_run_seconds"] / completed
+        waves = (self._queued + self._running) / self.max_concurrency
+        return max(1, math.ceil(avg_run * waves))
+
+    def _release_queued(self, ticket: Dict[str, bool]) -> bool:
+        """Libera el lugar en la cola una sola vez por tarea (debe llamarse con el lock)"""
+        if ticket["dequeued"]:
+            return False
+        ticket["dequeued"] = True
+        self._queued -= 1
+        return True
+
+    def _wrap(self, func: Callable, enqueued_at: float, ticket: Dict[str, bool]) -> Callable:
+        """Envuelve la función para medir espera y tiempo de ejecución"""
+        def runner(*args, **kwargs):
+            started_at = time.monotonic()
+            wait = started_at - enqueued_at
+            with self._lock:
+                self._release_queued(ticket)
+                self._running += 1
+                self.stats["total_wait_seconds"] += wait
+                self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], wait)
+            INFERENCE_WAIT.observe(wait)
+
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.stats["total_run_seconds"] += time.monotonic() - started_at
+                    self.stats["failed" if failed else "completed"] += 1
+        return runner
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta una función bloqueante en el pool de inferencia.
+
+        Args:
+            func: Función bloqueante a ejecutar
+            *args, **kwargs: Argumentos para la función
+
+        Returns:
+            El resultado de la función
+
+        Raises:
+            InferenceQueueFullError: Si no hay lugar en la cola de espera
+        """
+        self._reserve_slot()
+        loop = asyncio.get_running_loop()
+        ticket = {"dequeued": False}
+        runner = self._wrap(func, time.monotonic(), ticket)
+        try:
+            return await loop.run_in_executor(self._executor, lambda: runner(*args, **kwargs))
+        except asyncio.CancelledError:
+            # Si la tarea nunca llegó a ejecutarse, liberar su lugar en la cola
+            with self._lock:
+                self._release_queued(ticket)
+            logger.debug("Tarea de inferencia cancelada por el cliente")
+            raise
+
+    def stream(self, func: Callable[..., Iterator[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Ejecuta un generador bloqueante en el pool y expone sus elementos
+        como un iterador asíncrono.
+
+        El lugar en la cola se reserva en la primera iteración y se libera al
+        terminar o cerrar el iterador; un stream que nunca se itera (el cliente
+        se desconectó antes de empezar la respuesta) no ocupa lugar. Si la cola
+        está llena la primera iteración lanza InferenceQueueFullError; para
+        responder 503 antes de comenzar usar check_capacity().
+
+        Args:
+            func: Función que retorna un generador bloqueante
+            *args, **kwargs: Argumentos para la función
+
+        Returns:
+            Iterador asíncrono con los elementos producidos por el generador
+        """
+        return self._iterate(func, args, kwargs)
+
+    async def _iterate(self, func: Callable, args: tuple, kwargs: dict) -> AsyncIterator[Any]:
+        """Consume el generador en un thread del pool y reenvía sus elementos al event loop"""
+        self._reserve_slot()
+        enqueued_at = time.monotonic()
+        ticket = {"dequeued": False}
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop_event = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for item in func(*args, **kwargs):
+                    if stop_event.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (done, e))
+                raise
+            loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+        future = loop.run_in_executor(self._executor, self._wrap(produce, enqueued_at, ticket))
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    break
+                yield item
+        finally:
+            # El cliente se desconectó o terminó el stream: detener el productor
+            stop_event.set()
+            if not future.done():
+                future.cancel()
+                with self._lock:
+                    self._release_queued(ticket)
+            elif not future.cancelled():
+                future.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estadísticas del ejecutor"""
+        with self._lock:
+            started = self.stats["completed"] + self.stats["failed"] + self._running
+            avg_wait = self.stats["total_wait_seconds"] / started if started else 0.0
+            finished = self.stats["completed"] + self.stats["failed"]
+            avg_run = self.stats["total_run_seconds"] / finished if finished else 0.0
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue_size": self.max_queue_size,
+                "running": self._running,
+                "queue_depth": self._queued,
+                "submitted": self.stats["submitted"],
+                "completed": self.stats["completed"],
+                "failed": self.stats["failed"],
+                "rejected": self.stats["rejected"],
+                "avg_wait_seconds": round(avg_wait, 3),
+                "max_wait_seconds": round(self.stats["max_wait_seconds"], 3),
+                "avg_run_seconds": round(avg_run, 3)
+            }
+
+    def shutdown(self):
+        """Detiene el pool de threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
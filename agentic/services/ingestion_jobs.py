@@ -0,0 +1,334 @@
+"""
+Cola persistente de indexación de documentos.
+Siguiendo el principio de Single Responsibility - solo registra los trabajos
+de indexación y los ejecuta en segundo plano con concurrencia acotada.
+
+Los trabajos se guardan en una tabla compartida por todos los workers. Cada
+worker reclama el siguiente trabajo pendiente con FOR UPDATE SKIP LOCKED y lo
+mantiene "running" renovando un lease; si el proceso muere, otro worker (o el
+mismo tras reiniciar) lo retoma cuando vence el lease. Como los ids de los
+chunks son deterministas, al retomar solo se embeben los chunks que faltan.
+"""
+
+import asyncio
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from utils.metrics import INGESTION_JOBS, INGESTION_CHUNKS_EMBEDDED
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from ..utils.metrics import INGESTION_JOBS, INGESTION_CHUNKS_EMBEDDED
+
+logger = logging.getLogger(__name__)
+
+_JOB_COLUMNS = (
+    "id, filename, original_filename, status, attempts, result, pages_parsed, chunks_total, "
+    "chunks_embedded, chunks_resumed, cache_entries_invalidated, error, created_at, started_at, "
+    "finished_at, updated_at"
+)
+
+# Campos del avance que puede reportar KnowledgeService._index_file
+_PROGRESS_FIELDS = ("pages_parsed", "chunks_total", "chunks_embedded")
+
+
+class IngestionCancelledError(Exception):
+    """El trabajo se detuvo en un punto de control porque la aplicación se está cerrando"""
+
+
+class IngestionJobs:
+    """
+    Trabajos de indexación de PDFs subidos:
+    - submit() registra el trabajo como "queued" y despierta a los workers
+    - los workers (INGESTION_MAX_CONCURRENCY por proceso) lo indexan en un
+      thread con KnowledgeService.index_document, guardando el avance
+    - al terminar se invalidan las respuestas cacheadas que citan el documento
+
+    Estados: queued, running, completed, failed.
+    """
+
+    def __init__(self, knowledge_service, semantic_cache, table: Optional[str] = None,
+                 max_concurrency: int = None, lease_seconds: int = None,
+                 poll_interval_seconds: int = None, max_attempts: int = None):
+        self.knowledge_service = knowledge_service
+        self.cache = semantic_cache
+        self.db_engine = knowledge_service.manifest.db_engine
+        self.table = table or f"{knowledge_service._vector_table}_ingestion_jobs"
+        self.max_concurrency = max(1, max_concurrency if max_concurrency is not None else settings.INGESTION_MAX_CONCURRENCY)
+        self.lease_seconds = lease_seconds if lease_seconds is not None else settings.INGESTION_LEASE_SECONDS
+        self.poll_interval_seconds = poll_interval_seconds if poll_interval_seconds is not None else settings.INGESTION_POLL_INTERVAL_SECONDS
+        self.max_attempts = max_attempts if max_attempts is not None else settings.INGESTION_MAX_ATTEMPTS
+        self._wakeup = asyncio.Event()
+        self._progress_lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        try:
+            self.create()
+        except Exception as e:
+            logger.warning(f"⚠️ Nota sobre tabla de trabajos de indexación: {e}")
+
+    def create(self):
+        """Crea la tabla de trabajos si no existe"""
+        with self.db_engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"id VARCHAR PRIMARY KEY, "
+                f"filename VARCHAR NOT NULL, "
+                f"original_filename VARCHAR NOT NULL, "
+                f"status VARCHAR NOT NULL, "
+                f"attempts INTEGER NOT NULL DEFAULT 0, "
+                f"result VARCHAR, "
+                f"pages_parsed INTEGER NOT NULL DEFAULT 0, "
+                f"chunks_total INTEGER NOT NULL DEFAULT 0, "
+                f"chunks_embedded INTEGER NOT NULL DEFAULT 0, "
+                f"chunks_resumed INTEGER NOT NULL DEFAULT 0, "
+                f"cache_entries_invalidated INTEGER, "
+                f"error TEXT, "
+                f"created_at TIMESTAMPTZ NOT NULL, "
+                f"started_at TIMESTAMPTZ, "
+                f"finished_at TIMESTAMPTZ, "
+                f"updated_at TIMESTAMPTZ NOT NULL)"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {self.table.split('.')[-1]}_status_idx "
+                f"ON {self.table} (status, created_at)"
+            ))
+
+    # ------------------------------------------------------------------ #
+    # Consulta y registro (bloqueantes, llamar desde un thread)
+    # ------------------------------------------------------------------ #
+
+    def submit(self, filename: str, original_filename: str) -> Dict[str, Any]:
+        """
+        Registra un trabajo para indexar un archivo ya guardado en DOCS_PATH.
+
+        Args:
+            filename: Nombre del archivo en la carpeta de documentos
+            original_filename: Nombre con el que se subió
+        """
+        now = datetime.now(timezone.utc)
+        with self.db_engine.begin() as conn:
+            row = conn.execute(
+                text(
+                    f"INSERT INTO {self.table} (id, filename, original_filename, status, created_at, updated_at) "
+                    f"VALUES (:id, :filename, :original_filename, 'queued', :now, :now) "
+                    f"RETURNING {_JOB_COLUMNS}"
+                ),
+                {"id": uuid.uuid4().hex, "filename": filename, "original_filename": original_filename, "now": now}
+            ).mappings().first()
+        return self._to_status(row)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado, avance y throughput de un trabajo (None si no existe)"""
+        with self.db_engine.connect() as conn:
+            row = conn.execute(
+                text(f"SELECT {_JOB_COLUMNS} FROM {self.table} WHERE id = :id"),
+                {"id": job_id}
+            ).mappings().first()
+        return self._to_status(row) if row else None
+
+    def list_jobs(self, limit: int = 20, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Trabajos más recientes, opcionalmente filtrados por estado"""
+        query = f"SELECT {_JOB_COLUMNS} FROM {self.table}"
+        params: Dict[str, Any] = {"limit": limit}
+        if status:
+            query += " WHERE status = :status"
+            params["status"] = status
+        query += " ORDER BY created_at DESC LIMIT :limit"
+        with self.db_engine.connect() as conn:
+            rows = conn.execute(text(query), params).mappings().all()
+        return [self._to_status(row) for row in rows]
+
+    @staticmethod
+    def _to_status(row) -> Dict[str, Any]:
+        job = dict(row)
+        started_at, finished_at = job["started_at"], job["finished_at"]
+        elapsed = None
+        if started_at:
+            end = finished_at or (job["updated_at"] if job["status"] != "running" else datetime.now(timezone.utc))
+            elapsed = max((end - started_at).total_seconds(), 0.0)
+        embedded_now = job["chunks_embedded"] - job["chunks_resumed"]
+        return {
+            "job_id": job.pop("id"),
+            **{k: v.isoformat() if isinstance(v, datetime) else v for k, v in job.items()},
+            "elapsed_seconds": round(elapsed, 2) if elapsed is not None else None,
+            "chunks_per_second": round(embedded_now / elapsed, 3) if elapsed else 0.0
+        }
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Reclama el trabajo pendiente más antiguo: uno "queued" o uno "running"
+        cuyo lease venció (su worker murió). Los que agotaron los intentos se
+        marcan como fallidos.
+        """
+        with self.db_engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"UPDATE {self.table} SET status = 'failed', finished_at = now(), updated_at = now(), "
+                    f"error = COALESCE(error, 'Se agotaron los intentos de indexación') "
+                    f"WHERE status = 'running' AND attempts >= :max_attempts "
+                    f"AND updated_at < now() - make_interval(secs => :lease)"
+                ),
+                {"max_attempts": self.max_attempts, "lease": self.lease_seconds}
+            )
+            row = conn.execute(
+                text(
+                    f"UPDATE {self.table} SET status = 'running', attempts = attempts + 1, "
+                    f"started_at = now(), updated_at = now() "
+                    f"WHERE id = ("
+                    f"SELECT id FROM {self.table} WHERE status = 'queued' "
+                    f"OR (status = 'running' AND updated_at < now() - make_interval(secs => :lease)) "
+                    f"ORDER BY created_at FOR UPDATE SKIP LOCKED LIMIT 1"
+                    f") RETURNING {_JOB_COLUMNS}"
+                ),
+                {"lease": self.lease_seconds}
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def _update(self, job_id: str, **fields):
+        """Guarda campos del trabajo y renueva su lease"""
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self.db_engine.begin() as conn:
+            conn.execute(
+                text(f"UPDATE {self.table} SET {assignments}{', ' if fields else ''}updated_at = now() WHERE id = :id"),
+                {**fields, "id": job_id}
+            )
+
+    # ------------------------------------------------------------------ #
+    # Ejecución
+    # ------------------------------------------------------------------ #
+
+    def _index(self, job: Dict[str, Any], stop: threading.Event) -> str:
+        """
+        Indexa el archivo del trabajo guardando el avance (bloqueante).
+
+        Cada reporte de avance (tras leer el PDF y tras cada lote de
+        embeddings) es un punto de control: si `stop` está activo se lanza
+        IngestionCancelledError antes del siguiente lote.
+        """
+        file_path = settings.DOCS_PATH / job["filename"]
+        if not file_path.exists():
+            raise FileNotFoundError(f"Archivo '{job['filename']}' no encontrado")
+
+        state = {"chunks_embedded": None, "chunks_resumed": None}
+
+        def progress(**fields):
+            if stop.is_set():
+                raise IngestionCancelledError(f"Trabajo {job['id']} detenido")
+            fields = {k: v for k, v in fields.items() if k in _PROGRESS_FIELDS}
+            with self._progress_lock:
+                if "chunks_embedded" in fields:
+                    if state["chunks_resumed"] is None:
+                        # Primer reporte: chunks que ya estaban en la tabla
+                        state["chunks_resumed"] = fields["chunks_resumed"] = fields["chunks_embedded"]
+                    else:
+                        INGESTION_CHUNKS_EMBEDDED.inc(fields["chunks_embedded"] - state["chunks_embedded"])
+                    state["chunks_embedded"] = fields["chunks_embedded"]
+            try:
+                self._update(job["id"], **fields)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo guardar el avance del trabajo {job['id']}: {e}")
+
+        return self.knowledge_service.index_document(file_path, progress)
+
+    async def _heartbeat(self, job_id: str):
+        """Renueva el lease mientras el trabajo corre (p. ej. leyendo un PDF grande)"""
+        while True:
+            await asyncio.sleep(max(self.lease_seconds / 3, 1))
+            try:
+                await asyncio.to_thread(self._update, job_id)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo renovar el lease del trabajo {job_id}: {e}")
+
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        logger.info(
+            "ingestion job=%s file=%s intento=%d", job_id, job["filename"], job["attempts"]
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        stop = threading.Event()
+        indexing = asyncio.ensure_future(asyncio.to_thread(self._index, job, stop))
+        try:
+            # shield: cancelar este worker no detiene el thread, ver abajo
+            result = await asyncio.shield(indexing)
+            # Invalidar solo las respuestas que citan una versión anterior del documento
+            invalidated = await self.cache.invalidate_documents([job["original_filename"], job["filename"]])
+            await asyncio.to_thread(
+                self._update, job_id, status="completed", result=result, error=None,
+                cache_entries_invalidated=invalidated, finished_at=datetime.now(timezone.utc)
+            )
+            INGESTION_JOBS.labels(outcome="completed").inc()
+            logger.info("ingestion job=%s completado result=%s", job_id, result)
+        except asyncio.CancelledError:
+            # Cierre de la aplicación: detener el thread en su próximo punto de
+            # control y solo entonces devolver el trabajo a la cola, para que
+            # otro worker no lo indexe mientras este thread sigue embebiendo
+            stop.set()
+            try:
+                await asyncio.shield(indexing)
+            except asyncio.CancelledError:
+                # Segunda cancelación: el thread sigue corriendo; el trabajo
+                # queda "running" y se retoma cuando venza su lease
+                logger.warning(f"⚠️ Trabajo {job_id} interrumpido sin esperar al thread de indexación")
+                raise
+            except Exception:
+                pass
+            try:
+                await asyncio.to_thread(self._update, job_id, status="queued")
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo devolver el trabajo {job_id} a la cola: {e}")
+            raise
+        except Exception as e:
+            INGESTION_JOBS.labels(outcome="failed").inc()
+            logger.error(f"Error en el trabajo de indexación {job_id} ({job['filename']}): {e}")
+            try:
+                await asyncio.to_thread(
+                    self._update, job_id, status="failed", error=str(e),
+                    finished_at=datetime.now(timezone.utc)
+                )
+            except Exception as update_error:
+                logger.warning(f"⚠️ No se pudo marcar el trabajo {job_id} como fallido: {update_error}")
+        finally:
+            heartbeat.cancel()
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo consultar la cola de indexación: {e}")
+                job = None
+            if job is None:
+                # Los trabajos de otros workers o reiniciados se ven al sondear
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(job)
+
+    def notify(self):
+        """Despierta a los workers tras registrar un trabajo"""
+        self._wakeup.set()
+
+    async def run(self):
+        """Workers de indexación; se cancelan al cerrar la aplicación"""
+        logger.info(
+            f"📥 Cola de indexación con {self.max_concurrency} worker(s) "
+            f"(lease={self.lease_seconds}s, lote={settings.INGESTION_EMBED_BATCH_SIZE} chunks)"
+        )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
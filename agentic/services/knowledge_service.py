@@ -3,33 +3,108 @@ Servicio para manejo de knowledge base.
 Siguiendo el principio de Single Responsibility - solo maneja el knowledge base.
 """
 
+import hashlib
 import logging
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, Iterator, List, Dict, Any, Optional, Sequence, Tuple, Union
 
-from phi.embedder.ollama import OllamaEmbedder
+from phi.document import Document
+from phi.document.reader.pdf import PDFReader
 from phi.knowledge.pdf import PDFKnowledgeBase
 from phi.vectordb.pgvector import PgVector, SearchType
+from sqlalchemy import text
 
 try:
     # Absolute imports for Docker/standalone execution
     from config.settings import settings
+    from services.connections import get_db_engine, get_ollama_client
+    from services.document_manifest import DocumentManifest
+    from services.embedder import InstrumentedOllamaEmbedder
+    from services.pdf_extraction import get_pdf_extractor
+    from utils.metrics import track_stage, STAGE_KNOWLEDGE_EMBED, STAGE_KNOWLEDGE_SEARCH
 except ImportError:
     # Relative imports for package execution
     from ..config.settings import settings
+    from .connections import get_db_engine, get_ollama_client
+    from .document_manifest import DocumentManifest
+    from .embedder import InstrumentedOllamaEmbedder
+    from .pdf_extraction import get_pdf_extractor
+    from ..utils.metrics import track_stage, STAGE_KNOWLEDGE_EMBED, STAGE_KNOWLEDGE_SEARCH
 
 logger = logging.getLogger(__name__)
 
+# Recibe el avance de la indexación: pages_parsed, chunks_total, chunks_embedded
+ProgressFn = Callable[..., None]
+
+
+def file_sha256(path: Path) -> str:
+    """Hash del contenido de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParallelPDFReader(PDFReader):
+    """
+    PDFReader de phi que extrae las páginas en un pool de procesos (ver
+    pdf_extraction). Genera los mismos documentos que PDFReader: mismo nombre,
+    ids, metadata de página y chunking.
+    """
+    
+    def _to_documents(self, doc_name: str, pages) -> List[Document]:
+        documents = [
+            Document(name=doc_name, id=f"{doc_name}_{page_number}", meta_data={"page": page_number}, content=content)
+            for page_number, content in pages
+        ]
+        if self.chunk:
+            return [chunk for document in documents for chunk in self.chunk_document(document)]
+        return documents
+    
+    def read(self, pdf: Union[str, Path, Any]) -> List[Document]:
+        if isinstance(pdf, str):
+            path, doc_name = Path(pdf), pdf.split("/")[-1].split(".")[0].replace(" ", "_")
+        elif isinstance(pdf, Path):
+            path, doc_name = pdf, pdf.name.split(".")[0]
+        else:
+            # Archivos abiertos: lectura secuencial de phi
+            return super().read(pdf)
+        logger.debug(f"Leyendo {path.name} en paralelo")
+        return self._to_documents(doc_name, get_pdf_extractor().extract(path))
+    
+    def read_many(self, paths: Sequence[Path]) -> Iterator[Tuple[Path, List[Document]]]:
+        """Lee varios PDFs repartiendo archivos y páginas entre procesos, en orden"""
+        for path, pages in get_pdf_extractor().iter_files(paths):
+            yield path, self._to_documents(path.name.split(".")[0], pages)
+
+
+class InstrumentedPgVector(PgVector):
+    """PgVector que registra la duración de las búsquedas del agente"""
+    
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        with track_stage(STAGE_KNOWLEDGE_SEARCH):
+            return super().search(query=query, limit=limit, filters=filters)
+
 
 class KnowledgeService:
     """
     Servicio para gestionar el knowledge base de documentos PDF.
+    
+    La indexación es incremental: un manifiesto guarda el hash del contenido
+    y los ids de los chunks de cada archivo, de modo que solo se leen y
+    embeben los archivos nuevos o modificados, y eliminar un archivo borra
+    solo sus filas de la tabla de vectores.
     """
     
     def __init__(self):
         self.pdf_path = settings.DOCS_PATH
         self.pdf_files = []
         self.knowledge_base = None
+        self.manifest = None
+        # Reentrante: sync_documents lo mantiene mientras llama a _index_file
+        self._index_lock = threading.RLock()
         self._initialize_knowledge_base()
     
     def _initialize_knowledge_base(self):
@@ -46,23 +121,36 @@ class KnowledgeService:
                 logger.debug(f"   - {pdf.name}")
         
         for pdf in self.pdf_files:
-            print(f"  - {pdf.name}")
+            logger.debug(f"  - {pdf.name}")
         
         # Crear knowledge base
         self.knowledge_base = PDFKnowledgeBase(
             path=str(self.pdf_path),
-            vector_db=PgVector(
+            reader=ParallelPDFReader(),
+            vector_db=InstrumentedPgVector(
                 table_name="insurance_docs_ollama",
-                db_url=settings.DB_URL,
+                db_engine=get_db_engine(),
                 search_type=SearchType.hybrid,
-                embedder=OllamaEmbedder(
+                embedder=InstrumentedOllamaEmbedder(
                     model=settings.EMBEDDER_MODEL, 
                     dimensions=768, 
-                    host=settings.OLLAMA_HOST
+                    host=settings.OLLAMA_HOST,
+                    ollama_client=get_ollama_client(),
+                    metrics_stage=STAGE_KNOWLEDGE_EMBED
                 ),
             ),
         )
         
+        vector_db = self.knowledge_base.vector_db
+        self.manifest = DocumentManifest(
+            get_db_engine(), f"{vector_db.schema}.{vector_db.table_name}_manifest"
+        )
+        try:
+            vector_db.create()
+            self.manifest.create()
+        except Exception as e:
+            logger.warning(f"⚠️ Nota sobre tabla del manifiesto: {e}")
+        
         # Cargar knowledge base si hay archivos
         self._load_knowledge_base()
     
@@ -84,7 +172,7 @@ class KnowledgeService:
             else:
                 logger.info(f"Cargando {len(self.pdf_files)} archivos PDF al knowledge base...")
                 # Descomentar para cargar realmente los documentos
-                # self.knowledge_base.load(upsert=True)
+                # self.sync_documents()
                 logger.info("✅ Knowledge base cargado exitosamente")
                 
         except ImportError as ie:
@@ -97,27 +185,212 @@ class KnowledgeService:
             logger.error(f"Stack trace:\n{traceback.format_exc()}")
             logger.warning("⚠️ Continuando con knowledge base vacío")
     
+    @property
+    def _vector_table(self) -> str:
+        vector_db = self.knowledge_base.vector_db
+        return f"{vector_db.schema}.{vector_db.table_name}"
+    
+    @staticmethod
+    def _chunk_id(filename: str, content_hash: str, index: int) -> str:
+        """Id determinista de un chunk: mismo archivo y contenido, mismos ids"""
+        return hashlib.sha1(f"{filename}:{content_hash}:{index}".encode()).hexdigest()
+    
+    def _read_chunks(self, file_path: Path, content_hash: str,
+                     documents: Optional[List[Document]] = None) -> List[Document]:
+        """Lee (si no se recibe ya leído) y divide un PDF asignando ids deterministas a sus chunks"""
+        if documents is None:
+            documents = self.knowledge_base.reader.read(pdf=file_path)
+        for index, document in enumerate(documents):
+            document.id = self._chunk_id(file_path.name, content_hash, index)
+        return documents
+    
+    def _existing_chunk_ids(self, chunk_ids: List[str]) -> set:
+        """Ids que ya están en la tabla de vectores (indexación interrumpida)"""
+        if not chunk_ids:
+            return set()
+        with self.manifest.db_engine.connect() as conn:
+            rows = conn.execute(
+                text(f"SELECT id FROM {self._vector_table} WHERE id = ANY(:ids)"),
+                {"ids": chunk_ids}
+            )
+            return {row[0] for row in rows}
+    
+    def _index_file(self, file_path: Path, indexed: Optional[Dict[str, Any]],
+                    progress: Optional[ProgressFn] = None,
+                    documents: Optional[List[Document]] = None,
+                    content_hash: Optional[str] = None) -> str:
+        """
+        Indexa un archivo si es nuevo o cambió su contenido.
+        
+        Como los ids de los chunks son deterministas, los chunks que ya están
+        en la tabla (de una indexación interrumpida) no se vuelven a embeber.
+        El lock solo se toma para registrar el archivo en el manifiesto, de
+        modo que varios archivos se pueden embeber a la vez. `documents`
+        recibe el PDF ya leído (sync_documents extrae varios en paralelo) y
+        `content_hash` el hash ya calculado del archivo.
+        
+        Returns:
+            "unchanged", "added" o "updated"
+        """
+        content_hash = content_hash or file_sha256(file_path)
+        if indexed and indexed["content_hash"] == content_hash:
+            if progress:
+                progress(chunks_total=len(indexed["chunk_ids"]), chunks_embedded=len(indexed["chunk_ids"]))
+            return "unchanged"
+        
+        documents = self._read_chunks(file_path, content_hash, documents)
+        chunk_ids = [document.id for document in documents]
+        existing = self._existing_chunk_ids(chunk_ids)
+        pending = [document for document in documents if document.id not in existing]
+        if progress:
+            progress(
+                pages_parsed=len({document.meta_data.get("page") for document in documents}),
+                chunks_total=len(documents),
+                chunks_embedded=len(existing)
+            )
+        
+        vector_db = self.knowledge_base.vector_db
+        batch_size = max(1, settings.INGESTION_EMBED_BATCH_SIZE)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            # Embeddings del lote con peticiones multi-input concurrentes, fuera
+            # del memo de consultas; el upsert de phi (uno por documento) los toma de prepared()
+            with vector_db.embedder.prepared([document.content for document in batch]):
+                vector_db.upsert(batch)
+            if progress:
+                progress(chunks_embedded=len(existing) + min(start + batch_size, len(pending)))
+        
+        new_ids = set(chunk_ids)
+        stale_ids = [chunk_id for chunk_id in (indexed or {}).get("chunk_ids", []) if chunk_id not in new_ids]
+        with self._index_lock, self.manifest.db_engine.begin() as conn:
+            if stale_ids:
+                conn.execute(text(f"DELETE FROM {self._vector_table} WHERE id = ANY(:ids)"), {"ids": stale_ids})
+            if indexed is None:
+                # Filas de cargas anteriores al manifiesto (phi las nombra con el
+                # nombre del archivo sin extensión), sin tocar chunks de otros archivos
+                keep_ids = set(chunk_ids)
+                for other in self.manifest.get_all().values():
+                    keep_ids.update(other["chunk_ids"])
+                conn.execute(
+                    text(f"DELETE FROM {self._vector_table} WHERE name = :name AND NOT (id = ANY(:keep_ids))"),
+                    {"name": file_path.name.split(".")[0], "keep_ids": list(keep_ids)}
+                )
+            self.manifest.upsert(conn, file_path.name, content_hash, chunk_ids, file_path.stat().st_size)
+        
+        logger.info(
+            "documento indexado file=%s chunks=%d reused_chunks=%d stale_chunks=%d",
+            file_path.name, len(chunk_ids), len(existing), len(stale_ids)
+        )
+        return "updated" if indexed else "added"
+    
+    def _unindex_file(self, filename: str, indexed: Dict[str, Any]):
+        """Elimina del knowledge base solo las filas de un archivo"""
+        with self.manifest.db_engine.begin() as conn:
+            if indexed["chunk_ids"]:
+                conn.execute(
+                    text(f"DELETE FROM {self._vector_table} WHERE id = ANY(:ids)"),
+                    {"ids": list(indexed["chunk_ids"])}
+                )
+            self.manifest.delete(conn, filename)
+        logger.info("documento eliminado del índice file=%s chunks=%d", filename, len(indexed["chunk_ids"]))
+    
+    def sync_documents(self) -> Dict[str, List[str]]:
+        """
+        Sincroniza el knowledge base con los PDFs de la carpeta: indexa los
+        nuevos o modificados y elimina los que ya no existen.
+        
+        Returns:
+            Archivos por resultado (added, updated, unchanged, removed)
+        """
+        with self._index_lock:
+            self.pdf_files = list(self.pdf_path.glob("*.pdf"))
+            manifest = self.manifest.get_all()
+            result = {"added": [], "updated": [], "unchanged": [], "removed": []}
+            
+            on_disk = {pdf.name for pdf in self.pdf_files}
+            for filename, indexed in manifest.items():
+                if filename not in on_disk:
+                    self._unindex_file(filename, indexed)
+                    result["removed"].append(filename)
+            
+            # Extraer en paralelo todos los archivos nuevos o modificados
+            # mientras se embeben en orden; cada archivo se hashea una sola vez
+            hashes = {pdf.name: file_sha256(pdf) for pdf in self.pdf_files}
+            changed = [
+                pdf for pdf in self.pdf_files
+                if not (pdf.name in manifest and manifest[pdf.name]["content_hash"] == hashes[pdf.name])
+            ]
+            changed_names = {pdf.name for pdf in changed}
+            extracted = self.knowledge_base.reader.read_many(changed)
+            for pdf in self.pdf_files:
+                documents = next(extracted)[1] if pdf.name in changed_names else None
+                status = self._index_file(
+                    pdf, manifest.get(pdf.name), documents=documents, content_hash=hashes[pdf.name]
+                )
+                result[status].append(pdf.name)
+        
+        logger.info(
+            "knowledge base sincronizado added=%d updated=%d unchanged=%d removed=%d",
+            len(result["added"]), len(result["updated"]), len(result["unchanged"]), len(result["removed"])
+        )
+        return result
+    
+    def index_document(self, file_path: Path, progress: Optional[ProgressFn] = None) -> str:
+        """
+        Indexa un único archivo (nuevo o modificado) y quita del índice los
+        archivos que ya no están en la carpeta.
+        
+        Args:
+            file_path: Ruta del archivo PDF
+            progress: Callback opcional con el avance (pages_parsed,
+                chunks_total, chunks_embedded)
+        
+        Returns:
+            "unchanged", "added" o "updated"
+        """
+        with self._index_lock:
+            self.pdf_files = list(self.pdf_path.glob("*.pdf"))
+            manifest = self.manifest.get_all()
+            on_disk = {pdf.name for pdf in self.pdf_files}
+            for filename, indexed in manifest.items():
+                if filename not in on_disk:
+                    self._unindex_file(filename, indexed)
+        return self._index_file(file_path, manifest.get(file_path.name), progress)
+    
     def reload_knowledge_base(self):
         """Recarga el knowledge base con los documentos actuales"""
-        self.pdf_files = list(self.pdf_path.glob("*.pdf"))
-        self.knowledge_base.load(upsert=True)
+        result = self.sync_documents()
         logger.info(f"Knowledge base recargado con {len(self.pdf_files)} documentos")
+        return result
     
     def get_documents_list(self) -> List[Dict[str, Any]]:
         """
-        Obtiene la lista de documentos cargados.
+        Obtiene la lista de documentos indexados.
+        
+        Se lee de la tabla del manifiesto, compartida por todos los workers:
+        `pdf_files` es propio de cada proceso y no ve los archivos indexados
+        por otro worker.
         
         Returns:
             Lista de diccionarios con información de los documentos
         """
-        docs = []
-        for pdf in self.pdf_files:
-            docs.append({
-                "name": pdf.name,
-                "path": str(pdf),
-                "size": pdf.stat().st_size
-            })
-        return docs
+        try:
+            manifest = self.manifest.get_all()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer el manifiesto de documentos: {e}")
+            manifest = {}
+        
+        return [
+            {
+                "name": filename,
+                "path": str(self.pdf_path / filename),
+                "size": indexed["size_bytes"],
+                "indexed": True,
+                "chunks": len(indexed["chunk_ids"]),
+                "indexed_at": indexed["indexed_at"].isoformat()
+            }
+            for filename, indexed in sorted(manifest.items())
+        ]
     
     def get_document_count(self) -> int:
         """Obtiene el número de documentos cargados"""
@@ -127,16 +400,16 @@ class KnowledgeService:
         """
         Añade un nuevo documento al knowledge base.
         
+        Solo se leen y embeben los archivos nuevos o modificados de la carpeta
+        (incluido este); el resto se compara por hash.
+        
         Args:
             file_path: Ruta del archivo PDF a añadir
         """
-        # Actualizar lista de archivos
-        self.pdf_files = list(self.pdf_path.glob("*.pdf"))
-        
-        # Recargar knowledge base
         try:
-            self.knowledge_base.load(upsert=True)
+            result = self.sync_documents()
             logger.info(f"Documento {file_path.name} añadido al knowledge base")
+            return result
         except Exception as e:
             logger.error(f"Error añadiendo documento al knowledge base: {e}")
             raise
@@ -159,11 +432,14 @@ class KnowledgeService:
         # Eliminar archivo
         file_path.unlink()
         
-        # Actualizar lista y recargar
-        self.pdf_files = list(self.pdf_path.glob("*.pdf"))
-        
-        try:
-            self.knowledge_base.load(upsert=True)
-            logger.info(f"Documento {filename} eliminado del knowledge base")
-        except Exception as e:
-            logger.warning(f"Error actualizando knowledge base después de eliminar: {e}")
\ No newline at end of file
+        with self._index_lock:
+            self.pdf_files = list(self.pdf_path.glob("*.pdf"))
+            
+            # Eliminar solo las filas de este archivo
+            try:
+                indexed = self.manifest.get(filename)
+                if indexed:
+                    self._unindex_file(filename, indexed)
+                logger.info(f"Documento {filename} eliminado del knowledge base")
+            except Exception as e:
+                logger.warning(f"Error actualizando knowledge base después de eliminar: {e}")
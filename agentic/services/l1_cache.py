@@ -0,0 +1,165 @@
+"""
+Caché L1 en memoria para el caché semántico.
+Siguiendo el principio de Single Responsibility - solo mantiene las entradas
+más usadas y sus embeddings en una matriz NumPy para buscarlas sin ir a la
+base de datos.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class L1VectorCache:
+    """
+    Guarda hasta `max_entries` entradas del caché con sus embeddings
+    normalizados en una matriz float32 contigua. Una búsqueda es un único
+    producto matriz-vector; al llenarse se reemplaza la entrada usada hace
+    más tiempo.
+    """
+
+    def __init__(self, max_entries: int = None, dimensions: int = 768):
+        self.max_entries = max_entries if max_entries is not None else settings.CACHE_L1_MAX_ENTRIES
+        self.dimensions = dimensions
+        self._matrix = np.zeros((max(self.max_entries, 0), dimensions), dtype=np.float32)
+        self._valid = np.zeros(max(self.max_entries, 0), dtype=bool)
+        self._last_access = np.zeros(max(self.max_entries, 0), dtype=np.float64)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max(self.max_entries, 0)
+        self._slots: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _normalize(self, embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dimensions,):
+            return None
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def _free_slot(self) -> int:
+        free = np.flatnonzero(~self._valid)
+        if free.size:
+            return int(free[0])
+        # Reemplazar la entrada usada hace más tiempo
+        slot = int(np.argmin(self._last_access))
+        self._remove_slot(slot)
+        self.stats["evictions"] += 1
+        return slot
+
+    def _remove_slot(self, slot: int):
+        entry = self._entries[slot]
+        if entry is not None:
+            self._slots.pop(entry["id"], None)
+        self._entries[slot] = None
+        self._valid[slot] = False
+        self._last_access[slot] = 0.0
+
+    def put(self, entry: Dict[str, Any], embedding: List[float]):
+        """Agrega o actualiza una entrada (requiere `id` en la entrada)"""
+        if not self.enabled:
+            return
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            slot = self._slots.get(entry["id"])
+            if slot is None:
+                slot = self._free_slot()
+                self._slots[entry["id"]] = slot
+            self._matrix[slot] = vector
+            self._entries[slot] = entry
+            self._valid[slot] = True
+            self._last_access[slot] = time.monotonic()
+
+    def search(self, embedding: List[float], limit: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Busca las entradas más cercanas.
+
+        Returns:
+            Lista de (entrada, similitud coseno) ordenada de mayor a menor
+        """
+        if not self.enabled:
+            return []
+        vector = self._normalize(embedding)
+        if vector is None:
+            return []
+        with self._lock:
+            if not self._valid.any():
+                self.stats["misses"] += 1
+                return []
+            scores = self._matrix @ vector
+            scores[~self._valid] = -np.inf
+            limit = min(limit, int(self._valid.sum()))
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top])]
+            return [(self._entries[slot], float(scores[slot])) for slot in top]
+
+    def touch(self, row_id: str, hit: bool = True):
+        """Registra el resultado de una búsqueda en L1"""
+        with self._lock:
+            if hit:
+                self.stats["hits"] += 1
+                slot = self._slots.get(row_id)
+                if slot is not None:
+                    self._last_access[slot] = time.monotonic()
+            else:
+                self.stats["misses"] += 1
+
+    def remove(self, row_ids: Iterable[str]):
+        """Elimina entradas por id de fila"""
+        with self._lock:
+            for row_id in row_ids:
+                slot = self._slots.get(row_id)
+                if slot is not None:
+                    self._remove_slot(slot)
+                    self.stats["invalidations"] += 1
+
+    def invalidate_documents(self, document_names: Iterable[str]):
+        """Elimina las entradas que citan alguno de los documentos"""
+        names = {name.lower() for name in document_names if name}
+        with self._lock:
+            stale = [
+                entry["id"] for entry in self._entries
+                if entry is not None and any(
+                    ref.get("document_name", "").lower() in names
+                    for ref in entry["document_references"]
+                )
+            ]
+        self.remove(stale)
+
+    def clear(self):
+        with self._lock:
+            self._valid[:] = False
+            self._last_access[:] = 0.0
+            self._entries = [None] * len(self._entries)
+            self._slots.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": int(self._valid.sum()),
+                "max_entries": self.max_entries,
+                "hit_rate": f"{(self.stats['hits'] / lookups * 100) if lookups else 0:.1f}%",
+                "matrix_bytes": int(self._matrix.nbytes),
+                "memory_bytes": int(self._matrix.nbytes + self._valid.nbytes + self._last_access.nbytes)
+            }
@@ -0,0 +1,92 @@
+"""
+Firmas léxicas de las consultas del caché semántico.
+Siguiendo el principio de Single Responsibility - solo tokeniza una consulta
+una vez para que validar candidatos sean intersecciones de conjuntos.
+"""
+
+import re
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional
+
+# Stop words combinadas (español e inglés)
+STOP_WORDS: FrozenSet[str] = frozenset({
+    # Español
+    'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'una', 'es', 'los', 'las',
+    'del', 'al', 'con', 'por', 'para', 'su', 'sus', 'como', 'más', 'pero',
+    'le', 'ya', 'o', 'este', 'ese', 'eso', 'esta', 'estas', 'estos', 'esas',
+    'esos', 'si', 'no', 'lo', 'me', 'mi', 'tu', 'te', 'se', 'nos', 'qué',
+    'cuál', 'cuáles', 'cómo', 'dónde',
+    # Inglés
+    'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it',
+    'for', 'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at', 'this', 'but',
+    'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she', 'or', 'an', 'will',
+    'my', 'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up', 'out',
+    'if', 'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can',
+    'like', 'time', 'no', 'just', 'him', 'know', 'take', 'into', 'year',
+    'your', 'some', 'them', 'see', 'other', 'than', 'then', 'now', 'only',
+    'its', 'also', 'is', 'am', 'are', 'was', 'were', 'been', 'has', 'had',
+    'does', 'did', 'having'
+})
+
+# Términos importantes entre comillas
+_QUOTED_PATTERN = re.compile(r"['\"]([^'\"]+)['\"]")
+# Palabras clave: términos entre comillas o palabras capitalizadas
+_KEYWORD_PATTERN = re.compile(r"'([^']+)'|\"([^\"]+)\"|([A-Z][a-z]+)")
+
+
+class LexicalSignature(NamedTuple):
+    """Rasgos léxicos de una consulta usados para validar aciertos del caché"""
+    normalized: str
+    tokens: FrozenSet[str]
+    quoted: FrozenSet[str]
+    keywords: FrozenSet[str]
+
+    @classmethod
+    def from_text(cls, text: str) -> "LexicalSignature":
+        tokens = frozenset(
+            word for word in text.lower().split()
+            if word not in STOP_WORDS and len(word) > 1 and word.isalnum()
+        )
+        quoted = frozenset(
+            term for term in (match.lower().strip() for match in _QUOTED_PATTERN.findall(text))
+            if term
+        )
+        keywords = frozenset(
+            group.lower()
+            for match in _KEYWORD_PATTERN.finditer(text)
+            for group in match.groups() if group
+        )
+        return cls(text.lower().strip(), tokens, quoted, keywords)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["LexicalSignature"]:
+        """Reconstruye la firma guardada en la tabla (None si no existe)"""
+        if not data:
+            return None
+        return cls(
+            data["normalized"],
+            frozenset(data["tokens"]),
+            frozenset(data["quoted"]),
+            frozenset(data["keywords"])
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializable para la columna JSONB"""
+        return {
+            "normalized": self.normalized,
+            "tokens": sorted(self.tokens),
+            "quoted": sorted(self.quoted),
+            "keywords": sorted(self.keywords)
+        }
+
+    def is_different_topic(self, other: "LexicalSignature") -> bool:
+        """Ambas consultas citan términos entre comillas y no comparten ninguno"""
+        return bool(self.quoted and other.quoted and not (self.quoted & other.quoted))
+
+    def word_overlap(self, other: "LexicalSignature") -> float:
+        """Overlap (Jaccard) de palabras significativas"""
+        if not self.tokens or not other.tokens:
+            return 0.0
+        return len(self.tokens & other.tokens) / len(self.tokens | other.tokens)
+
+    def shared_keywords(self, other: "LexicalSignature") -> FrozenSet[str]:
+        return self.keywords & other.keywords
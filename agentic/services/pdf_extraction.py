@@ -0,0 +1,158 @@
+"""
+Extracción de texto de PDFs en paralelo.
+Siguiendo el principio de Single Responsibility - solo reparte la extracción
+de páginas con pypdf entre procesos y devuelve el texto en orden.
+
+pypdf es Python puro y limitado por CPU: con threads solo se usa un núcleo.
+Los archivos, y los rangos de páginas de los archivos grandes, se reparten
+entre un ProcessPoolExecutor compartido por todo el proceso; los procesos
+hijos se crean una sola vez y se reutilizan entre cargas.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# (número de página desde 1, texto)
+Page = Tuple[int, str]
+
+
+def _count_pages(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[Page]:
+    """Extrae las páginas [start, end) (índices desde 0) de un PDF"""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(index + 1, reader.pages[index].extract_text() or "") for index in range(start, end)]
+
+
+class PDFExtractor:
+    """
+    Reparte la extracción de páginas entre procesos. Cada tarea abre el PDF
+    y extrae hasta `pages_per_task` páginas consecutivas; los resultados se
+    devuelven por archivo en el orden recibido y con las páginas en orden,
+    aunque las tareas terminen desordenadas.
+
+    Con max_workers=1 extrae en el mismo proceso, sin pool.
+    """
+
+    def __init__(self, max_workers: int = None, pages_per_task: int = None):
+        max_workers = max_workers if max_workers is not None else settings.PDF_EXTRACT_WORKERS
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self.pages_per_task = max(1, pages_per_task if pages_per_task is not None else settings.PDF_PAGES_PER_TASK)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: la API tiene threads (pools de conexiones, inferencia)
+                # y hacer fork con locks tomados puede bloquear a los hijos
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"📄 Pool de extracción de PDFs con {self.max_workers} procesos")
+            return self._executor
+
+    def _ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        return [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+
+    def iter_files(self, paths: Sequence[Path]) -> Iterator[Tuple[Path, List[Page]]]:
+        """
+        Extrae las páginas de varios PDFs en paralelo.
+
+        Todas las tareas se envían al pool antes de devolver el primer archivo,
+        así mientras se procesa un archivo (chunking, embeddings) los procesos
+        siguen extrayendo los siguientes.
+
+        Yields:
+            (ruta, páginas en orden) en el mismo orden que `paths`. Si un
+            archivo no se puede leer, la excepción se lanza al llegar a él.
+        """
+        paths = list(paths)
+        if not paths:
+            return
+        if self.max_workers <= 1:
+            for path in paths:
+                yield path, _extract_page_range(str(path), 0, _count_pages(str(path)))
+            return
+
+        executor = self._get_executor()
+        counts = [executor.submit(_count_pages, str(path)) for path in paths]
+        tasks: List[List[Future]] = []
+        for path, count in zip(paths, counts):
+            try:
+                ranges = self._ranges(count.result())
+            except Exception as e:
+                failed = Future()
+                failed.set_exception(e)
+                tasks.append([failed])
+                continue
+            tasks.append([executor.submit(_extract_page_range, str(path), start, end) for start, end in ranges])
+
+        try:
+            for path, futures in zip(paths, tasks):
+                pages: List[Page] = []
+                for future in futures:
+                    pages.extend(future.result())
+                yield path, pages
+        finally:
+            # Si el consumidor se detiene antes de tiempo no dejar trabajo en cola
+            for futures in tasks:
+                for future in futures:
+                    future.cancel()
+
+    def extract(self, path: Path) -> List[Page]:
+        """Páginas de un PDF, repartiendo sus rangos de páginas entre procesos"""
+        for _, pages in self.iter_files([path]):
+            return pages
+        return []
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_extractor: Optional[PDFExtractor] = None
+_extractor_lock = threading.Lock()
+
+
+def get_pdf_extractor() -> PDFExtractor:
+    """Obtiene el extractor compartido por todo el proceso"""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = PDFExtractor()
+    return _extractor
+
+
+def shutdown_pdf_extractor():
+    """Detiene los procesos de extracción"""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is not None:
+            _extractor.shutdown()
+            _extractor = None
@@ -0,0 +1,158 @@
+"""
+Deduplicación de consultas en curso (single-flight).
+Siguiendo el principio de Single Responsibility - solo coordina que consultas
+equivalentes concurrentes compartan una única generación.
+"""
+
+import asyncio
+import logging
+import math
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from utils.metrics import COALESCED_REQUESTS
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from ..utils.metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s'\"]", re.UNICODE)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza una consulta para comparar preguntas equivalentes"""
+    text = _PUNCTUATION_PATTERN.sub(" ", text.lower())
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def cosine_similarity(vector1: List[float], vector2: List[float]) -> float:
+    """Similitud coseno entre dos embeddings"""
+    dot = sum(a * b for a, b in zip(vector1, vector2))
+    norm1 = math.sqrt(sum(a * a for a in vector1))
+    norm2 = math.sqrt(sum(b * b for b in vector2))
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return dot / (norm1 * norm2)
+
+
+class _Flight:
+    """Generación en curso compartida por un líder y sus seguidores"""
+
+    def __init__(self, query: str, group: str, task: asyncio.Task):
+        self.query = query
+        self.group = group
+        self.task = task
+        self.embedding: Optional[List[float]] = None
+        self.followers = 0
+
+
+class RequestCoalescer:
+    """
+    Agrupa consultas concurrentes equivalentes: la primera (líder) ejecuta la
+    generación y las demás esperan su resultado en lugar de lanzar su propia
+    ejecución del agente.
+
+    Dos consultas son equivalentes si su texto normalizado coincide o si la
+    similitud de sus embeddings supera el umbral del caché semántico.
+    """
+
+    def __init__(self, similarity_threshold: float = None):
+        self.similarity_threshold = similarity_threshold or settings.CACHE_SIMILARITY_THRESHOLD
+        self._in_flight: Dict[str, _Flight] = {}
+        self.stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "coalesced_by_embedding": 0
+        }
+
+    async def _find_similar_flight(self, query: str, group: str,
+                                   embed_fn: Callable[[str], Awaitable[List[float]]],
+                                   is_compatible: Optional[Callable[[str, str], bool]]) -> Optional[_Flight]:
+        """Busca una generación en curso con embedding similar"""
+        candidates = [
+            flight for flight in self._in_flight.values()
+            if flight.group == group and not flight.task.done()
+            and (is_compatible is None or is_compatible(flight.query, query))
+        ]
+        if not candidates:
+            return None
+
+        try:
+            query_embedding = await embed_fn(query)
+            best_flight, best_score = None, 0.0
+            for flight in candidates:
+                if flight.embedding is None:
+                    flight.embedding = await embed_fn(flight.query)
+                score = cosine_similarity(query_embedding, flight.embedding)
+                if score > best_score:
+                    best_flight, best_score = flight, score
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo comparar embeddings para coalescencia: {e}")
+            return None
+
+        if best_flight is not None and best_score >= self.similarity_threshold and not best_flight.task.done():
+            logger.debug(f"Consulta agrupada por similitud {best_score:.2f}")
+            return best_flight
+        return None
+
+    async def run(self, query: str, factory: Callable[[], Awaitable[Any]], group: str = "",
+                  embed_fn: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+                  is_compatible: Optional[Callable[[str, str], bool]] = None) -> Tuple[Any, bool]:
+        """
+        Ejecuta la generación o se une a una equivalente que ya está en curso.
+
+        Args:
+            query: Consulta del usuario
+            factory: Corrutina que genera el resultado (solo la ejecuta el líder)
+            group: Opciones que deben coincidir para compartir el resultado
+            embed_fn: Función opcional para comparar consultas por embedding
+            is_compatible: Verificación léxica opcional entre dos consultas
+
+        Returns:
+            Tupla con el resultado y si la consulta fue agrupada con otra
+        """
+        key = f"{group}::{normalize_query(query)}"
+        flight = self._in_flight.get(key)
+        coalesced_by_embedding = False
+
+        if (flight is None or flight.task.done()) and embed_fn is not None and self._in_flight:
+            flight = await self._find_similar_flight(query, group, embed_fn, is_compatible)
+            coalesced_by_embedding = flight is not None
+            # Mientras se calculaban embeddings pudo iniciarse una generación idéntica
+            if flight is None:
+                flight = self._in_flight.get(key)
+
+        if flight is not None and not flight.task.done():
+            flight.followers += 1
+            self.stats["coalesced"] += 1
+            COALESCED_REQUESTS.inc()
+            if coalesced_by_embedding:
+                self.stats["coalesced_by_embedding"] += 1
+            return await asyncio.shield(flight.task), True
+
+        task = asyncio.ensure_future(factory())
+        flight = _Flight(query, group, task)
+        self._in_flight[key] = flight
+        self.stats["leaders"] += 1
+
+        def _cleanup(_):
+            if self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+            if flight.followers:
+                logger.debug(f"Generación compartida con {flight.followers} consultas")
+
+        task.add_done_callback(_cleanup)
+        return await asyncio.shield(task), False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estadísticas de coalescencia"""
+        return {
+            **self.stats,
+            "in_flight": len(self._in_flight)
+        }
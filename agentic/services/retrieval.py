@@ -0,0 +1,131 @@
+"""
+Búsqueda multi-consulta en el knowledge base.
+Siguiendo el principio de Single Responsibility - solo ejecuta varias
+búsquedas en paralelo y fusiona sus resultados.
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from phi.document import Document
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+    from services.embedder import embedding_memo
+    from services.request_coalescer import normalize_query
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+    from .embedder import embedding_memo
+    from .request_coalescer import normalize_query
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool compartido para las búsquedas en pgvector"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RETRIEVAL_MAX_WORKERS,
+                    thread_name_prefix="retrieval"
+                )
+    return _executor
+
+
+def _document_key(document: Document) -> str:
+    """Identifica un chunk para deduplicarlo entre consultas"""
+    if document.id:
+        return str(document.id)
+    return hashlib.md5(f"{document.name}\x00{document.content}".encode()).hexdigest()
+
+
+class MultiQueryRetriever:
+    """
+    Ejecuta varias consultas contra el vector DB en paralelo y fusiona los
+    resultados con Reciprocal Rank Fusion, para que el agente obtenga el
+    contexto de varias búsquedas en una sola llamada a la herramienta.
+
+    Los embeddings de todas las consultas se calculan antes en un solo lote;
+    quedan en el memo compartido, de donde los toma cada búsqueda sin volver
+    a llamar a Ollama.
+    """
+
+    def __init__(self, knowledge_base, max_queries: int = None,
+                 max_results: int = None, rrf_k: int = None):
+        self.knowledge_base = knowledge_base
+        self.max_queries = max_queries or settings.RETRIEVAL_MAX_QUERIES
+        self.max_results = max_results or settings.RETRIEVAL_MAX_RESULTS
+        self.rrf_k = rrf_k or settings.RETRIEVAL_RRF_K
+
+    def _unique_queries(self, queries: List[str]) -> List[str]:
+        seen = set()
+        unique = []
+        for query in queries:
+            normalized = normalize_query(query or "")
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                unique.append(query.strip())
+        return unique[:self.max_queries]
+
+    def _embed_queries(self, queries: List[str]):
+        """Calcula los embeddings de las consultas con una sola petición por lote"""
+        embedder = getattr(self.knowledge_base.vector_db, "embedder", None)
+        if embedding_memo.max_entries <= 0 or not hasattr(embedder, "get_embeddings"):
+            return
+        try:
+            embedder.get_embeddings(queries)
+        except Exception as e:
+            # Cada búsqueda volverá a intentar calcular su embedding
+            logger.warning(f"⚠️ Error calculando los embeddings de {len(queries)} consultas: {e}")
+
+    def _search(self, query: str) -> List[Document]:
+        try:
+            return self.knowledge_base.search(query=query) or []
+        except Exception as e:
+            logger.warning(f"⚠️ Error buscando '{query[:80]}' en el knowledge base: {e}")
+            return []
+
+    def search(self, queries: List[str]) -> List[Document]:
+        """
+        Busca todas las consultas en paralelo.
+
+        Args:
+            queries: Consultas generadas por el agente
+
+        Returns:
+            Documentos deduplicados, ordenados por puntaje RRF
+        """
+        queries = self._unique_queries(queries)
+        if not queries:
+            return []
+
+        if len(queries) == 1:
+            results = [self._search(queries[0])]
+        else:
+            self._embed_queries(queries)
+            results = list(_get_executor().map(self._search, queries))
+
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranked in results:
+            for rank, document in enumerate(ranked):
+                key = _document_key(document)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, document)
+
+        ordered = sorted(scores, key=scores.get, reverse=True)[:self.max_results]
+        logger.debug(
+            f"Búsqueda multi-consulta: {len(queries)} consultas, "
+            f"{sum(len(r) for r in results)} resultados, {len(ordered)} tras fusionar"
+        )
+        return [documents[key] for key in ordered]
@@ -0,0 +1,212 @@
+"""
+Registro acotado de sesiones activas.
+Siguiendo el principio de Single Responsibility - solo maneja el ciclo de vida
+de los agentes en memoria (LRU + expiración por inactividad).
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    # Absolute imports for Docker/standalone execution
+    from config.settings import settings
+except ImportError:
+    # Relative imports for package execution
+    from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SessionEntry:
+    """Agente en memoria junto con sus estadísticas de acceso"""
+
+    def __init__(self, agent: Any):
+        self.agent = agent
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.access_count = 0
+        # Cursor del historial ya absorbido por el agente
+        self.history_count = 0
+        self.history_digest = ""
+
+    def touch(self):
+        """Registra un acceso a la sesión"""
+        self.last_access = time.time()
+        self.access_count += 1
+
+
+def estimate_agent_memory(agent: Any) -> int:
+    """
+    Estima la memoria ocupada por el historial de un agente.
+    Solo contabiliza los mensajes, que es lo que crece con el uso.
+    """
+    total = 0
+    message_lists = [getattr(agent, 'messages', None)]
+    memory = getattr(agent, 'memory', None)
+    if memory is not None:
+        message_lists.append(getattr(memory, 'messages', None))
+
+    for messages in message_lists:
+        if not messages:
+            continue
+        total += sys.getsizeof(messages)
+        for msg in messages:
+            content = getattr(msg, 'content', None)
+            total += sys.getsizeof(msg)
+            if isinstance(content, str):
+                total += sys.getsizeof(content)
+    return total
+
+
+def count_agent_messages(agent: Any) -> int:
+    """Cuenta los mensajes en el historial de un agente"""
+    messages = getattr(agent, 'messages', None) or []
+    return len(messages)
+
+
+class SessionRegistry:
+    """
+    Almacena los agentes activos con un tamaño máximo (LRU) y un tiempo
+    máximo de inactividad. Las sesiones desalojadas se rehidratan desde
+    el storage del agente cuando vuelven a usarse.
+    """
+
+    def __init__(self, max_size: int = None, idle_ttl_seconds: int = None):
+        self.max_size = max_size or settings.SESSION_MAX_ACTIVE
+        self.idle_ttl_seconds = idle_ttl_seconds if idle_ttl_seconds is not None else settings.SESSION_IDLE_TTL_SECONDS
+        self._entries: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {
+            "registered": 0,
+            "rehydrated": 0,
+            "evicted_lru": 0,
+            "evicted_idle": 0
+        }
+
+    def _is_idle(self, entry: SessionEntry, now: float) -> bool:
+        return self.idle_ttl_seconds > 0 and now - entry.last_access > self.idle_ttl_seconds
+
+    def evict_idle(self) -> int:
+        """
+        Desaloja las sesiones inactivas.
+        Las entradas están ordenadas por último acceso, así que basta con
+        revisar desde el inicio hasta encontrar una sesión activa.
+        """
+        evicted = 0
+        now = time.time()
+        with self._lock:
+            while self._entries:
+                session_id, entry = next(iter(self._entries.items()))
+                if not self._is_idle(entry, now):
+                    break
+                del self._entries[session_id]
+                evicted += 1
+            self.stats["evicted_idle"] += evicted
+        if evicted:
+            logger.debug(f"🧹 {evicted} sesiones inactivas desalojadas")
+        return evicted
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """Obtiene el agente de una sesión y actualiza su último acceso"""
+        self.evict_idle()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            entry.touch()
+            self._entries.move_to_end(session_id)
+            return entry.agent
+
+    def get_entry(self, session_id: str) -> Optional[SessionEntry]:
+        """Obtiene la entrada de una sesión sin actualizar su último acceso"""
+        with self._lock:
+            return self._entries.get(session_id)
+
+    def put(self, session_id: str, agent: Any):
+        """Registra un agente y desaloja el menos usado si se supera el máximo"""
+        with self._lock:
+            if session_id in self._entries:
+                self._entries[session_id].agent = agent
+                self._entries.move_to_end(session_id)
+                return
+            entry = SessionEntry(agent)
+            entry.touch()
+            self._entries[session_id] = entry
+            self.stats["registered"] += 1
+            while len(self._entries) > self.max_size:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self.stats["evicted_lru"] += 1
+                logger.debug(f"Sesión {evicted_id[:8]} desalojada por LRU")
+
+    def remove(self, session_id: str) -> bool:
+        """Elimina una sesión del registro"""
+        with self._lock:
+            return self._entries.pop(session_id, None) is not None
+
+    def clear(self):
+        """Elimina todas las sesiones"""
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self) -> List[str]:
+        """IDs de las sesiones activas, de la menos a la más recientemente usada"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            return entry is not None and not self._is_idle(entry, time.time())
+
+    def __getitem__(self, session_id: str) -> Any:
+        agent = self.get(session_id)
+        if agent is None:
+            raise KeyError(session_id)
+        return agent
+
+    def __setitem__(self, session_id: str, agent: Any):
+        self.put(session_id, agent)
+
+    def __delitem__(self, session_id: str):
+        if not self.remove(session_id):
+            raise KeyError(session_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def get_session_stats(self) -> List[Dict[str, Any]]:
+        """Estadísticas de memoria y acceso por sesión"""
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            {
+                "session_id": session_id,
+                "created_at": datetime.fromtimestamp(entry.created_at).isoformat(),
+                "last_access": datetime.fromtimestamp(entry.last_access).isoformat(),
+                "idle_seconds": round(now - entry.last_access, 1),
+                "access_count": entry.access_count,
+                "message_count": count_agent_messages(entry.agent),
+                "estimated_memory_bytes": estimate_agent_memory(entry.agent)
+            }
+            for session_id, entry in entries
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas generales del registro"""
+        with self._lock:
+            return {
+                **self.stats,
+                "active": len(self._entries),
+                "max_size": self.max_size,
+                "idle_ttl_seconds": self.idle_ttl_seconds
+            }
@@ -0,0 +1,126 @@
+"""
+Configuración de pytest: los tests importan los módulos igual que la
+aplicación en Docker (`from services...`), con agentic/ en el path.
+"""
+
+import hashlib
+import math
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeEmbedder:
+    """Embeddings deterministas sin Ollama: bolsa de palabras en 768 dimensiones"""
+
+    dimensions = 768
+
+    def __init__(self):
+        self.calls = []
+
+    def get_embedding(self, text: str):
+        self.calls.append(text)
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1.0
+        return vector
+
+
+def _cosine(vector1, vector2):
+    dot = sum(a * b for a, b in zip(vector1, vector2))
+    norm = math.sqrt(sum(a * a for a in vector1)) * math.sqrt(sum(b * b for b in vector2))
+    return dot / norm if norm else 0.0
+
+
+class FakeCacheTable:
+    """Tabla del caché en memoria con la interfaz de SemanticCacheTable"""
+
+    qualified_name = "ai.semantic_cache_test"
+
+    def __init__(self):
+        self.rows = {}
+        self.generation = 0
+        self.calls = defaultdict(int)
+
+    @staticmethod
+    def _usable(row, min_cached_at, model):
+        return (
+            row["cached_at"] >= min_cached_at and bool(row["document_references"])
+            and (not model or row["model"] == model)
+        )
+
+    @staticmethod
+    def _entry(row, include_embedding=False):
+        return {k: v for k, v in row.items() if include_embedding or k != "embedding"}
+
+    def create(self):
+        self.calls["create"] += 1
+
+    def delete(self):
+        self.calls["delete"] += 1
+        self.rows.clear()
+
+    def get_entry(self, entry_id, min_cached_at, model=None):
+        self.calls["get_entry"] += 1
+        row = self.rows.get(entry_id)
+        if row is None or not self._usable(row, min_cached_at, model):
+            return None
+        return self._entry(row)
+
+    def search_entries(self, embedding, limit, min_cached_at, model=None, include_embedding=False):
+        self.calls["search_entries"] += 1
+        scored = sorted(
+            (
+                {**self._entry(row, include_embedding), "similarity": _cosine(embedding, row["embedding"])}
+                for row in self.rows.values() if self._usable(row, min_cached_at, model)
+            ),
+            key=lambda entry: entry["similarity"], reverse=True
+        )
+        return scored[:limit]
+
+    def get_generation(self):
+        self.calls["get_generation"] += 1
+        return self.generation
+
+    def bump_generation(self):
+        self.calls["bump_generation"] += 1
+        self.generation += 1
+        return self.generation
+
+    def delete_by_documents(self, document_names):
+        names = {name.lower() for name in document_names if name}
+        deleted = [
+            row_id for row_id, row in self.rows.items()
+            if any(ref["document_name"].lower() in names for ref in row["document_references"])
+        ]
+        for row_id in deleted:
+            del self.rows[row_id]
+        return deleted
+
+    def upsert_entry(self, entry_id, query, embedding, response, formatted_response, model, prompt_hash,
+                     document_references, meta_data, cached_at, lexical_signature=None):
+        self.calls["upsert_entry"] += 1
+        self.rows[entry_id] = {
+            "id": entry_id, "query": query, "response": response, "formatted_response": formatted_response,
+            "model": model, "prompt_hash": prompt_hash, "document_references": document_references,
+            "cached_at": cached_at, "meta_data": meta_data, "lexical_signature": lexical_signature,
+            "embedding": list(embedding)
+        }
+
+
+@pytest.fixture
+def semantic_cache(monkeypatch):
+    """SemanticCache con la tabla y el embedder en memoria"""
+    from services.cache_service import SemanticCache
+
+    monkeypatch.setattr(SemanticCache, "_initialize_cache", lambda self: None)
+    cache = SemanticCache(table_name="semantic_cache_test")
+    cache.vector_db = FakeCacheTable()
+    cache.embedder = FakeEmbedder()
+    cache.enabled = True
+    cache._generation = 0
+    return cache
@@ -0,0 +1,56 @@
+"""Tests del servicio de agentes sin Ollama ni storage"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from models.schemas import Message
+from services import agent_service as agent_service_module
+from services.agent_service import AgentService
+
+
+@pytest.fixture
+def agent_service(monkeypatch):
+    monkeypatch.setattr(agent_service_module, "check_ollama_tools_support", lambda: True)
+    service = AgentService(knowledge_base=None)
+    service.built = []
+
+    def fake_build(session_id, persistent=True):
+        time.sleep(0.01)
+        agent = SimpleNamespace(session_id=session_id, messages=[], memory=None)
+        service.built.append(agent)
+        return agent
+
+    monkeypatch.setattr(service, "_build_agent", fake_build)
+    monkeypatch.setattr(service, "_rehydrate_agent", lambda agent, session_id: None)
+    return service
+
+
+def test_concurrent_requests_for_a_session_build_one_agent(agent_service):
+    history = [Message(role="user", content="hola"), Message(role="assistant", content="¿en qué ayudo?"),
+               Message(role="user", content="cobertura")]
+    results = []
+
+    def worker():
+        results.append(agent_service.get_or_create_agent("sesion", history))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(agent_service.built) == 1
+    assert {id(agent) for agent, _ in results} == {id(agent_service.built[0])}
+    # El historial se absorbe una sola vez
+    assert [msg.content for msg in agent_service.built[0].messages] == ["hola", "¿en qué ayudo?"]
+
+
+def test_new_session_without_id_gets_a_fresh_agent(agent_service):
+    first, first_id = agent_service.get_or_create_agent()
+    second, second_id = agent_service.get_or_create_agent()
+    assert first_id != second_id
+    assert first is not second
+    assert set(agent_service.get_active_sessions()) == {first_id, second_id}
@@ -0,0 +1,173 @@
+"""Tests de la limpieza del caché: TTL, desalojo y aciertos acumulados"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.schemas import DocumentReference
+from services.cache_sweeper import CacheSweeper
+
+
+class _FakeResult:
+    def __init__(self, rows=(), scalar=None):
+        self._rows = list(rows)
+        self._scalar = scalar
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def scalar(self):
+        return self._scalar
+
+
+class _FakeEngine:
+    """Interpreta las sentencias del sweeper sobre las filas de FakeCacheTable"""
+
+    def __init__(self, table):
+        self.table = table
+        self.lock_available = True
+        self.fail_on = None
+        self.hit_updates = []
+
+    def begin(self):
+        engine = self
+
+        class _Transaction:
+            def __enter__(self):
+                return engine
+
+            def __exit__(self, *exc):
+                return False
+
+        return _Transaction()
+
+    def _last_access(self, row):
+        return row.get("last_accessed_at") or row["cached_at"]
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if self.fail_on and self.fail_on in sql:
+            raise ConnectionError("conexión perdida")
+        rows = self.table.rows
+        if sql.startswith("UPDATE"):
+            self.hit_updates.extend(params)
+            for update in params:
+                if update["id"] in rows:
+                    row = rows[update["id"]]
+                    row["hit_count"] = row.get("hit_count", 0) + update["hits"]
+                    row["last_accessed_at"] = datetime.fromtimestamp(update["last_access"], timezone.utc)
+            return _FakeResult()
+        if "pg_try_advisory_xact_lock" in sql:
+            return _FakeResult(scalar=self.lock_available)
+        if "make_interval" in sql:
+            limit = datetime.now(timezone.utc) - timedelta(hours=params["retention_hours"])
+            expired = [row_id for row_id, row in rows.items() if row["cached_at"] < limit]
+            for row_id in expired:
+                del rows[row_id]
+            return _FakeResult([(row_id,) for row_id in expired])
+        if "LIMIT GREATEST" in sql:
+            if "hit_count" in sql:
+                order = lambda row: (row.get("hit_count", 0), self._last_access(row))
+            else:
+                order = self._last_access
+            overflow = max(len(rows) - params["max_entries"], 0)
+            evicted = [row["id"] for row in sorted(rows.values(), key=order)[:overflow]]
+            for row_id in evicted:
+                del rows[row_id]
+            return _FakeResult([(row_id,) for row_id in evicted])
+        if "count(*)" in sql:
+            return _FakeResult(scalar=len(rows))
+        raise AssertionError(f"Sentencia inesperada: {sql}")
+
+
+@pytest.fixture
+def sweeper(semantic_cache):
+    semantic_cache.vector_db.db_engine = _FakeEngine(semantic_cache.vector_db)
+    semantic_cache.telemetry.flush = lambda: 0
+    return CacheSweeper(semantic_cache, interval_seconds=0, max_entries=2, policy="lru")
+
+
+def _store(cache, query, hours_ago=0):
+    asyncio.run(cache.store(query, "respuesta", document_references=[DocumentReference(document_name="a.pdf")]))
+    row = cache.vector_db.rows[cache._generate_cache_key(query)]
+    row["cached_at"] -= timedelta(hours=hours_ago)
+
+
+def test_deletes_expired_rows_and_bumps_generation(sweeper):
+    cache = sweeper.cache
+    _store(cache, "pregunta vieja", hours_ago=cache.retention_hours + 1)
+    _store(cache, "pregunta nueva")
+
+    stats = sweeper.sweep()
+
+    assert stats["expired_deleted"] == 1
+    assert stats["entries"] == 1
+    assert cache.vector_db.generation == 1
+    assert cache.get_stats()["generation"] == 1
+    assert cache.get_stats()["exact_index_size"] == 1
+    assert cache.l1.get_stats()["entries"] == 1
+
+
+def test_evicts_least_recently_hit_rows_above_max_entries(sweeper):
+    cache = sweeper.cache
+    for index, query in enumerate(["primera pregunta", "segunda pregunta", "tercera pregunta"]):
+        _store(cache, query, hours_ago=3 - index)
+    # El acierto hace que la más antigua sea la usada más recientemente
+    assert asyncio.run(cache.find_similar("primera pregunta")) is not None
+
+    stats = sweeper.sweep()
+
+    assert stats["evicted"] == 1
+    assert stats["hits_flushed"] == 1
+    assert set(cache.vector_db.rows) == {
+        cache._generate_cache_key("primera pregunta"), cache._generate_cache_key("tercera pregunta")
+    }
+    assert cache.vector_db.generation == 1
+
+
+def test_lfu_evicts_rows_with_fewest_hits(sweeper):
+    cache = sweeper.cache
+    sweeper.policy = "lfu"
+    for query in ["primera pregunta", "segunda pregunta", "tercera pregunta"]:
+        _store(cache, query)
+    for query in ["primera pregunta", "segunda pregunta", "tercera pregunta", "tercera pregunta"]:
+        asyncio.run(cache.find_similar(query))
+    cache.vector_db.rows[cache._generate_cache_key("primera pregunta")]["hit_count"] = 5
+
+    sweeper.sweep()
+    assert cache._generate_cache_key("segunda pregunta") not in cache.vector_db.rows
+
+
+def test_nothing_deleted_keeps_generation(sweeper):
+    _store(sweeper.cache, "pregunta")
+    sweeper.sweep()
+    assert sweeper.cache.vector_db.generation == 0
+
+
+def test_locked_sweep_only_flushes_hits(sweeper):
+    cache = sweeper.cache
+    cache.vector_db.db_engine.lock_available = False
+    _store(cache, "pregunta vieja", hours_ago=cache.retention_hours + 1)
+    cache._record_hit("fila")
+
+    stats = sweeper.sweep()
+
+    assert stats["skipped_locked"] == 1
+    assert stats["hits_flushed"] == 1
+    assert len(cache.vector_db.rows) == 1
+    assert cache.drain_hits() == {}
+
+
+def test_failed_transaction_restores_drained_hits(sweeper):
+    cache = sweeper.cache
+    cache.vector_db.db_engine.fail_on = "count(*)"
+    cache._record_hit("fila")
+    cache._record_hit("fila")
+
+    stats = sweeper.sweep()
+    assert stats["errors"] == 1
+    assert stats["hits_flushed"] == 0
+
+    cache._record_hit("fila")
+    assert cache.drain_hits()["fila"][0] == 3
@@ -0,0 +1,78 @@
+"""Tests de la telemetría del caché: buckets y estimación what-if"""
+
+import pytest
+
+from services.cache_telemetry import LATENCY_BUCKETS_MS, CacheTelemetry, _latency_bucket, _similarity_bucket
+
+
+class _UnavailableEngine:
+    """Motor sin base de datos: las estadísticas salen de los deltas locales"""
+
+    def connect(self):
+        raise ConnectionError("sin base de datos")
+
+    def begin(self):
+        raise ConnectionError("sin base de datos")
+
+
+@pytest.mark.parametrize("score, bucket", [
+    (0.849, 84), (0.85, 85), (0.8499999, 84), (0.86, 86), (0.0, 0), (1.0, 100), (-0.2, 0), (1.3, 100)
+])
+def test_similarity_bucket_uses_floor(score, bucket):
+    assert _similarity_bucket(score) == bucket
+
+
+def test_latency_bucket():
+    assert _latency_bucket(0.5) == 0
+    assert _latency_bucket(1) == 0
+    assert _latency_bucket(1.5) == 1
+    assert _latency_bucket(5000) == len(LATENCY_BUCKETS_MS) - 1
+    assert _latency_bucket(60000) == len(LATENCY_BUCKETS_MS)
+
+
+def _telemetry():
+    telemetry = CacheTelemetry(_UnavailableEngine(), "ai.cache_stats")
+    telemetry.record_lookup("exact_hit", 0.001)
+    telemetry.record_lookup("hit", 0.02, best_score=0.91)
+    telemetry.record_lookup("miss", 0.03, best_score=0.849)
+    telemetry.record_lookup("miss", 0.04, best_score=0.70)
+    telemetry.record_event("store", 2)
+    telemetry.record_event("ignored", 0)
+    return telemetry
+
+
+def test_summary_from_pending_deltas():
+    summary = _telemetry().summary()
+    assert summary["persisted"] is False
+    assert summary["lookups"] == {"exact_hit": 1, "hit": 1, "miss": 2}
+    assert summary["total_lookups"] == 4
+    assert summary["hits"] == 2
+    assert summary["hit_rate"] == "50.0%"
+    assert summary["avg_hit_similarity"] == 0.91
+    assert summary["events"] == {"store": 2}
+    assert summary["similarity_histogram"] == {"hit": {"0.91": 1}, "miss": {"0.70": 1, "0.84": 1}}
+    assert summary["latency_ms"]["exact_hit"]["p50"] == 1.0
+
+
+def test_what_if_counts_scores_at_or_above_threshold():
+    result = _telemetry().what_if([0.85, 0.84, 0.95])
+    assert result["total_lookups"] == 4
+    assert result["exact_hits"] == 1
+    by_threshold = {estimate["threshold"]: estimate for estimate in result["estimates"]}
+    # 0.849 no alcanza 0.85
+    assert by_threshold[0.85]["estimated_semantic_hits"] == 1
+    assert by_threshold[0.85]["estimated_hits"] == 2
+    assert by_threshold[0.84]["estimated_semantic_hits"] == 2
+    assert by_threshold[0.84]["estimated_hit_rate"] == "75.0%"
+    assert by_threshold[0.95]["estimated_hits"] == 1
+
+
+def test_failed_flush_keeps_deltas():
+    telemetry = _telemetry()
+    with pytest.raises(ConnectionError):
+        telemetry.flush()
+    assert telemetry.summary()["total_lookups"] == 4
+
+
+def test_flush_without_deltas_does_not_touch_database():
+    assert CacheTelemetry(_UnavailableEngine(), "ai.cache_stats").flush() == 0
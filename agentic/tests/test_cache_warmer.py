@@ -0,0 +1,82 @@
+"""Tests de la precarga del caché con el caché en memoria"""
+
+import asyncio
+
+from models.schemas import DocumentReference
+from services.cache_warmer import CacheWarmer
+
+QUESTION = "cobertura dental del plan oro"
+
+
+def _references():
+    return [DocumentReference(document_name="poliza.pdf", pages=[1])]
+
+
+def _warm(cache, questions, generate_fn):
+    warmer = CacheWarmer(cache, concurrency=2)
+
+    async def scenario():
+        warmer.start(questions, generate_fn)
+        await warmer._task
+
+    asyncio.run(scenario())
+    return warmer.get_status()
+
+
+def _generate_and_store(cache, generated):
+    async def generate(question):
+        generated.append(question)
+        cached = await cache.store(question, "respuesta", question[:500], document_references=_references())
+        return {"document_references": _references(), "cached": cached}
+
+    return generate
+
+
+def test_questions_answered_by_the_cache_are_skipped(semantic_cache):
+    asyncio.run(semantic_cache.store(QUESTION, "respuesta", QUESTION, document_references=_references()))
+    generated = []
+
+    status = _warm(semantic_cache, [
+        QUESTION, "Cobertura dental del plan oro", "cual es la cobertura dental del plan oro", "deducible anual"
+    ], _generate_and_store(semantic_cache, generated))
+
+    assert status["status"] == "completed"
+    assert status["total"] == 3
+    assert status["skipped_cached"] == 2
+    assert generated == ["deducible anual"]
+    assert status["stored"] == 1
+
+
+def test_stale_entries_are_regenerated(semantic_cache):
+    asyncio.run(semantic_cache.store(QUESTION, "respuesta", QUESTION, document_references=_references()))
+    semantic_cache.ttl_hours = 0
+    semantic_cache.max_stale_hours = 24
+    semantic_cache.stale_while_revalidate = True
+    generated = []
+
+    status = _warm(semantic_cache, [QUESTION], _generate_and_store(semantic_cache, generated))
+
+    assert generated == [QUESTION]
+    assert status["skipped_cached"] == 0
+
+
+def test_stored_count_comes_from_the_cache_write(semantic_cache):
+    results = {
+        "guardada": {"document_references": _references(), "cached": True},
+        "sin guardar": {"document_references": _references(), "cached": False},
+        "sin referencias": {"document_references": [], "cached": False},
+    }
+
+    async def generate(question):
+        if question == "fallida":
+            raise RuntimeError("ollama no responde")
+        return results[question]
+
+    status = _warm(semantic_cache, [*results, "fallida"], generate)
+
+    assert status["generated"] == 3
+    assert status["stored"] == 1
+    assert status["not_stored"] == 1
+    assert status["no_references"] == 1
+    assert status["failed"] == 1
+    assert status["errors"] == [{"question": "fallida", "error": "ollama no responde"}]
@@ -0,0 +1,144 @@
+"""Tests del router de chat con el agente y el caché reemplazados"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from models.schemas import ChatRequest, Message
+from routers import chat
+from services.inference_executor import InferenceExecutor
+from services.request_coalescer import RequestCoalescer
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """Reemplaza la generación por una que registra sus llamadas"""
+    calls = []
+
+    async def fake_generate(request, stateless=False):
+        calls.append((request.session_id, stateless))
+        await asyncio.sleep(0.05)
+        return {"session_id": request.session_id or "nueva", "response_text": request.message}
+
+    async def embed_query(query):
+        return [1.0, 0.0]
+
+    monkeypatch.setattr(chat, "_generate_response", fake_generate)
+    monkeypatch.setattr(chat, "get_request_coalescer", lambda coalescer=RequestCoalescer(0.9): coalescer)
+    monkeypatch.setattr(chat, "get_semantic_cache", lambda: SimpleNamespace(
+        embed_query=embed_query, queries_are_compatible=lambda a, b: True
+    ))
+    return calls
+
+
+def _run_concurrently(*calls):
+    async def scenario():
+        return await asyncio.gather(*(chat.generate_with_coalescing(request, stateless=stateless)
+                                      for request, stateless in calls))
+    return asyncio.run(scenario())
+
+
+def test_anonymous_requests_share_a_generation(generations):
+    results = _run_concurrently((ChatRequest(message="hola"), False), (ChatRequest(message="hola"), False))
+    assert [coalesced for _, coalesced in results] == [False, True]
+    assert len(generations) == 1
+
+
+def test_different_sessions_never_share_a_generation(generations):
+    results = _run_concurrently(
+        (ChatRequest(message="hola", session_id="a"), False),
+        (ChatRequest(message="hola", session_id="b"), False),
+        (ChatRequest(message="hola"), False),
+    )
+    assert [coalesced for _, coalesced in results] == [False, False, False]
+    assert sorted(session for session, _ in generations if session) == ["a", "b"]
+
+
+def test_repeats_within_a_session_share_a_generation(generations):
+    results = _run_concurrently(
+        (ChatRequest(message="hola", session_id="a"), False),
+        (ChatRequest(message="hola", session_id="a"), False),
+    )
+    assert [coalesced for _, coalesced in results] == [False, True]
+
+
+def test_stateless_runs_do_not_merge_with_user_requests(generations):
+    results = _run_concurrently(
+        (ChatRequest(message="hola"), True),
+        (ChatRequest(message="hola"), False),
+        (ChatRequest(message="hola"), True),
+    )
+    assert [coalesced for _, coalesced in results] == [False, False, True]
+    assert sorted(stateless for _, stateless in generations) == [False, True]
+
+
+def test_client_history_without_session_is_not_coalesced(generations):
+    history = [Message(role="user", content="antes"), Message(role="assistant", content="respuesta")]
+    request = ChatRequest(message="hola", messages=history)
+    assert chat._coalescing_group(request, stateless=False) is None
+    results = _run_concurrently((request, False), (ChatRequest(message="hola", messages=history), False))
+    assert [coalesced for _, coalesced in results] == [False, False]
+    assert len(generations) == 2
+
+
+def test_format_option_is_part_of_the_group():
+    formatted = chat._coalescing_group(ChatRequest(message="hola"), stateless=False)
+    plain = chat._coalescing_group(ChatRequest(message="hola", format_response=False), stateless=False)
+    assert formatted != plain
+
+
+def test_agent_setup_runs_off_the_event_loop(monkeypatch):
+    setup_threads = []
+
+    class FakeAgentService:
+        ollama_supports_tools = True
+
+        def get_or_create_agent(self, session_id=None, messages=None):
+            setup_threads.append(threading.get_ident())
+            return SimpleNamespace(search_knowledge=False), session_id or "nueva"
+
+        def run_agent(self, session_id, context, stream=False):
+            return SimpleNamespace(content="respuesta")
+
+    executor = InferenceExecutor(max_concurrency=1, max_queue_size=1)
+    monkeypatch.setattr(chat, "get_agent_service", lambda: FakeAgentService())
+    monkeypatch.setattr(chat, "get_semantic_cache", lambda: SimpleNamespace())
+    monkeypatch.setattr(chat, "get_response_formatter", lambda: SimpleNamespace(prompt_hash=None))
+    monkeypatch.setattr(chat, "get_inference_executor", lambda: executor)
+
+    async def scenario():
+        result = await chat._generate_response(ChatRequest(message="hola", search_knowledge=False))
+        return result, threading.get_ident()
+
+    try:
+        result, loop_thread = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert result["response_text"] == "respuesta"
+    assert setup_threads and setup_threads[0] != loop_thread
+
+
+def test_stale_hits_schedule_a_single_revalidation(monkeypatch, semantic_cache):
+    regenerated = []
+
+    async def fake_generate(request, stateless=False):
+        regenerated.append((request.message, stateless))
+        await asyncio.sleep(0.01)
+        return {}
+
+    monkeypatch.setattr(chat, "_generate_response", fake_generate)
+    monkeypatch.setattr(chat, "get_semantic_cache", lambda: semantic_cache)
+    stale = {"entry_id": "fila", "stale": True, "original_query": "cobertura dental"}
+
+    async def scenario():
+        chat._schedule_revalidation(stale, format_response=True)
+        chat._schedule_revalidation(stale, format_response=True)
+        chat._schedule_revalidation({**stale, "entry_id": "fresca", "stale": False}, format_response=True)
+        await asyncio.gather(*chat._revalidation_tasks)
+
+    asyncio.run(scenario())
+
+    assert regenerated == [("cobertura dental", True)]
+    assert semantic_cache.get_stats()["revalidating"] == 0
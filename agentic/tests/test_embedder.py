@@ -0,0 +1,162 @@
+"""Tests del embedder por lotes y del memo de embeddings"""
+
+import threading
+import time
+
+import httpx
+import numpy as np
+import pytest
+from ollama import Client, ResponseError
+
+from services import embedder as embedder_module
+from services.embedder import EmbeddingMemo, InstrumentedOllamaEmbedder
+
+
+class _FakeOllamaClient(Client):
+    """Cliente de Ollama que responde /api/embed con vectores derivados del texto"""
+
+    def __init__(self, failures=()):  # sin conexión HTTP
+        self.requests = []
+        self.failures = list(failures)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed(self, model, input, **kwargs):
+        with self._lock:
+            self.requests.append(list(input))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.failures:
+                raise self.failures.pop(0)
+            time.sleep(0.01)
+            return {"embeddings": [[float(len(text)), 1.0, 0.5] for text in input]}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def memo(monkeypatch):
+    memo = EmbeddingMemo(max_entries=100)
+    monkeypatch.setattr(embedder_module, "embedding_memo", memo)
+    return memo
+
+
+def _embedder(client, **kwargs):
+    options = {"batch_size": 2, "max_in_flight": 3, "max_retries": 2, "retry_backoff_seconds": 0}
+    options.update(kwargs)
+    return InstrumentedOllamaEmbedder(model="fake", dimensions=3, ollama_client=client, **options)
+
+
+def test_memo_returns_copies_of_read_only_float32_vectors():
+    memo = EmbeddingMemo(max_entries=2)
+    memo.put("m", "a", [0.25, 0.5])
+    first = memo.get("m", "a")
+    first.append(9.0)
+    assert memo.get("m", "a") == [0.25, 0.5]
+    stored = memo._entries[memo._key("m", "a")]
+    assert stored.dtype == np.float32
+    assert not stored.flags.writeable
+
+
+def test_memo_evicts_least_recently_used():
+    memo = EmbeddingMemo(max_entries=2)
+    memo.put("m", "a", [1.0])
+    memo.put("m", "b", [2.0])
+    memo.get("m", "a")
+    memo.put("m", "c", [3.0])
+    assert memo.get("m", "b") is None
+    assert memo.get("m", "a") == [1.0]
+    assert memo.get_stats()["entries"] == 2
+    # El modelo es parte de la clave
+    assert memo.get("otro", "a") is None
+
+
+def test_disabled_memo_stores_nothing():
+    memo = EmbeddingMemo(max_entries=0)
+    memo.put("m", "a", [1.0])
+    assert memo.get("m", "a") is None
+
+
+def test_batches_keep_order_and_skip_memoized_texts(memo):
+    client = _FakeOllamaClient()
+    embedder = _embedder(client)
+    memo.put("fake", "bb", [9.0, 9.0, 9.0])
+
+    texts = ["a", "bb", "ccc", "a", "dddd", "eeeee"]
+    embeddings = embedder.get_embeddings(texts)
+
+    assert [vector[0] for vector in embeddings] == [1.0, 9.0, 3.0, 1.0, 4.0, 5.0]
+    # Textos repetidos o ya memorizados no se envían; lotes de 2
+    assert sorted(text for request in client.requests for text in request) == ["a", "ccc", "dddd", "eeeee"]
+    assert all(len(request) <= 2 for request in client.requests)
+    assert embedder.get_embeddings(["ccc"]) == [[3.0, 1.0, 0.5]]
+    assert len(client.requests) == 2
+
+
+def test_concurrent_calls_share_the_in_flight_limit(memo):
+    client = _FakeOllamaClient()
+    embedder = _embedder(client, batch_size=1, max_in_flight=2)
+    threads = [
+        threading.Thread(target=embedder.get_embeddings, args=([f"texto {i}-{j}" for j in range(4)],))
+        for i in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(client.requests) == 12
+    assert client.max_in_flight <= 2
+
+
+def test_retries_transient_errors(memo):
+    client = _FakeOllamaClient(failures=[httpx.ConnectError("caído"), ResponseError("ocupado", 503)])
+    assert _embedder(client).get_embeddings(["a"]) == [[1.0, 1.0, 0.5]]
+    assert len(client.requests) == 3
+
+
+def test_does_not_retry_client_errors(memo):
+    client = _FakeOllamaClient(failures=[ResponseError("modelo no encontrado", 404)])
+    embedder = _embedder(client)
+    with pytest.raises(ResponseError):
+        embedder.get_embeddings(["a"])
+    assert len(client.requests) == 1
+    # get_embedding mantiene el contrato de phi: lista vacía ante errores
+    client.failures.append(ResponseError("modelo no encontrado", 404))
+    assert embedder.get_embedding("a") == []
+
+
+def test_gives_up_after_max_retries(memo):
+    client = _FakeOllamaClient(failures=[httpx.ReadTimeout("lento")] * 3)
+    with pytest.raises(httpx.ReadTimeout):
+        _embedder(client, max_retries=2).get_embeddings(["a"])
+    assert len(client.requests) == 3
+
+
+def test_prepared_embeddings_bypass_the_memo(memo):
+    client = _FakeOllamaClient()
+    embedder = _embedder(client)
+    chunks = ["chunk uno", "chunk dos", "chunk tres"]
+
+    with embedder.prepared(chunks):
+        requests = len(client.requests)
+        assert [embedder.get_embedding(chunk) for chunk in chunks] == [[9.0, 1.0, 0.5], [9.0, 1.0, 0.5], [10.0, 1.0, 0.5]]
+        assert len(client.requests) == requests
+
+    assert memo.get_stats()["entries"] == 0
+    # Fuera del bloque vuelve al camino normal (con memo)
+    embedder.get_embedding("chunk uno")
+    assert memo.get_stats()["entries"] == 1
+
+
+def test_prepared_embeddings_are_only_visible_to_the_same_thread(memo):
+    client = _FakeOllamaClient()
+    embedder = _embedder(client)
+    with embedder.prepared(["chunk"]):
+        requests = len(client.requests)
+        thread = threading.Thread(target=embedder.get_embedding, args=("chunk",))
+        thread.start()
+        thread.join()
+        assert len(client.requests) == requests + 1
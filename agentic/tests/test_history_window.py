@@ -0,0 +1,30 @@
+"""Tests de la ventana de historial por presupuesto de tokens"""
+
+from types import SimpleNamespace
+
+from utils.text_processing import estimate_tokens, select_history_window
+
+
+def _message(content):
+    return SimpleNamespace(role="user", content=content)
+
+
+def test_history_window_keeps_most_recent_messages_within_budget():
+    messages = [_message("a" * 40) for _ in range(5)]  # 10 tokens cada uno
+    window = select_history_window(messages, max_tokens=25)
+    assert window == messages[-2:]
+
+
+def test_history_window_always_includes_last_message():
+    messages = [_message("corto"), _message("x" * 400)]
+    assert select_history_window(messages, max_tokens=10) == messages[-1:]
+
+
+def test_history_window_empty():
+    assert select_history_window([], max_tokens=10) == []
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("a" * 40) == 10
@@ -0,0 +1,120 @@
+"""Tests del ejecutor de inferencia: cola acotada, rechazo (503) y streams"""
+
+import asyncio
+import threading
+
+import pytest
+
+from services.inference_executor import InferenceExecutor, InferenceQueueFullError
+
+
+def test_run_returns_result_and_updates_stats():
+    executor = InferenceExecutor(max_concurrency=2, max_queue_size=1)
+    try:
+        assert asyncio.run(executor.run(lambda a, b: a + b, 2, b=3)) == 5
+        stats = executor.get_stats()
+        assert stats["completed"] == 1
+        assert stats["running"] == 0
+        assert stats["queue_depth"] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_overflow_raises_queue_full_with_retry_after():
+    executor = InferenceExecutor(max_concurrency=1, max_queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceQueueFullError) as error:
+            await executor.run(lambda: None)
+        with pytest.raises(InferenceQueueFullError):
+            executor.check_capacity()
+        release.set()
+        await asyncio.gather(*blocked)
+        # Con la cola vacía vuelve a aceptar tareas
+        executor.check_capacity()
+        return error.value
+
+    try:
+        error = asyncio.run(scenario())
+        assert error.retry_after >= 1
+        assert executor.get_stats()["rejected"] == 2
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_stream_yields_items_in_order():
+    executor = InferenceExecutor(max_concurrency=1, max_queue_size=0)
+
+    async def scenario():
+        return [item async for item in executor.stream(lambda n: iter(range(n)), 4)]
+
+    try:
+        assert asyncio.run(scenario()) == [0, 1, 2, 3]
+        assert executor.get_stats()["completed"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_stream_reserves_slot_only_when_iterated():
+    executor = InferenceExecutor(max_concurrency=1, max_queue_size=0)
+
+    async def scenario():
+        stream = executor.stream(lambda: iter(["a", "b"]))
+        # Sin iterar no ocupa lugar: otra tarea puede ejecutarse
+        assert executor.get_stats()["submitted"] == 0
+        assert await executor.run(lambda: "ok") == "ok"
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+
+    try:
+        asyncio.run(scenario())
+        stats = executor.get_stats()
+        assert stats["submitted"] == 2
+        assert stats["queue_depth"] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_stream_first_iteration_raises_when_full():
+    executor = InferenceExecutor(max_concurrency=1, max_queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        stream = executor.stream(lambda: iter(["a"]))
+        with pytest.raises(InferenceQueueFullError):
+            await stream.__anext__()
+        release.set()
+        await blocked
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_stream_propagates_producer_errors():
+    executor = InferenceExecutor(max_concurrency=1, max_queue_size=0)
+
+    def failing():
+        yield "parcial"
+        raise ValueError("falló el modelo")
+
+    async def scenario():
+        items = []
+        with pytest.raises(ValueError):
+            async for item in executor.stream(failing):
+                items.append(item)
+        return items
+
+    try:
+        assert asyncio.run(scenario()) == ["parcial"]
+        assert executor.get_stats()["failed"] == 1
+    finally:
+        executor.shutdown()
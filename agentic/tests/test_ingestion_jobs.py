@@ -0,0 +1,205 @@
+"""Tests de la cola de indexación: reclamo, lease y cancelación"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from config.settings import settings
+from services.ingestion_jobs import IngestionJobs
+
+
+class _FakeResult:
+    def __init__(self, rows=()):
+        self._rows = [dict(row) for row in rows]
+
+    def mappings(self):
+        return self
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self):
+        return self._rows
+
+
+class _FakeEngine:
+    """Interpreta las sentencias de IngestionJobs sobre filas en memoria"""
+
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def begin(self):
+        engine = self
+
+        class _Transaction:
+            def __enter__(self):
+                engine.lock.acquire()
+                return engine
+
+            def __exit__(self, *exc):
+                engine.lock.release()
+                return False
+
+        return _Transaction()
+
+    connect = begin
+
+    def _expired(self, row, lease):
+        return row["updated_at"] < datetime.now(timezone.utc) - timedelta(seconds=lease)
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        now = datetime.now(timezone.utc)
+        if sql.startswith("CREATE"):
+            return _FakeResult()
+        if sql.startswith("INSERT"):
+            row = {
+                "id": params["id"], "filename": params["filename"],
+                "original_filename": params["original_filename"], "status": "queued", "attempts": 0,
+                "result": None, "pages_parsed": 0, "chunks_total": 0, "chunks_embedded": 0,
+                "chunks_resumed": 0, "cache_entries_invalidated": None, "error": None,
+                "created_at": params["now"], "started_at": None, "finished_at": None,
+                "updated_at": params["now"]
+            }
+            self.rows[row["id"]] = row
+            return _FakeResult([row])
+        if "attempts >= :max_attempts" in sql:
+            for row in self.rows.values():
+                if (row["status"] == "running" and row["attempts"] >= params["max_attempts"]
+                        and self._expired(row, params["lease"])):
+                    row.update(status="failed", finished_at=now, updated_at=now,
+                               error=row["error"] or "Se agotaron los intentos de indexación")
+            return _FakeResult()
+        if "FOR UPDATE SKIP LOCKED" in sql:
+            pending = sorted(
+                (
+                    row for row in self.rows.values()
+                    if row["status"] == "queued" or (row["status"] == "running" and self._expired(row, params["lease"]))
+                ),
+                key=lambda row: row["created_at"]
+            )
+            if not pending:
+                return _FakeResult()
+            row = pending[0]
+            row.update(status="running", attempts=row["attempts"] + 1, started_at=now, updated_at=now)
+            return _FakeResult([row])
+        if sql.startswith("UPDATE"):
+            row = self.rows[params["id"]]
+            row.update({k: v for k, v in params.items() if k != "id"}, updated_at=now)
+            return _FakeResult()
+        if sql.startswith("SELECT"):
+            return _FakeResult([self.rows[params["id"]]] if params["id"] in self.rows else [])
+        raise AssertionError(f"Sentencia inesperada: {sql}")
+
+
+class _FakeCache:
+    def __init__(self):
+        self.invalidated = []
+
+    async def invalidate_documents(self, document_names):
+        self.invalidated.append(document_names)
+        return 2
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOCS_PATH", tmp_path)
+    knowledge_service = SimpleNamespace(
+        manifest=SimpleNamespace(db_engine=_FakeEngine()), _vector_table="ai.docs_test"
+    )
+    return IngestionJobs(
+        knowledge_service, _FakeCache(), max_concurrency=1, lease_seconds=30,
+        poll_interval_seconds=1, max_attempts=2
+    )
+
+
+def _submit(jobs, filename, seconds_ago=0):
+    job = jobs.submit(filename, filename)
+    row = jobs.db_engine.rows[job["job_id"]]
+    row["created_at"] -= timedelta(seconds=seconds_ago)
+    return row
+
+
+def _expire_lease(jobs, row):
+    row["updated_at"] -= timedelta(seconds=jobs.lease_seconds + 1)
+
+
+def test_claim_takes_the_oldest_queued_job(jobs):
+    newer = _submit(jobs, "b.pdf")
+    older = _submit(jobs, "a.pdf", seconds_ago=10)
+
+    claimed = jobs._claim()
+    assert claimed["id"] == older["id"]
+    assert claimed["status"] == "running" and claimed["attempts"] == 1
+    assert jobs._claim()["id"] == newer["id"]
+    assert jobs._claim() is None
+
+
+def test_running_job_is_reclaimed_only_after_its_lease_expires(jobs):
+    row = _submit(jobs, "a.pdf")
+    jobs._claim()
+    assert jobs._claim() is None
+
+    _expire_lease(jobs, row)
+    reclaimed = jobs._claim()
+    assert reclaimed["id"] == row["id"] and reclaimed["attempts"] == 2
+
+
+def test_job_fails_when_attempts_are_exhausted(jobs):
+    row = _submit(jobs, "a.pdf")
+    for _ in range(jobs.max_attempts):
+        jobs._claim()
+        _expire_lease(jobs, row)
+
+    assert jobs._claim() is None
+    assert jobs.get(row["id"])["status"] == "failed"
+
+
+def test_completed_job_invalidates_the_document(jobs):
+    (settings.DOCS_PATH / "a.pdf").write_bytes(b"%PDF")
+    jobs.knowledge_service.index_document = lambda file_path, progress: "added"
+    row = _submit(jobs, "a.pdf")
+
+    asyncio.run(jobs._process(jobs._claim()))
+
+    status = jobs.get(row["id"])
+    assert status["status"] == "completed" and status["result"] == "added"
+    assert status["cache_entries_invalidated"] == 2
+    assert jobs.cache.invalidated == [["a.pdf", "a.pdf"]]
+
+
+def test_cancelled_job_stops_at_a_checkpoint_and_returns_to_the_queue(jobs):
+    (settings.DOCS_PATH / "a.pdf").write_bytes(b"%PDF")
+    started = threading.Event()
+    batches = []
+
+    def index_document(file_path, progress):
+        progress(chunks_total=100, chunks_embedded=0)
+        started.set()
+        for batch in range(1, 100):
+            time.sleep(0.01)
+            progress(chunks_embedded=batch)
+            batches.append(batch)
+        return "added"
+
+    jobs.knowledge_service.index_document = index_document
+    row = _submit(jobs, "a.pdf")
+
+    async def scenario():
+        task = asyncio.ensure_future(jobs._process(jobs._claim()))
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    status = jobs.get(row["id"])
+    assert status["status"] == "queued"
+    assert len(batches) < 99
+    assert jobs.cache.invalidated == []
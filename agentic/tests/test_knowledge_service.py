@@ -0,0 +1,157 @@
+"""Tests de la indexación incremental con el manifiesto y la base en memoria"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from phi.document import Document
+
+from services.knowledge_service import KnowledgeService, file_sha256
+
+
+class FakeConnection:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+
+
+class FakeEngine:
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def begin(self):
+        yield FakeConnection(self.statements)
+
+
+class FakeManifest:
+    """Manifiesto en memoria con la interfaz de DocumentManifest"""
+
+    def __init__(self):
+        self.entries = {}
+        self.db_engine = FakeEngine()
+
+    def get_all(self):
+        return {filename: dict(entry) for filename, entry in self.entries.items()}
+
+    def get(self, filename):
+        return self.entries.get(filename)
+
+    def upsert(self, conn, filename, content_hash, chunk_ids, size_bytes):
+        self.entries[filename] = {"content_hash": content_hash, "chunk_ids": chunk_ids, "size_bytes": size_bytes}
+
+    def delete(self, conn, filename):
+        del self.entries[filename]
+
+
+class FakeReader:
+    def __init__(self):
+        self.read_paths = []
+
+    def read_many(self, paths):
+        for path in paths:
+            self.read_paths.append(path.name)
+            yield path, [
+                Document(name=path.stem, content=line, meta_data={"page": 1})
+                for line in path.read_text().splitlines()
+            ]
+
+
+class FakeVectorDb:
+    schema = "ai"
+    table_name = "docs_test"
+
+    def __init__(self):
+        self.upserted = []
+
+        @contextmanager
+        def prepared(texts):
+            yield
+
+        self.embedder = SimpleNamespace(prepared=prepared)
+
+    def upsert(self, documents):
+        self.upserted.extend(document.id for document in documents)
+
+
+@pytest.fixture
+def knowledge_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(KnowledgeService, "_initialize_knowledge_base", lambda self: None)
+    service = KnowledgeService()
+    service.pdf_path = tmp_path
+    service.manifest = FakeManifest()
+    service.knowledge_base = SimpleNamespace(reader=FakeReader(), vector_db=FakeVectorDb())
+    monkeypatch.setattr(service, "_existing_chunk_ids", lambda chunk_ids: set())
+    return service
+
+
+def _write(service, name, content):
+    (service.pdf_path / name).write_text(content)
+
+
+def test_sync_reads_only_new_or_changed_files(knowledge_service):
+    _write(knowledge_service, "a.pdf", "uno\ndos")
+    _write(knowledge_service, "b.pdf", "tres")
+    assert sorted(knowledge_service.sync_documents()["added"]) == ["a.pdf", "b.pdf"]
+
+    reader = knowledge_service.knowledge_base.reader
+    reader.read_paths.clear()
+    _write(knowledge_service, "b.pdf", "tres\ncuatro")
+    (knowledge_service.pdf_path / "a.pdf").unlink()
+    _write(knowledge_service, "c.pdf", "cinco")
+    result = knowledge_service.sync_documents()
+
+    assert result["removed"] == ["a.pdf"]
+    assert result["updated"] == ["b.pdf"]
+    assert result["added"] == ["c.pdf"]
+    assert sorted(reader.read_paths) == ["b.pdf", "c.pdf"]
+    assert set(knowledge_service.manifest.entries) == {"b.pdf", "c.pdf"}
+
+
+def test_unchanged_files_are_not_read_or_embedded(knowledge_service):
+    _write(knowledge_service, "a.pdf", "uno\ndos")
+    knowledge_service.sync_documents()
+    upserted = list(knowledge_service.knowledge_base.vector_db.upserted)
+    knowledge_service.knowledge_base.reader.read_paths.clear()
+
+    result = knowledge_service.sync_documents()
+
+    assert result["unchanged"] == ["a.pdf"]
+    assert knowledge_service.knowledge_base.reader.read_paths == []
+    assert knowledge_service.knowledge_base.vector_db.upserted == upserted
+
+
+def test_updated_file_deletes_only_its_stale_chunks(knowledge_service):
+    _write(knowledge_service, "a.pdf", "uno\ndos")
+    knowledge_service.sync_documents()
+    old_ids = knowledge_service.manifest.entries["a.pdf"]["chunk_ids"]
+
+    _write(knowledge_service, "a.pdf", "uno")
+    knowledge_service.sync_documents()
+
+    new_ids = knowledge_service.manifest.entries["a.pdf"]["chunk_ids"]
+    deleted = [
+        params["ids"] for statement, params in knowledge_service.manifest.db_engine.statements
+        if statement.startswith("DELETE") and "id = ANY(:ids)" in statement
+    ]
+    assert deleted == [[chunk_id for chunk_id in old_ids if chunk_id not in new_ids]]
+    assert len(old_ids) == 2 and len(new_ids) == 1
+
+
+def test_chunk_ids_are_deterministic(knowledge_service):
+    content_hash = "abc"
+    first = KnowledgeService._chunk_id("a.pdf", content_hash, 0)
+    assert first == KnowledgeService._chunk_id("a.pdf", content_hash, 0)
+    assert first != KnowledgeService._chunk_id("a.pdf", content_hash, 1)
+    assert first != KnowledgeService._chunk_id("a.pdf", "otro", 0)
+    assert first != KnowledgeService._chunk_id("b.pdf", content_hash, 0)
+
+    _write(knowledge_service, "a.pdf", "uno\ndos")
+    path = knowledge_service.pdf_path / "a.pdf"
+    documents = [Document(name="a", content="uno"), Document(name="a", content="dos")]
+    chunks = knowledge_service._read_chunks(path, file_sha256(path), documents)
+    assert [chunk.id for chunk in chunks] == [
+        KnowledgeService._chunk_id("a.pdf", file_sha256(path), index) for index in range(2)
+    ]
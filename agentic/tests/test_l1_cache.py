@@ -0,0 +1,74 @@
+"""Tests del caché L1 en memoria"""
+
+from services.l1_cache import L1VectorCache
+
+
+def _entry(row_id, *documents):
+    return {"id": row_id, "document_references": [{"document_name": name} for name in documents]}
+
+
+def test_search_orders_by_similarity():
+    cache = L1VectorCache(max_entries=4, dimensions=2)
+    cache.put(_entry("x"), [1.0, 0.0])
+    cache.put(_entry("y"), [0.0, 1.0])
+    cache.put(_entry("xy"), [1.0, 1.0])
+
+    results = cache.search([2.0, 0.1], limit=2)
+    assert [entry["id"] for entry, _ in results] == ["x", "xy"]
+    assert results[0][1] > results[1][1]
+    assert len(cache.search([1.0, 0.0], limit=10)) == 3
+
+
+def test_put_updates_existing_entry_in_place():
+    cache = L1VectorCache(max_entries=2, dimensions=2)
+    cache.put(_entry("a"), [1.0, 0.0])
+    cache.put(_entry("a"), [0.0, 1.0])
+    results = cache.search([0.0, 1.0])
+    assert len(results) == 1
+    assert results[0][1] == 1.0
+    assert cache.get_stats()["evictions"] == 0
+
+
+def test_evicts_least_recently_used_when_full():
+    cache = L1VectorCache(max_entries=2, dimensions=2)
+    cache.put(_entry("a"), [1.0, 0.0])
+    cache.put(_entry("b"), [0.0, 1.0])
+    cache.touch("a")
+    cache.put(_entry("c"), [1.0, 1.0])
+
+    ids = {entry["id"] for entry, _ in cache.search([1.0, 0.0], limit=5)}
+    assert ids == {"a", "c"}
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_remove_and_invalidate_documents():
+    cache = L1VectorCache(max_entries=4, dimensions=2)
+    cache.put(_entry("a", "Poliza.pdf"), [1.0, 0.0])
+    cache.put(_entry("b", "otro.pdf"), [0.0, 1.0])
+    cache.put(_entry("c"), [1.0, 1.0])
+
+    cache.invalidate_documents(["poliza.pdf"])
+    cache.remove(["c", "inexistente"])
+    assert [entry["id"] for entry, _ in cache.search([1.0, 0.0], limit=5)] == ["b"]
+    assert cache.get_stats()["invalidations"] == 2
+
+
+def test_clear():
+    cache = L1VectorCache(max_entries=2, dimensions=2)
+    cache.put(_entry("a"), [1.0, 0.0])
+    cache.clear()
+    assert cache.search([1.0, 0.0]) == []
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_disabled_and_invalid_vectors_are_ignored():
+    disabled = L1VectorCache(max_entries=0, dimensions=2)
+    disabled.put(_entry("a"), [1.0, 0.0])
+    assert not disabled.enabled
+    assert disabled.search([1.0, 0.0]) == []
+
+    cache = L1VectorCache(max_entries=2, dimensions=2)
+    cache.put(_entry("dim"), [1.0, 0.0, 0.0])
+    cache.put(_entry("zero"), [0.0, 0.0])
+    assert cache.get_stats()["entries"] == 0
+    assert cache.search([1.0, 0.0, 0.0]) == []
@@ -0,0 +1,43 @@
+"""Tests de las firmas léxicas del caché semántico"""
+
+from services.lexical_signature import LexicalSignature
+
+
+def test_from_text_extracts_tokens_quoted_and_keywords():
+    signature = LexicalSignature.from_text("que cubre el plan 'Oro' de Humano para la cobertura dental")
+    assert signature.normalized == "que cubre el plan 'oro' de humano para la cobertura dental"
+    assert {"cubre", "plan", "humano", "cobertura"} <= signature.tokens
+    assert not signature.tokens & {"el", "de", "para", "la"}
+    assert signature.quoted == frozenset({"oro"})
+    assert signature.keywords == frozenset({"oro", "humano"})
+
+
+def test_dict_roundtrip():
+    signature = LexicalSignature.from_text('Deducible del plan "Platino" en Santo Domingo')
+    data = signature.to_dict()
+    assert data["tokens"] == sorted(data["tokens"])
+    assert LexicalSignature.from_dict(data) == signature
+    assert LexicalSignature.from_dict(None) is None
+    assert LexicalSignature.from_dict({}) is None
+
+
+def test_is_different_topic_requires_quoted_terms_on_both_sides():
+    gold = LexicalSignature.from_text("cobertura del plan 'oro'")
+    platinum = LexicalSignature.from_text("cobertura del plan 'platino'")
+    plain = LexicalSignature.from_text("cobertura del plan")
+    assert gold.is_different_topic(platinum)
+    assert not gold.is_different_topic(gold)
+    assert not gold.is_different_topic(plain)
+
+
+def test_word_overlap_is_jaccard():
+    first = LexicalSignature.from_text("cobertura dental completa")
+    second = LexicalSignature.from_text("cobertura dental parcial")
+    assert first.word_overlap(second) == 2 / 4
+    assert first.word_overlap(LexicalSignature.from_text("el de la")) == 0.0
+
+
+def test_shared_keywords():
+    first = LexicalSignature.from_text("Planes de Humano en Santiago")
+    second = LexicalSignature.from_text("Sucursales de Humano")
+    assert first.shared_keywords(second) == frozenset({"humano"})
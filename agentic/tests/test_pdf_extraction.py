@@ -0,0 +1,72 @@
+"""Tests del reparto de la extracción de páginas y su reensamblado en orden"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from services import pdf_extraction
+from services.pdf_extraction import PDFExtractor
+
+PAGE_COUNTS = {"a.pdf": 8, "b.pdf": 3}
+
+
+def _fake_count_pages(path):
+    name = Path(path).name
+    if name not in PAGE_COUNTS:
+        raise ValueError(f"PDF ilegible: {name}")
+    return PAGE_COUNTS[name]
+
+
+def _fake_extract_page_range(path, start, end):
+    # Los primeros rangos terminan al final, para que lleguen desordenados
+    time.sleep(0.02 * (PAGE_COUNTS[Path(path).name] - start) / 10)
+    return [(index + 1, f"{Path(path).stem} página {index + 1}") for index in range(start, end)]
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    """Extractor con un pool de threads y páginas falsas en lugar de pypdf"""
+    monkeypatch.setattr(pdf_extraction, "_count_pages", _fake_count_pages)
+    monkeypatch.setattr(pdf_extraction, "_extract_page_range", _fake_extract_page_range)
+    extractor = PDFExtractor(max_workers=4, pages_per_task=3)
+    executor = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(extractor, "_get_executor", lambda: executor)
+    yield extractor
+    executor.shutdown(wait=True)
+
+
+def _expected(name):
+    return [(index + 1, f"{Path(name).stem} página {index + 1}") for index in range(PAGE_COUNTS[name])]
+
+
+def test_page_ranges_cover_every_page_once():
+    assert PDFExtractor(max_workers=1, pages_per_task=3)._ranges(8) == [(0, 3), (3, 6), (6, 8)]
+    assert PDFExtractor(max_workers=1, pages_per_task=3)._ranges(0) == []
+
+
+def test_pages_are_reassembled_in_order(extractor):
+    pages = extractor.extract(Path("a.pdf"))
+    assert pages == _expected("a.pdf")
+
+
+def test_files_are_yielded_in_the_order_received(extractor):
+    results = list(extractor.iter_files([Path("b.pdf"), Path("a.pdf")]))
+    assert [path.name for path, _ in results] == ["b.pdf", "a.pdf"]
+    assert [pages for _, pages in results] == [_expected("b.pdf"), _expected("a.pdf")]
+
+
+def test_unreadable_file_fails_when_reached(extractor):
+    files = extractor.iter_files([Path("a.pdf"), Path("roto.pdf"), Path("b.pdf")])
+    assert next(files) == (Path("a.pdf"), _expected("a.pdf"))
+    with pytest.raises(ValueError, match="roto.pdf"):
+        next(files)
+
+
+def test_single_worker_extracts_in_process(monkeypatch):
+    monkeypatch.setattr(pdf_extraction, "_count_pages", _fake_count_pages)
+    monkeypatch.setattr(pdf_extraction, "_extract_page_range", _fake_extract_page_range)
+    extractor = PDFExtractor(max_workers=1)
+    monkeypatch.setattr(extractor, "_get_executor", lambda: pytest.fail("no debe crear el pool"))
+    assert extractor.extract(Path("a.pdf")) == _expected("a.pdf")
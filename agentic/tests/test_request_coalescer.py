@@ -0,0 +1,110 @@
+"""Tests de la coalescencia de consultas en curso (single-flight)"""
+
+import asyncio
+
+from services.request_coalescer import RequestCoalescer, cosine_similarity, normalize_query
+
+
+def _counting_factory(calls, result, delay=0.05):
+    async def factory():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        return result
+    return factory
+
+
+def test_normalize_query():
+    assert normalize_query("  ¿Qué cubre la PÓLIZA?  ") == "qué cubre la póliza"
+    assert normalize_query("hola,   mundo!") == "hola mundo"
+
+
+def test_cosine_similarity():
+    assert cosine_similarity([1.0, 0.0], [1.0, 0.0]) == 1.0
+    assert cosine_similarity([1.0, 0.0], [0.0, 1.0]) == 0.0
+    assert cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+
+
+def test_identical_queries_share_one_generation():
+    coalescer = RequestCoalescer(similarity_threshold=0.9)
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(
+            coalescer.run("¿Qué cubre la póliza?", _counting_factory(calls, "respuesta")),
+            coalescer.run("qué cubre la póliza", _counting_factory(calls, "otra")),
+        )
+
+    results = asyncio.run(scenario())
+    assert results == [("respuesta", False), ("respuesta", True)]
+    assert len(calls) == 1
+    assert coalescer.get_stats() == {"leaders": 1, "coalesced": 1, "coalesced_by_embedding": 0, "in_flight": 0}
+
+
+def test_similar_embeddings_share_generation():
+    coalescer = RequestCoalescer(similarity_threshold=0.9)
+    vectors = {"cobertura dental": [1.0, 0.0], "cobertura odontológica": [0.99, 0.05]}
+    calls = []
+
+    async def embed(text):
+        return vectors[text]
+
+    async def scenario():
+        leader = asyncio.ensure_future(
+            coalescer.run("cobertura dental", _counting_factory(calls, "dental"), embed_fn=embed)
+        )
+        await asyncio.sleep(0)
+        follower = await coalescer.run("cobertura odontológica", _counting_factory(calls, "x"), embed_fn=embed)
+        return await leader, follower
+
+    leader, follower = asyncio.run(scenario())
+    assert leader == ("dental", False)
+    assert follower == ("dental", True)
+    assert calls == ["dental"]
+    assert coalescer.stats["coalesced_by_embedding"] == 1
+
+
+def test_dissimilar_or_incompatible_queries_run_separately():
+    coalescer = RequestCoalescer(similarity_threshold=0.9)
+    vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [1.0, 0.0]}
+    calls = []
+
+    async def embed(text):
+        return vectors[text]
+
+    async def scenario():
+        return await asyncio.gather(
+            coalescer.run("a", _counting_factory(calls, "a"), embed_fn=embed),
+            coalescer.run("b", _counting_factory(calls, "b"), embed_fn=embed),
+            coalescer.run("c", _counting_factory(calls, "c"), embed_fn=embed,
+                          is_compatible=lambda cached, query: False),
+        )
+
+    assert asyncio.run(scenario()) == [("a", False), ("b", False), ("c", False)]
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+def test_groups_are_isolated():
+    coalescer = RequestCoalescer(similarity_threshold=0.9)
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(
+            coalescer.run("misma pregunta", _counting_factory(calls, "con refs"), group="refs=1"),
+            coalescer.run("misma pregunta", _counting_factory(calls, "sin refs"), group="refs=0"),
+        )
+
+    assert asyncio.run(scenario()) == [("con refs", False), ("sin refs", False)]
+    assert len(calls) == 2
+
+
+def test_finished_generation_is_not_reused():
+    coalescer = RequestCoalescer(similarity_threshold=0.9)
+    calls = []
+
+    async def scenario():
+        first = await coalescer.run("pregunta", _counting_factory(calls, 1, delay=0))
+        second = await coalescer.run("pregunta", _counting_factory(calls, 2, delay=0))
+        return first, second
+
+    assert asyncio.run(scenario()) == ((1, False), (2, False))
+    assert coalescer.get_stats()["in_flight"] == 0
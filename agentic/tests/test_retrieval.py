@@ -0,0 +1,82 @@
+"""Tests de la búsqueda multi-consulta con un knowledge base en memoria"""
+
+from types import SimpleNamespace
+
+from phi.document import Document
+from phi.run.response import RunResponse
+
+from services.agent_service import InsuranceAgent
+from services.retrieval import MultiQueryRetriever
+
+
+class FakeKnowledgeBase:
+    """Devuelve resultados fijos por consulta y registra las búsquedas"""
+
+    def __init__(self, results):
+        self.results = results
+        self.searched = []
+        self.vector_db = SimpleNamespace(embedder=None)
+
+    def search(self, query):
+        self.searched.append(query)
+        if query not in self.results:
+            raise RuntimeError("consulta desconocida")
+        return self.results[query]
+
+
+def _chunk(name, content, chunk_id=None):
+    return Document(name=name, content=content, id=chunk_id)
+
+
+def test_rrf_ranks_documents_found_by_several_queries_first():
+    shared = _chunk("poliza.pdf", "cobertura dental", chunk_id="shared")
+    knowledge_base = FakeKnowledgeBase({
+        "dental": [_chunk("poliza.pdf", "solo dental", chunk_id="a"), shared],
+        "deducible": [_chunk("poliza.pdf", "solo deducible", chunk_id="b"), shared],
+    })
+    documents = MultiQueryRetriever(knowledge_base, max_queries=3, max_results=5, rrf_k=60).search(
+        ["dental", "deducible"]
+    )
+    assert [document.id for document in documents] == ["shared", "a", "b"]
+
+
+def test_duplicates_without_id_are_merged_by_content():
+    knowledge_base = FakeKnowledgeBase({
+        "dental": [_chunk("poliza.pdf", "cobertura dental")],
+        "odontologia": [_chunk("poliza.pdf", "cobertura dental")],
+    })
+    documents = MultiQueryRetriever(knowledge_base, max_results=5).search(["dental", "odontologia"])
+    assert len(documents) == 1
+
+
+def test_repeated_queries_are_searched_once_and_results_capped():
+    knowledge_base = FakeKnowledgeBase({
+        "dental": [_chunk("poliza.pdf", f"parte {index}", chunk_id=str(index)) for index in range(4)],
+    })
+    documents = MultiQueryRetriever(knowledge_base, max_results=2).search(["dental", " DENTAL ", ""])
+    assert knowledge_base.searched == ["dental"]
+    assert [document.id for document in documents] == ["0", "1"]
+
+
+def test_failing_query_does_not_drop_the_others():
+    knowledge_base = FakeKnowledgeBase({"dental": [_chunk("poliza.pdf", "cobertura dental", chunk_id="a")]})
+    documents = MultiQueryRetriever(knowledge_base).search(["dental", "desconocida"])
+    assert [document.id for document in documents] == ["a"]
+
+
+def test_tool_records_references_like_phi():
+    knowledge_base = FakeKnowledgeBase({
+        "dental": [_chunk("poliza.pdf", "cobertura dental", chunk_id="a")],
+        "deducible": [_chunk("poliza.pdf", "deducible anual", chunk_id="b")],
+    })
+    agent = InsuranceAgent(multi_query_retriever=MultiQueryRetriever(knowledge_base))
+    agent.run_response = RunResponse()
+
+    assert "cobertura dental" in agent.search_knowledge_base(["dental", "deducible"])
+    references = agent.run_response.extra_data.references
+    assert len(references) == 1
+    assert references[0].query == "dental; deducible"
+    assert [reference["content"] for reference in references[0].references] == ["cobertura dental", "deducible anual"]
+
+    assert agent.search_knowledge_base(["desconocida"]) == "No documents found"
+    assert len(agent.run_response.extra_data.references) == 1
@@ -0,0 +1,203 @@
+"""Tests del caché semántico con la tabla y el embedder en memoria"""
+
+import asyncio
+from datetime import timedelta
+
+from models.schemas import DocumentReference
+
+QUESTION = "cobertura dental del plan oro"
+
+
+def _store(cache, query=QUESTION, document="poliza.pdf", response="respuesta"):
+    return asyncio.run(cache.store(
+        query, response, document_references=[DocumentReference(document_name=document, pages=[1])]
+    ))
+
+
+def test_in_memory_hits_do_not_read_the_generation(semantic_cache):
+    assert _store(semantic_cache)
+    for _ in range(3):
+        assert asyncio.run(semantic_cache.find_similar(QUESTION)) is not None
+    assert semantic_cache.vector_db.calls["get_generation"] == 0
+    assert semantic_cache.vector_db.calls["get_entry"] == 0
+
+
+def test_generation_change_from_another_worker_drops_local_copies(semantic_cache):
+    _store(semantic_cache)
+    assert semantic_cache.get_stats()["exact_index_size"] == 1
+
+    semantic_cache.vector_db.bump_generation()
+    semantic_cache.vector_db.rows.clear()
+    semantic_cache._sync_generation()
+
+    assert semantic_cache.get_stats()["exact_index_size"] == 0
+    assert semantic_cache.l1.get_stats()["entries"] == 0
+    assert asyncio.run(semantic_cache.find_similar(QUESTION)) is None
+
+
+def test_own_bump_keeps_unrelated_copies(semantic_cache):
+    _store(semantic_cache)
+    _store(semantic_cache, query="deducible del plan platino", document="otro.pdf")
+
+    assert asyncio.run(semantic_cache.invalidate_documents(["otro.pdf"])) == 1
+    assert semantic_cache.get_stats()["generation"] == 1
+    semantic_cache._sync_generation()
+    assert semantic_cache.get_stats()["exact_index_size"] == 1
+
+
+def test_watch_generation_polls_in_background(semantic_cache):
+    semantic_cache.generation_poll_seconds = 0.01
+    _store(semantic_cache)
+
+    async def scenario():
+        watcher = asyncio.ensure_future(semantic_cache.watch_generation())
+        semantic_cache.vector_db.bump_generation()
+        await asyncio.sleep(0.1)
+        watcher.cancel()
+
+    asyncio.run(scenario())
+    assert semantic_cache.get_stats()["generation"] == 1
+    assert semantic_cache.get_stats()["exact_index_size"] == 0
+
+
+def test_repeated_question_skips_the_embedding(semantic_cache):
+    _store(semantic_cache)
+    calls = len(semantic_cache.embedder.calls)
+    cached = asyncio.run(semantic_cache.find_similar("¿Cobertura dental del plan ORO?"))
+    assert cached["similarity"] == 1.0
+    assert len(semantic_cache.embedder.calls) == calls
+    assert semantic_cache.stats["exact_hits"] == 1
+
+
+def test_exact_lookup_falls_back_to_the_table_by_key(semantic_cache):
+    _store(semantic_cache)
+    # Otro worker guardó la entrada: este no la tiene en memoria
+    semantic_cache._drop_local_copies()
+
+    assert asyncio.run(semantic_cache.find_similar(QUESTION))["response"] == "respuesta"
+    assert semantic_cache.vector_db.calls["get_entry"] == 1
+    assert semantic_cache.embedder.calls == [QUESTION]
+    asyncio.run(semantic_cache.find_similar(QUESTION))
+    assert semantic_cache.vector_db.calls["get_entry"] == 1
+
+
+def test_exact_index_is_bounded(semantic_cache):
+    semantic_cache.exact_max_entries = 2
+    for index in range(3):
+        _store(semantic_cache, query=f"pregunta numero {index}")
+    assert semantic_cache.get_stats()["exact_index_size"] == 2
+    assert semantic_cache._generate_cache_key("pregunta numero 0") not in semantic_cache._exact_index
+
+
+def test_expired_exact_entry_is_not_served(semantic_cache):
+    _store(semantic_cache)
+    semantic_cache.ttl_hours = -1
+    semantic_cache.stale_while_revalidate = False
+    assert asyncio.run(semantic_cache.find_similar(QUESTION)) is None
+    assert semantic_cache.get_stats()["exact_index_size"] == 0
+
+
+def test_entries_from_another_model_are_not_served(semantic_cache):
+    _store(semantic_cache)
+    semantic_cache._drop_local_copies()
+    semantic_cache.model = "otro-modelo"
+    assert asyncio.run(semantic_cache.find_similar(QUESTION)) is None
+
+
+def test_invalidate_documents_drops_only_entries_citing_them(semantic_cache):
+    _store(semantic_cache)
+    _store(semantic_cache, query="deducible del plan platino", document="otro.pdf")
+
+    assert asyncio.run(semantic_cache.invalidate_documents(["POLIZA.pdf"])) == 1
+
+    assert asyncio.run(semantic_cache.find_similar(QUESTION)) is None
+    assert asyncio.run(semantic_cache.find_similar("deducible del plan platino"))["response"] == "respuesta"
+    assert semantic_cache.vector_db.generation == 1
+    assert semantic_cache.stats["invalidated"] == 1
+
+
+def test_invalidate_without_matches_keeps_the_generation(semantic_cache):
+    _store(semantic_cache)
+    assert asyncio.run(semantic_cache.invalidate_documents(["otro.pdf"])) == 0
+    assert semantic_cache.vector_db.calls["bump_generation"] == 0
+    assert semantic_cache.get_stats()["exact_index_size"] == 1
+
+
+def test_invalidate_failure_keeps_local_copies(semantic_cache):
+    _store(semantic_cache)
+
+    def fail(document_names):
+        raise ConnectionError("conexión perdida")
+
+    semantic_cache.vector_db.delete_by_documents = fail
+    assert asyncio.run(semantic_cache.invalidate_documents(["poliza.pdf"])) == 0
+    assert semantic_cache.get_stats()["exact_index_size"] == 1
+
+
+def test_clear_recreates_the_table_and_drops_local_copies(semantic_cache):
+    _store(semantic_cache)
+    assert asyncio.run(semantic_cache.clear())
+
+    assert semantic_cache.vector_db.rows == {}
+    assert semantic_cache.vector_db.calls["create"] == 1
+    assert semantic_cache.vector_db.generation == 1
+    assert semantic_cache.get_stats()["exact_index_size"] == 0
+    assert asyncio.run(semantic_cache.find_similar(QUESTION)) is None
+
+
+def test_clear_creates_the_table_when_delete_fails(semantic_cache):
+    def fail():
+        raise ConnectionError("tabla bloqueada")
+
+    semantic_cache.vector_db.delete = fail
+    assert asyncio.run(semantic_cache.clear())
+    assert semantic_cache.vector_db.calls["create"] == 1
+
+
+def _age(cache, hours, query=QUESTION):
+    """Envejece la fila y la copia del índice exacto de una entrada"""
+    cache_key = cache._generate_cache_key(query)
+    cache.vector_db.rows[cache_key]["cached_at"] -= timedelta(hours=hours)
+    cache._exact_index[cache_key][0]["cached_at"] -= timedelta(hours=hours)
+
+
+def test_stale_entry_is_served_marked_stale(semantic_cache):
+    semantic_cache.ttl_hours, semantic_cache.max_stale_hours = 1, 24
+    semantic_cache.stale_while_revalidate = True
+    _store(semantic_cache)
+    _age(semantic_cache, hours=2)
+
+    cached = asyncio.run(semantic_cache.find_similar(QUESTION))
+
+    assert cached["stale"] is True
+    assert cached["response"] == "respuesta"
+    assert semantic_cache.stats["stale_hits"] == 1
+
+
+def test_entry_past_the_stale_window_is_not_served(semantic_cache):
+    semantic_cache.ttl_hours, semantic_cache.max_stale_hours = 1, 24
+    semantic_cache.stale_while_revalidate = True
+    _store(semantic_cache)
+    _age(semantic_cache, hours=26)
+    assert asyncio.run(semantic_cache.find_similar(QUESTION)) is None
+
+
+def test_stale_local_copy_is_reread_from_the_table(semantic_cache):
+    semantic_cache.ttl_hours, semantic_cache.max_stale_hours = 1, 24
+    semantic_cache.stale_while_revalidate = True
+    _store(semantic_cache)
+    # Otro worker ya regeneró la fila: solo la copia local está stale
+    semantic_cache._exact_index[semantic_cache._generate_cache_key(QUESTION)][0]["cached_at"] -= timedelta(hours=2)
+
+    cached = asyncio.run(semantic_cache.find_similar(QUESTION))
+
+    assert cached["stale"] is False
+    assert semantic_cache.vector_db.calls["get_entry"] == 1
+
+
+def test_revalidation_is_reserved_once_per_entry(semantic_cache):
+    assert semantic_cache.begin_revalidation("fila")
+    assert not semantic_cache.begin_revalidation("fila")
+    assert semantic_cache.get_stats()["revalidating"] == 1
+    semantic_cache.end_revalidation("fila")
+    assert semantic_cache.begin_revalidation("fila")
@@ -0,0 +1,70 @@
+"""Tests del registro de sesiones activas (LRU + expiración por inactividad)"""
+
+import time
+
+from services.session_registry import SessionRegistry
+
+
+def test_lru_evicts_least_recently_used():
+    registry = SessionRegistry(max_size=2, idle_ttl_seconds=0)
+    registry["a"] = "agent-a"
+    registry["b"] = "agent-b"
+
+    # Usar "a" la convierte en la más reciente: se desaloja "b"
+    assert registry.get("a") == "agent-a"
+    registry["c"] = "agent-c"
+
+    assert registry.keys() == ["a", "c"]
+    assert registry.get("b") is None
+    assert registry.stats["evicted_lru"] == 1
+
+
+def test_put_existing_session_replaces_agent_without_registering_again():
+    registry = SessionRegistry(max_size=2, idle_ttl_seconds=0)
+    registry["a"] = "old"
+    registry["a"] = "new"
+
+    assert registry["a"] == "new"
+    assert len(registry) == 1
+    assert registry.stats["registered"] == 1
+
+
+def test_idle_sessions_expire():
+    registry = SessionRegistry(max_size=10, idle_ttl_seconds=60)
+    registry["old"] = "agent-old"
+    registry["new"] = "agent-new"
+    registry.get_entry("old").last_access = time.time() - 120
+
+    assert "old" not in registry
+    assert registry.evict_idle() == 1
+    assert registry.keys() == ["new"]
+    assert registry.stats["evicted_idle"] == 1
+
+
+def test_get_evicts_idle_sessions_before_lookup():
+    registry = SessionRegistry(max_size=10, idle_ttl_seconds=60)
+    registry["a"] = "agent-a"
+    registry.get_entry("a").last_access = time.time() - 120
+
+    assert registry.get("a") is None
+    assert len(registry) == 0
+
+
+def test_zero_ttl_disables_idle_expiration():
+    registry = SessionRegistry(max_size=10, idle_ttl_seconds=0)
+    registry["a"] = "agent-a"
+    registry.get_entry("a").last_access = time.time() - 10 ** 6
+
+    assert registry.evict_idle() == 0
+    assert "a" in registry
+
+
+def test_remove_and_clear():
+    registry = SessionRegistry(max_size=10, idle_ttl_seconds=0)
+    registry["a"] = "agent-a"
+    registry["b"] = "agent-b"
+
+    assert registry.remove("a") is True
+    assert registry.remove("a") is False
+    registry.clear()
+    assert len(registry) == 0
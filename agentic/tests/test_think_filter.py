@@ -0,0 +1,42 @@
+"""Tests del filtro incremental de bloques <think> del streaming"""
+
+import pytest
+
+from utils.text_processing import ThinkBlockFilter, remove_think_blocks
+
+
+def _filter_stream(chunks):
+    think_filter = ThinkBlockFilter()
+    output = [think_filter.feed(chunk) for chunk in chunks]
+    output.append(think_filter.flush())
+    return "".join(output)
+
+
+TEXT = "<think>\nrazonando sobre la póliza\n</think>\n\nLa cobertura incluye <b>hospitalización</b>."
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 8, 13, len(TEXT)])
+def test_think_filter_matches_remove_think_blocks_for_any_chunking(size):
+    chunks = [TEXT[start:start + size] for start in range(0, len(TEXT), size)]
+    assert _filter_stream(chunks) == remove_think_blocks(TEXT)
+
+
+def test_think_filter_tags_split_across_chunks():
+    chunks = ["Hola <thi", "nk>oculto</th", "ink> mundo"]
+    assert _filter_stream(chunks) == "Hola  mundo"
+
+
+def test_think_filter_keeps_text_that_only_looks_like_a_tag_prefix():
+    think_filter = ThinkBlockFilter()
+    # "<th" podría ser el inicio de <think>: se retiene hasta el siguiente fragmento
+    assert think_filter.feed("tabla <th") == "tabla "
+    assert think_filter.feed("ead>") == "<thead>"
+    assert think_filter.flush() == ""
+
+
+def test_think_filter_drops_unclosed_block_at_end():
+    assert _filter_stream(["Respuesta<think>sin cerrar"]) == "Respuesta"
+
+
+def test_think_filter_strips_leading_whitespace_only_once():
+    assert _filter_stream(["<think>x</think>", "\n\n", "Hola", " ", "mundo"]) == "Hola mundo"
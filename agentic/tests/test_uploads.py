@@ -0,0 +1,113 @@
+"""Tests de la copia por bloques de un upload multipart a disco"""
+
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException, Response
+
+from config.settings import settings
+from routers import documents
+from utils.uploads import FileTooLargeError, InvalidUploadError, stream_multipart_to_temp
+
+BOUNDARY = "limite123"
+
+
+class FakeRequest:
+    """Request con encabezados y un cuerpo entregado en trozos de `chunk_size` bytes"""
+
+    def __init__(self, body: bytes, chunk_size: int = 7, content_type: str = None, content_length: str = None):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.headers = {
+            "content-type": content_type or f"multipart/form-data; boundary={BOUNDARY}",
+            "content-length": content_length if content_length is not None else str(len(body)),
+        }
+        self.streamed = 0
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            chunk = self.body[start:start + self.chunk_size]
+            self.streamed += len(chunk)
+            yield chunk
+
+
+def _multipart(content: bytes, filename: str = "poliza.pdf", field: str = "file") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="descripcion"\r\n\r\n'
+        f"poliza anual\r\n"
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _stream(request, directory, max_size=1024, buffer_size=16, on_filename=None):
+    return asyncio.run(stream_multipart_to_temp(
+        request, "file", directory, max_size=max_size, buffer_size=buffer_size, on_filename=on_filename
+    ))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_file_is_copied_whatever_the_chunk_size(tmp_path, chunk_size):
+    content = b"%PDF-1.4\r\n" + bytes(range(256)) * 2 + b"--limite"
+
+    upload = _stream(FakeRequest(_multipart(content), chunk_size=chunk_size), tmp_path)
+
+    assert upload.path.read_bytes() == content
+    assert upload.size == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    assert upload.filename == "poliza.pdf"
+    assert upload.path.parent == tmp_path
+
+
+def test_declared_length_over_the_limit_is_rejected_without_reading(tmp_path):
+    request = FakeRequest(_multipart(b"x" * 10), content_length=str(10 ** 9))
+    with pytest.raises(FileTooLargeError):
+        _stream(request, tmp_path)
+    assert request.streamed == 0
+
+
+def test_file_over_the_limit_is_rejected_and_removed(tmp_path):
+    request = FakeRequest(_multipart(b"x" * 2048), content_length="")
+    with pytest.raises(FileTooLargeError):
+        _stream(request, tmp_path, max_size=1024)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_non_multipart_body_is_rejected(tmp_path):
+    with pytest.raises(InvalidUploadError):
+        _stream(FakeRequest(b"{}", content_type="application/json"), tmp_path)
+
+
+def test_missing_file_field_is_rejected(tmp_path):
+    with pytest.raises(InvalidUploadError):
+        _stream(FakeRequest(_multipart(b"contenido", field="otro")), tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_filename_can_be_rejected_before_writing(tmp_path):
+    def reject(filename):
+        raise ValueError(f"extensión no permitida: {filename}")
+
+    with pytest.raises(ValueError):
+        _stream(FakeRequest(_multipart(b"contenido", filename="virus.exe")), tmp_path, on_filename=reject)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("body, filename, status_code", [
+    (b"x" * 2048, "poliza.pdf", 413),
+    (b"contenido", "poliza.exe", 400),
+    (b"", "poliza.pdf", 400),
+])
+def test_upload_route_maps_rejections_to_http_errors(tmp_path, monkeypatch, body, filename, status_code):
+    monkeypatch.setattr(settings, "UPLOAD_TMP_PATH", tmp_path)
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    request = FakeRequest(_multipart(body, filename=filename), content_length="")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(documents.upload_pdf(request, Response()))
+
+    assert error.value.status_code == status_code
+    assert list(tmp_path.iterdir()) == []
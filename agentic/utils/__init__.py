@@ -1,15 +1,30 @@
 """Utilidades de la aplicacion"""
 
 from .formatting import ResponseFormatter
-from .text_processing import remove_think_blocks, extract_document_references, format_conversation_history
+from .text_processing import (
+    remove_think_blocks,
+    extract_document_references,
+    format_conversation_history,
+    select_history_window,
+    estimate_tokens,
+    ThinkBlockFilter
+)
 from .validators import check_postgresql_connection, check_ollama_connection, check_ollama_tools_support
+from .uploads import stream_multipart_to_temp, StreamedUpload, FileTooLargeError, InvalidUploadError
 
 __all__ = [
     'ResponseFormatter',
     'remove_think_blocks',
     'extract_document_references',
     'format_conversation_history',
+    'select_history_window',
+    'estimate_tokens',
+    'ThinkBlockFilter',
     'check_postgresql_connection',
     'check_ollama_connection',
-    'check_ollama_tools_support'
+    'check_ollama_tools_support',
+    'stream_multipart_to_temp',
+    'StreamedUpload',
+    'FileTooLargeError',
+    'InvalidUploadError'
 ]
\ No newline at end of file
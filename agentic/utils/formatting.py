@@ -3,6 +3,7 @@ Utilidades para formateo de respuestas.
 Siguiendo el principio de Single Responsibility.
 """
 
+import hashlib
 import logging
 from phi.model.ollama import Ollama
 from phi.model.message import Message as PhiMessage
@@ -11,10 +12,14 @@ try:
     # Absolute imports for Docker/standalone execution
     from config.settings import settings
     from utils.text_processing import remove_think_blocks
+    from services.connections import get_ollama_client
+    from utils.metrics import track_stage, OLLAMA_ERRORS, STAGE_FORMATTING
 except ImportError:
     # Relative imports for package execution
     from ..config.settings import settings
     from .text_processing import remove_think_blocks
+    from ..services.connections import get_ollama_client
+    from .metrics import track_stage, OLLAMA_ERRORS, STAGE_FORMATTING
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +30,16 @@ class ResponseFormatter:
     def __init__(self):
         self.formatting_model = Ollama(
             id=settings.RESPONSE_MODEL, 
-            host=settings.OLLAMA_HOST
+            host=settings.OLLAMA_HOST,
+            client=get_ollama_client()
         )
         self.formatting_prompt = settings.get_formatting_prompt()
     
+    @property
+    def prompt_hash(self) -> str:
+        """Hash del prompt de formateo, para validar respuestas formateadas cacheadas"""
+        return hashlib.md5(self.formatting_prompt.encode()).hexdigest()
+    
     def format_response(self, message: str, response_text: str) -> str:
         """
         Aplica formateo a una respuesta usando el modelo configurado.
@@ -46,17 +57,19 @@ class ResponseFormatter:
                 response=response_text
             )
             
-            print("Aplicando formateo a la respuesta...")
+            logger.debug("Aplicando formateo a la respuesta...")
             
             format_message = PhiMessage(role='user', content=format_prompt)
-            format_result = self.formatting_model.response([format_message])
+            with track_stage(STAGE_FORMATTING):
+                format_result = self.formatting_model.response([format_message])
             
             formatted_response = format_result.content if hasattr(format_result, 'content') else str(format_result)
             formatted_response = remove_think_blocks(formatted_response)
             
-            print(f"✨ Respuesta formateada exitosamente - Nueva longitud: {len(formatted_response)} caracteres")
+            logger.debug("respuesta formateada length=%d", len(formatted_response))
             return formatted_response
             
         except Exception as e:
-            print(f"Error al formatear respuesta: {e}")
+            OLLAMA_ERRORS.labels(operation="format").inc()
+            logger.error(f"Error al formatear respuesta: {e}")
             return response_text
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Métricas de Prometheus para la API.
+Siguiendo el principio de Single Responsibility - solo define y registra métricas.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Etapas del pipeline de chat
+STAGE_CACHE_EMBED = "cache_embed"
+STAGE_CACHE_EXACT_LOOKUP = "cache_exact_lookup"
+STAGE_CACHE_L1_LOOKUP = "cache_l1_lookup"
+STAGE_CACHE_LOOKUP = "cache_lookup"
+STAGE_KNOWLEDGE_EMBED = "knowledge_embed"
+STAGE_KNOWLEDGE_SEARCH = "knowledge_search"
+STAGE_LLM_GENERATION = "llm_generation"
+STAGE_REFERENCE_EXTRACTION = "reference_extraction"
+STAGE_FORMATTING = "formatting"
+STAGE_CACHE_STORE = "cache_store"
+
+STAGE_DURATION = Histogram(
+    "agentic_stage_duration_seconds",
+    "Duración de cada etapa del pipeline de chat",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+)
+
+REQUEST_DURATION = Histogram(
+    "agentic_chat_request_duration_seconds",
+    "Duración total de las consultas de chat",
+    ["endpoint", "outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+)
+
+CACHE_LOOKUPS = Counter(
+    "agentic_cache_lookups_total",
+    "Consultas al caché semántico por resultado",
+    ["result"]
+)
+
+CACHE_STALE_HITS = Counter(
+    "agentic_cache_stale_hits_total",
+    "Aciertos del caché servidos después del TTL (stale-while-revalidate)"
+)
+
+CACHE_REVALIDATIONS = Counter(
+    "agentic_cache_revalidations_total",
+    "Regeneraciones en segundo plano de entradas stale por resultado",
+    ["outcome"]
+)
+
+CACHE_WARM_QUESTIONS = Counter(
+    "agentic_cache_warm_questions_total",
+    "Preguntas procesadas por la precarga del caché por resultado",
+    ["outcome"]
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "agentic_embedding_batch_size",
+    "Textos por petición a /api/embed de Ollama",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+INGESTION_JOBS = Counter(
+    "agentic_ingestion_jobs_total",
+    "Trabajos de indexación de documentos terminados por resultado",
+    ["outcome"]
+)
+
+INGESTION_CHUNKS_EMBEDDED = Counter(
+    "agentic_ingestion_chunks_embedded_total",
+    "Chunks embebidos por los trabajos de indexación"
+)
+
+OLLAMA_ERRORS = Counter(
+    "agentic_ollama_errors_total",
+    "Errores en llamadas a Ollama por operación",
+    ["operation"]
+)
+
+CACHE_SWEEP_DURATION = Histogram(
+    "agentic_cache_sweep_duration_seconds",
+    "Duración de cada pasada de limpieza del caché semántico",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+CACHE_SWEEP_DELETED = Counter(
+    "agentic_cache_sweep_deleted_total",
+    "Entradas del caché eliminadas por la limpieza",
+    ["reason"]
+)
+
+CACHE_ENTRIES = Gauge(
+    "agentic_cache_entries",
+    "Entradas en la tabla del caché semántico tras la última limpieza"
+)
+
+EMBEDDING_MEMO_LOOKUPS = Counter(
+    "agentic_embedding_memo_lookups_total",
+    "Consultas al memo de embeddings por resultado",
+    ["result"]
+)
+
+ACTIVE_SESSIONS = Gauge(
+    "agentic_active_sessions",
+    "Sesiones con agente en memoria"
+)
+
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "agentic_inference_queue_depth",
+    "Tareas esperando un lugar en el ejecutor de inferencia"
+)
+
+INFERENCE_RUNNING = Gauge(
+    "agentic_inference_running",
+    "Tareas ejecutándose en el ejecutor de inferencia"
+)
+
+INFERENCE_WAIT = Histogram(
+    "agentic_inference_wait_seconds",
+    "Tiempo de espera en la cola de inferencia",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+)
+
+COALESCED_REQUESTS = Counter(
+    "agentic_coalesced_requests_total",
+    "Consultas que compartieron una generación en curso"
+)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Mide la duración de una etapa del pipeline"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - start)
@@ -9,9 +9,11 @@ from typing import Tuple, List
 try:
     # Absolute imports for Docker/standalone execution
     from models.schemas import DocumentReference
+    from config.settings import settings
 except ImportError:
     # Relative imports for package execution
     from ..models.schemas import DocumentReference
+    from ..config.settings import settings
 
 
 def remove_think_blocks(text: str) -> str:
@@ -24,6 +26,75 @@ def remove_think_blocks(text: str) -> str:
     return cleaned_text.strip()
 
 
+class ThinkBlockFilter:
+    """
+    Filtra bloques <think></think> de forma incremental sobre un stream de tokens.
+    Mantiene en buffer solo los fragmentos que podrían ser el inicio de una etiqueta.
+    """
+    
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+    
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._started = False
+    
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        """Longitud del sufijo de text que es prefijo de tag"""
+        for size in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:size]):
+                return size
+        return 0
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Procesa un fragmento del stream.
+        
+        Returns:
+            El texto visible que puede emitirse al cliente
+        """
+        self._buffer += chunk
+        output = []
+        
+        while self._buffer:
+            if self._in_think:
+                end = self._buffer.find(self.CLOSE_TAG)
+                if end == -1:
+                    keep = self._partial_tag_length(self._buffer, self.CLOSE_TAG)
+                    self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+                    break
+                self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                self._in_think = False
+            else:
+                start = self._buffer.find(self.OPEN_TAG)
+                if start == -1:
+                    keep = self._partial_tag_length(self._buffer, self.OPEN_TAG)
+                    output.append(self._buffer[:len(self._buffer) - keep])
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                output.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(self.OPEN_TAG):]
+                self._in_think = True
+        
+        return self._emit("".join(output))
+    
+    def flush(self) -> str:
+        """Emite el texto pendiente al finalizar el stream"""
+        remaining = "" if self._in_think else self._buffer
+        self._buffer = ""
+        return self._emit(remaining)
+    
+    def _emit(self, text: str) -> str:
+        """Omite los espacios iniciales como lo hace remove_think_blocks"""
+        if not self._started:
+            text = text.lstrip()
+            if text:
+                self._started = True
+        return text
+
+
 def extract_document_references(text: str) -> Tuple[str, List[DocumentReference]]:
     """
     Extrae las referencias de documentos del texto y devuelve el texto limpio y las referencias.
@@ -75,7 +146,38 @@ def extract_document_references(text: str) -> Tuple[str, List[DocumentReference]
     return clean_text, document_references
 
 
-def format_conversation_history(messages: List) -> str:
+def estimate_tokens(text: str) -> int:
+    """
+    Estima el número de tokens de un texto (~4 caracteres por token).
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def select_history_window(messages: List, max_tokens: int = None) -> List:
+    """
+    Selecciona los mensajes más recientes que caben en el presupuesto de tokens.
+    Siempre incluye al menos el último mensaje.
+    """
+    if not messages:
+        return []
+    
+    budget = max_tokens if max_tokens is not None else settings.HISTORY_TOKEN_BUDGET
+    selected = []
+    used = 0
+    for msg in reversed(messages):
+        tokens = estimate_tokens(getattr(msg, 'content', None) or "")
+        if selected and used + tokens > budget:
+            break
+        selected.append(msg)
+        used += tokens
+    
+    selected.reverse()
+    return selected
+
+
+def format_conversation_history(messages: List, max_tokens: int = None) -> str:
     """
     Format conversation history for context
     """
@@ -83,7 +185,7 @@ def format_conversation_history(messages: List) -> str:
         return ""
     
     history = "Historial de conversación:\n"
-    for msg in messages[-10:]:  # Últimos 10 mensajes para contexto
+    for msg in select_history_window(messages, max_tokens):  # Ventana según presupuesto de tokens
         role = "Usuario" if msg.role == "user" else "Asistente"
         history += f"{role}: {msg.content}\n"
     
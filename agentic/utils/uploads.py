@@ -0,0 +1,170 @@
+"""
+Recepción de archivos subidos.
+Siguiendo el principio de Single Responsibility - solo copia el upload a
+disco por bloques, con memoria constante sin importar el tamaño del archivo.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Margen para los encabezados y delimitadores del multipart sobre el tamaño
+# máximo del archivo
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class FileTooLargeError(Exception):
+    """El archivo supera el tamaño máximo permitido"""
+
+
+class InvalidUploadError(Exception):
+    """El cuerpo no es multipart/form-data o no incluye el archivo"""
+
+
+class StreamedUpload(NamedTuple):
+    """Archivo temporal con el contenido subido"""
+    path: Path
+    size: int
+    sha256: str
+    filename: str
+
+
+def _collect_events(boundary: bytes, events: List[Tuple[str, Optional[bytes]]]) -> MultipartParser:
+    """Parser incremental que solo anota los eventos; se procesan después fuera de los callbacks"""
+    def data_event(name):
+        return lambda data, start, end: events.append((name, data[start:end]))
+
+    def event(name):
+        return lambda: events.append((name, None))
+
+    return MultipartParser(boundary, callbacks={
+        "on_part_begin": event("part_begin"),
+        "on_header_field": data_event("header_field"),
+        "on_header_value": data_event("header_value"),
+        "on_header_end": event("header_end"),
+        "on_headers_finished": event("headers_finished"),
+        "on_part_data": data_event("part_data"),
+        "on_part_end": event("part_end"),
+    })
+
+
+async def stream_multipart_to_temp(request, field_name: str, directory: Path, max_size: int,
+                                   buffer_size: int,
+                                   on_filename: Optional[Callable[[str], None]] = None) -> StreamedUpload:
+    """
+    Copia el archivo `field_name` de un cuerpo multipart/form-data a un
+    archivo temporal de `directory` a medida que llega por `request.stream()`,
+    calculando el SHA-256 en la misma pasada. El cuerpo no se guarda en
+    memoria ni en otro temporal; las escrituras a disco se agrupan en
+    bloques de `buffer_size` bytes. Los demás campos se descartan.
+
+    `on_filename` recibe el nombre del archivo antes de escribir su
+    contenido y puede lanzar una excepción para rechazarlo.
+    Si algo falla el temporal se elimina.
+
+    Raises:
+        FileTooLargeError: si el Content-Length declarado, o lo recibido,
+            supera `max_size` (sin leer el cuerpo en el primer caso)
+        InvalidUploadError: si el cuerpo no es multipart o falta el archivo
+    """
+    max_body = max_size + MULTIPART_OVERHEAD
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        raise FileTooLargeError(f"El cuerpo declara {content_length} bytes")
+
+    media_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise InvalidUploadError("Se esperaba un cuerpo multipart/form-data")
+
+    events: List[Tuple[str, Optional[bytes]]] = []
+    parser = _collect_events(boundary, events)
+    header_field = b""
+    header_value = b""
+    headers = {}
+    buffer = None
+    temp_path: Optional[Path] = None
+    filename = None
+    pending = bytearray()
+    digest = hashlib.sha256()
+    size = 0
+    received = 0
+    completed = False
+
+    async def flush():
+        if pending:
+            await asyncio.to_thread(buffer.write, bytes(pending))
+            pending.clear()
+
+    async def process():
+        nonlocal header_field, header_value, headers, buffer, temp_path, filename, size, completed
+        for name, data in events:
+            if name == "part_begin":
+                headers = {}
+            elif name == "header_field":
+                header_field += data
+            elif name == "header_value":
+                header_value += data
+            elif name == "header_end":
+                headers[header_field.lower()] = header_value
+                header_field, header_value = b"", b""
+            elif name == "headers_finished":
+                _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                is_file = (
+                    not completed and buffer is None
+                    and options.get(b"name", b"").decode("latin-1") == field_name
+                    and b"filename" in options
+                )
+                if is_file:
+                    filename = options[b"filename"].decode("utf-8", errors="replace")
+                    if on_filename is not None:
+                        on_filename(filename)
+                    directory.mkdir(parents=True, exist_ok=True)
+                    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".upload_", suffix=".part")
+                    temp_path = Path(temp_name)
+                    buffer = os.fdopen(fd, "wb")
+            elif name == "part_data" and buffer is not None:
+                size += len(data)
+                if size > max_size:
+                    raise FileTooLargeError(f"El archivo supera {max_size} bytes")
+                digest.update(data)
+                pending.extend(data)
+                if len(pending) >= buffer_size:
+                    await flush()
+            elif name == "part_end" and buffer is not None:
+                await flush()
+                await asyncio.to_thread(buffer.close)
+                buffer = None
+                completed = True
+        events.clear()
+
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise FileTooLargeError(f"El cuerpo supera {max_body} bytes")
+            try:
+                parser.write(chunk)
+            except Exception as e:
+                raise InvalidUploadError(f"Cuerpo multipart inválido: {e}") from e
+            await process()
+        parser.finalize()
+        await process()
+        if not completed:
+            raise InvalidUploadError(f"Falta el archivo en el campo '{field_name}'")
+        return StreamedUpload(temp_path, size, digest.hexdigest(), filename)
+    except BaseException:
+        if buffer is not None:
+            buffer.close()
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+        raise
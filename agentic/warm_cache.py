@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Script para precargar el caché semántico con una lista de preguntas.
+Ejecutar después de un deploy o de limpiar el caché, con la API en marcha.
+
+Formatos aceptados para --file:
+- .txt: una pregunta por línea (las líneas que empiezan con # se ignoran)
+- .json: lista de preguntas o de objetos con "message" o "question"
+- .jsonl: un objeto por línea con "message" o "question" (p. ej. tráfico exportado)
+
+Uso:
+    python warm_cache.py --file preguntas.txt --url http://localhost:8000 --concurrency 2
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import requests
+
+
+def _question_from(item) -> str:
+    if isinstance(item, str):
+        return item
+    return item.get("message") or item.get("question") or ""
+
+
+def load_questions(path: Path) -> List[str]:
+    """Lee las preguntas del archivo según su extensión"""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        questions = [_question_from(item) for item in json.loads(text)]
+    elif path.suffix == ".jsonl":
+        questions = [_question_from(json.loads(line)) for line in text.splitlines() if line.strip()]
+    else:
+        questions = [line for line in text.splitlines() if not line.strip().startswith("#")]
+    return [q.strip() for q in questions if q and q.strip()]
+
+
+def warm_cache(url: str, questions: List[str], concurrency: int, format_response: bool,
+               poll_interval: float) -> bool:
+    base_url = url.rstrip("/")
+    response = requests.post(
+        f"{base_url}/cache/warm",
+        json={"questions": questions, "concurrency": concurrency, "format_response": format_response},
+        timeout=30
+    )
+    if response.status_code != 202:
+        print(f"❌ No se pudo iniciar la precarga ({response.status_code}): {response.text}")
+        return False
+
+    status = response.json()
+    print(f"🔥 Precargando {status['total']} preguntas únicas (concurrencia={status['concurrency']})")
+
+    while status["status"] == "running":
+        time.sleep(poll_interval)
+        status = requests.get(f"{base_url}/cache/warm", timeout=30).json()
+        print(
+            f"   {status['processed']}/{status['total']} procesadas - "
+            f"generadas={status['generated']} omitidas={status['skipped_cached']} "
+            f"fallidas={status['failed']} - {status['questions_per_second']:.2f} preguntas/s"
+        )
+
+    print(
+        f"{'✅' if status['status'] == 'completed' else '⚠️'} Precarga {status['status']} en "
+        f"{status['elapsed_seconds']:.1f}s: {status['stored']} entradas nuevas, "
+        f"{status['skipped_cached']} ya en caché, {status['no_references']} sin referencias, "
+        f"{status['not_stored']} sin guardar, "
+        f"{status['failed']} fallidas"
+    )
+    for error in status.get("errors", []):
+        print(f"   - {error['question'][:80]!r}: {error['error']}")
+    return status["status"] == "completed" and status["failed"] == 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Precarga el caché semántico con una lista de preguntas")
+    parser.add_argument("--file", required=True, type=Path, help="Archivo de preguntas (.txt, .json o .jsonl)")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base de la API")
+    parser.add_argument("--concurrency", type=int, default=None, help="Generaciones simultáneas (por defecto AGENTIC_CACHE_WARM_CONCURRENCY)")
+    parser.add_argument("--no-format", action="store_true", help="No guardar la respuesta formateada")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Segundos entre consultas de progreso")
+    args = parser.parse_args()
+
+    questions = load_questions(args.file)
+    if not questions:
+        print(f"❌ No se encontraron preguntas en {args.file}")
+        return 1
+
+    try:
+        success = warm_cache(args.url, questions, args.concurrency, not args.no_format, args.poll_interval)
+    except requests.RequestException as e:
+        print(f"❌ Error conectando con la API: {e}")
+        return 1
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Batched, concurrent Ollama embeddings for LangChain vector stores."""
+
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """
+    LangChain embeddings that call Ollama's multi-input `/api/embed` endpoint.
+
+    Documents are sent in batches of `batch_size` texts with up to
+    `max_in_flight` requests at the same time, instead of one request per
+    text. Connection errors, timeouts, 429 and 5xx responses are retried
+    with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        model: str = "nomic-embed-text",
+        base_url: Optional[str] = None,
+        batch_size: int = 32,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 0.5,
+        timeout: float = 120.0,
+    ):
+        """
+        Initialize the embeddings client.
+
+        Args:
+            model: Ollama embedding model
+            base_url: Ollama URL (default: OLLAMA_HOST or http://localhost:11434)
+            batch_size: Texts per /api/embed request
+            max_in_flight: Concurrent requests
+            max_retries: Retries per batch on transient errors
+            retry_backoff_seconds: Initial backoff, doubled on every retry
+            timeout: Request timeout in seconds
+        """
+        self.model = model
+        self.base_url = (base_url or os.environ.get("OLLAMA_HOST", "http://localhost:11434")).rstrip("/")
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight),
+        )
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, httpx.TransportError):
+            return True
+        return isinstance(error, httpx.HTTPStatusError) and (
+            error.response.status_code == 429 or error.response.status_code >= 500
+        )
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch with a single /api/embed request, retrying transient errors."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._client.post("/api/embed", json={"model": self.model, "input": texts})
+                response.raise_for_status()
+                embeddings = response.json()["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} texts")
+                return embeddings
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = self.retry_backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+                print(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches, keeping the input order."""
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_in_flight == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self._embed_batch([text])[0]
@@ -3,7 +3,8 @@ import os
 from typing import List, Dict
 from langchain_community.document_loaders import DirectoryLoader, UnstructuredMarkdownLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_ollama import ChatOllama, OllamaEmbeddings
+from langchain_ollama import ChatOllama
+from batched_embeddings import BatchedOllamaEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.vectorstores.utils import filter_complex_metadata
 from langchain.chains import RetrievalQA
@@ -25,10 +26,12 @@ COLLECTION_NAME = "health_products_rag"
 print("Initializing Ollama models...")
 llm = ChatOllama(model="qwen2.5:7b-instruct", temperature=0)
 
-# Using Ollama embeddings (local)
-embeddings = OllamaEmbeddings(
+# Using Ollama embeddings (local), batched through /api/embed
+embeddings = BatchedOllamaEmbeddings(
     model="nomic-embed-text",  # Efficient local embedding model
-    base_url="http://localhost:11434"
+    base_url="http://localhost:11434",
+    batch_size=int(os.environ.get("EMBED_BATCH_SIZE", "32")),
+    max_in_flight=int(os.environ.get("EMBED_MAX_IN_FLIGHT", "4"))
 )
 
 class MarkdownRAGSystem:
@@ -1,5 +1,7 @@
 import os
-from typing import List, Dict, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 import pypdf
 from langchain.schema import Document
@@ -7,40 +9,99 @@ from langchain.document_loaders.base import BaseLoader
 import re
 
 
+def _count_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF (runs in a pool worker)."""
+    return len(pypdf.PdfReader(pdf_path).pages)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF as (page number, text) (runs in a pool worker)."""
+    pdf_reader = pypdf.PdfReader(pdf_path)
+    return [(index + 1, pdf_reader.pages[index].extract_text() or "") for index in range(start, end)]
+
+
+def _pool_context():
+    # Prefer fork: the scripts that use this loader run their pipeline at
+    # module level, and spawn would re-execute them in every worker
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+
 class PDFToMarkdownLoader(BaseLoader):
     """Loader that reads PDF files and converts them to markdown format."""
     
-    def __init__(self, pdf_dir: str, glob_pattern: str = "*.pdf"):
+    def __init__(self, pdf_dir: str, glob_pattern: str = "*.pdf",
+                 max_workers: Optional[int] = None, pages_per_task: int = 16):
         """
         Initialize the PDF loader.
         
         Args:
             pdf_dir: Directory containing PDF files
             glob_pattern: Pattern to match PDF files (default: "*.pdf")
+            max_workers: Processes used to extract text (default: CPU count, 1 = no pool)
+            pages_per_task: Consecutive pages extracted by each pool task (default: 16)
         """
         self.pdf_dir = Path(pdf_dir)
         self.glob_pattern = glob_pattern
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
         
     def _extract_text_from_pdf(self, pdf_path: Path) -> List[Dict[str, str]]:
         """Extract text from PDF file page by page."""
-        pages_data = []
+        for _, pages_data in self._extract_text_from_pdfs([pdf_path]):
+            return pages_data
+        return []
+    
+    @staticmethod
+    def _pages_data(pdf_path: Path, pages: List[Tuple[int, str]]) -> List[Dict[str, str]]:
+        return [
+            {"text": text, "page": page_num, "source": str(pdf_path)}
+            for page_num, text in pages
+            if text.strip()
+        ]
+    
+    def _extract_text_from_pdfs(self, pdf_paths: List[Path]) -> Iterator[Tuple[Path, List[Dict[str, str]]]]:
+        """
+        Extract text from several PDFs, spreading files and page ranges of
+        large files across a process pool.
         
-        try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text.strip():
-                        pages_data.append({
-                            "text": text,
-                            "page": page_num + 1,
-                            "source": str(pdf_path)
-                        })
-        except Exception as e:
-            print(f"Error reading PDF {pdf_path}: {str(e)}")
+        Yields (pdf_path, pages_data) in the order of pdf_paths, with pages in
+        order. Files that cannot be read yield no pages.
+        """
+        if self.max_workers <= 1:
+            for pdf_path in pdf_paths:
+                try:
+                    pages = _extract_page_range(str(pdf_path), 0, _count_pages(str(pdf_path)))
+                except Exception as e:
+                    print(f"Error reading PDF {pdf_path}: {str(e)}")
+                    pages = []
+                yield pdf_path, self._pages_data(pdf_path, pages)
+            return
+        
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context()) as executor:
+            counts = [executor.submit(_count_pages, str(pdf_path)) for pdf_path in pdf_paths]
+            tasks = []
+            for pdf_path, count in zip(pdf_paths, counts):
+                try:
+                    page_count = count.result()
+                except Exception as e:
+                    print(f"Error reading PDF {pdf_path}: {str(e)}")
+                    tasks.append(None)
+                    continue
+                tasks.append([
+                    executor.submit(_extract_page_range, str(pdf_path), start, min(start + self.pages_per_task, page_count))
+                    for start in range(0, page_count, self.pages_per_task)
+                ])
             
-        return pages_data
+            for pdf_path, futures in zip(pdf_paths, tasks):
+                pages = []
+                try:
+                    for future in futures or []:
+                        pages.extend(future.result())
+                except Exception as e:
+                    print(f"Error reading PDF {pdf_path}: {str(e)}")
+                    pages = []
+                yield pdf_path, self._pages_data(pdf_path, pages)
     
     def _convert_to_markdown(self, text: str) -> str:
         """Convert extracted text to markdown format."""
@@ -94,10 +155,9 @@ class PDFToMarkdownLoader(BaseLoader):
         
         print(f"Found {len(pdf_files)} PDF files to process")
         
-        # Process each PDF
-        for pdf_path in pdf_files:
+        # Process each PDF (text is extracted in parallel, results arrive in order)
+        for pdf_path, pages_data in self._extract_text_from_pdfs(pdf_files):
             print(f"Processing {pdf_path.name}...")
-            pages_data = self._extract_text_from_pdf(pdf_path)
             
             # Convert each page to a document
             for page_data in pages_data:
@@ -122,7 +182,8 @@ class PDFToMarkdownLoader(BaseLoader):
 class PDFMarkdownLoader(BaseLoader):
     """Alternative loader that saves markdown files after conversion."""
     
-    def __init__(self, pdf_dir: str, markdown_dir: Optional[str] = None, glob_pattern: str = "*.pdf"):
+    def __init__(self, pdf_dir: str, markdown_dir: Optional[str] = None, glob_pattern: str = "*.pdf",
+                 max_workers: Optional[int] = None, pages_per_task: int = 16):
         """
         Initialize the PDF loader with markdown output.
         
@@ -130,8 +191,10 @@ class PDFMarkdownLoader(BaseLoader):
             pdf_dir: Directory containing PDF files
             markdown_dir: Directory to save markdown files (optional)
             glob_pattern: Pattern to match PDF files (default: "*.pdf")
+            max_workers: Processes used to extract text (default: CPU count, 1 = no pool)
+            pages_per_task: Consecutive pages extracted by each pool task (default: 16)
         """
-        self.base_loader = PDFToMarkdownLoader(pdf_dir, glob_pattern)
+        self.base_loader = PDFToMarkdownLoader(pdf_dir, glob_pattern, max_workers, pages_per_task)
         self.markdown_dir = Path(markdown_dir) if markdown_dir else None
         
         if self.markdown_dir:
@@ -21,11 +21,18 @@ from langchain_ollama import ChatOllama
 from langchain_experimental.graph_transformers import LLMGraphTransformer
 
 from langchain_neo4j import Neo4jVector
-from langchain_ollama import OllamaEmbeddings
+from batched_embeddings import BatchedOllamaEmbeddings
 from langchain_neo4j.vectorstores.neo4j_vector import remove_lucene_chars
 
 load_dotenv()
 
+# Batched embeddings through Ollama's /api/embed, shared by both vector indexes
+embeddings = BatchedOllamaEmbeddings(
+    model="nomic-embed-text",
+    batch_size=int(os.environ.get("EMBED_BATCH_SIZE", "32")),
+    max_in_flight=int(os.environ.get("EMBED_MAX_IN_FLIGHT", "4")),
+)
+
 AURA_INSTANCENAME = os.environ["AURA_INSTANCENAME"]
 NEO4J_URI = os.environ["NEO4J_URI"]
 NEO4J_USERNAME = os.environ["NEO4J_USERNAME"]
@@ -67,7 +74,7 @@ res = kg.add_graph_documents(
 print("Creating vector embeddings...")
 vector_store = Neo4jVector.from_documents(
     documents,
-    OllamaEmbeddings(model="nomic-embed-text"),
+    embeddings,
     graph=kg,
     index_name="roman_empire",
     node_label="Chunk",
@@ -81,7 +88,7 @@ vector_store = Neo4jVector.from_documents(
 # create vector index
 print("Setting up vector index for hybrid retrieval...")
 vector_index = Neo4jVector.from_existing_graph(
-    OllamaEmbeddings(model="nomic-embed-text"),
+    embeddings,
     search_type="hybrid",
     node_label="Document",
     text_node_property="text",